@@ -1,8 +1,58 @@
 import pygame
 import view
+from collections import OrderedDict
 from signalslot import Signal
 
 
+class TextCache:
+    """
+    A LRU cache of rendered text surfaces, so that the same text is rasterized only once.
+    The surfaces are shared, so they should only be blitted, never modified.
+    :param max_size: int, the maximum number of surfaces kept
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, colour):
+        """
+        Get the text rendered with antialiasing, as a surface with per pixel alpha
+        :param font: pygame.font.Font
+        :param text: str
+        :param colour: tuple (R,G,B)
+        :return: pygame.Surface
+        """
+        key = (font, text, tuple(colour))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, True, colour).convert_alpha()
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# Shared by the Table and the UI elements
+TEXT_CACHE = TextCache()
+
+
+def render_text(font, text, colour):
+    return TEXT_CACHE.render(font, text, colour)
+
+
 class GenericUI:
     def __init__(self, x, y, width, height):
         self.draw_update = Signal()
@@ -12,7 +62,9 @@ class GenericUI:
         self.width = width
         self.height = height
         self.rect = pygame.rect.Rect(x, y, width, height)
-        self.visible = True
+        # Whether the element changed since it was last drawn on the screen
+        self.dirty = True
+        self._visible = True
         self.clear_colour = (0, 0, 0)
         self.outline_colour = (255, 0, 0)
         self.outline_thickness = 3
@@ -54,7 +106,29 @@ class GenericUI:
         rect_check = pygame.rect.Rect(x0, y0, self.rect.width, self.rect.height)
         return rect_check.collidepoint(pos)
 
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible):
+        if visible != self._visible:
+            self.dirty = True
+        self._visible = visible
+
+    def get_dirty_rect(self):
+        """
+        Report the area to redraw on the screen, if the element has changed since the last call.
+        An element being hidden is also reported, so that it is cleared.
+        :return: pygame.Rect or None
+        """
+        if self.dirty:
+            self.dirty = False
+            return self.rect.copy()
+        return None
+
     def redraw(self):
+        self.dirty = True
         self.background.fill(self.clear_colour)
 
     def get_pos(self):
@@ -88,7 +162,7 @@ class TextBox(GenericUI):
         #if self.visible:
         outline = (0, 0, self.rect.w, self.rect.h)
         pygame.draw.rect(self.background, self.outline_colour, outline, self.outline_thickness)
-        rendered_text = self.font.render(self.text, True, self.text_colour).convert_alpha()
+        rendered_text = render_text(self.font, self.text, self.text_colour)
         rect_center = self.background.get_rect().center
         text_rect = rendered_text.get_rect(center=rect_center)
         self.background.blit(rendered_text, text_rect)
@@ -112,13 +186,14 @@ class Button(TextBox):
 
     def redraw(self):
         if self.button_down:
+            self.dirty = True
             self.background.fill((255, 255, 255))
         else:
             super().redraw()
         #if self.visible:
         outline = (0, 0, self.rect.w, self.rect.h)
         pygame.draw.rect(self.background, self.outline_colour, outline, self.outline_thickness)
-        rendered_text = self.font.render(self.text, True, self.text_colour).convert_alpha()
+        rendered_text = render_text(self.font, self.text, self.text_colour)
         rect_center = self.background.get_rect().center
         text_rect = rendered_text.get_rect(center=rect_center)
         self.background.blit(rendered_text, text_rect)
@@ -174,7 +249,7 @@ class ScrollList(GenericUI):
         for text, text_rect in zip(self.texts, self.text_rects):
             if i == self.selected:
                 pygame.draw.rect(self.background, self.selected_colour, text_rect)
-            rendered_text = self.font.render(text, True, self.text_colour).convert_alpha()
+            rendered_text = render_text(self.font, text, self.text_colour)
 
             self.background.blit(rendered_text, text_rect)
             i += 1
@@ -234,7 +309,7 @@ class ScrollList(GenericUI):
         self.reset_scroll()
         self.texts.append(text)
         current_y = self.text_rects[-1].y + self.text_rects[-1].height
-        rendered_text = self.font.render(text, True, self.text_colour).convert_alpha()
+        rendered_text = render_text(self.font, text, self.text_colour)
         text_rect = rendered_text.get_rect()
         text_rect.x = 0
         text_rect.y = current_y
@@ -268,7 +343,7 @@ class ScrollList(GenericUI):
         current_y = self.outline_thickness
         self.selected = -1
         for text in texts:
-            rendered_text = self.font.render(text, True, self.text_colour).convert_alpha()
+            rendered_text = render_text(self.font, text, self.text_colour)
             text_rect = rendered_text.get_rect()
             text_rect.x = 0
             text_rect.y = current_y
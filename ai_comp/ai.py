@@ -9,10 +9,37 @@ AI possesses the table knowledge and the hand
 AI should not modify the player cards and table data. They are read only.
 """
 import random
-import cards
+from card_values import get_card_suit, get_card_number
+import bitboard
+import engine
+import table_snapshot
 import math
 
 
+def calc_win_points(card_num, n_cards):
+    """
+    Calculate the points which affects the bidding decision depending on which card is considered
+    and the number of card available
+    :param card_num: int 2-14
+    :param n_cards: int
+    :return: float score
+    """
+
+    num = max(0, card_num-10)
+
+    if not n_cards:
+        return 0
+
+    if num <= n_cards:
+        return math.exp(n_cards-1)-1
+
+    return 19.167/n_cards
+
+
+# The win points of every card number (index 0-14) and suit length (index 0-13)
+WIN_POINTS = [[calc_win_points(card_num, n_cards) for n_cards in range(14)] for card_num in range(15)]
+
+
 class BaseAI:
     """
     A base class for AI implementation.
@@ -20,6 +47,8 @@ class BaseAI:
     def __init__(self, table_status, player=None):
         self.player = player
         self.table_status = table_status
+        # The random number source, replaced by a seeding.SeedStream for seeded games
+        self.rng = random
 
     def connect_to_player(self, player):
         self.player = player
@@ -42,26 +71,33 @@ class BaseAI:
     def reset_memory(self):
         return
 
-    def get_valid_plays(self, leading):
-        all_plays = self.player.get_deck_values()
-        possible_plays = None
-        if leading:
-            if not self.table_status['trump broken']:
-                possible_plays = [card for card in all_plays
-                                  if not cards.get_card_suit(card) == self.table_status['trump suit']]
-        else:
-            leading_suit = self.table_status['played cards'][self.table_status["leading player"]].suit()
-            possible_plays = [card for card in all_plays
-                              if cards.get_card_suit(card) == leading_suit]
+    def close(self):
+        """
+        Release what the AI holds outside of the process, such as worker processes
+        :return: None
+        """
+        return
 
-        if not possible_plays:
-            return all_plays
-        return possible_plays
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_snapshot(self):
+        """
+        :return: table_snapshot.TableSnapshot, of the table status with the hand of the player
+        """
+        return table_snapshot.TableSnapshot.from_table_status(self.table_status, player=self.player.player_num,
+                                                              hand=self.player.get_hand_mask())
+
+    def get_valid_plays(self, leading):
+        return bitboard.to_values(engine.get_valid_plays(self.player.get_hand_mask(), leading, self.table_status))
 
 
 class RandomAI(BaseAI):
     def request_reshuffle(self):
-        if random.randint(0, 1):
+        if self.rng.randint(0, 1):
             return True
         return False
 
@@ -74,8 +110,7 @@ class RandomAI(BaseAI):
             current_round_bid = self.table_status["bid"] // 10
             current_suit_bid = self.table_status["bid"] % 10
             bid_threshold = int(current_round_bid*1.5 + current_suit_bid*0.5)
-            gen_bid = random.randint(0, bid_threshold)
-            print(gen_bid)
+            gen_bid = self.rng.randint(0, bid_threshold)
             if gen_bid <= 1:
                 if current_suit_bid == 5:
                     return (current_round_bid+1)*10 + 1
@@ -94,7 +129,7 @@ class RandomAI(BaseAI):
                 current_card = (i + 1) * 100 + j + 2
                 if current_card not in player_cards:
                     other_cards.append(current_card)
-        return random.choice(other_cards)
+        return self.rng.choice(other_cards)
 
     def make_a_play(self, sub_state):
         """
@@ -107,7 +142,7 @@ class RandomAI(BaseAI):
         else:
             valid_plays = self.get_valid_plays(False)
 
-        return random.choice(valid_plays)
+        return self.rng.choice(valid_plays)
 
 
 class VivianAI(RandomAI):
@@ -127,18 +162,20 @@ class VivianAI(RandomAI):
         self.unplayed_cards = []
         [self.unplayed_cards.append([i+2 for i in range(13)]) for _ in range(4)]
 
+        # The estimated wins of the hands seen since the last reset, by hand bitboard
+        self.estimate_cache = {}
+
     def request_reshuffle(self):
         return True
 
     def make_a_bid(self):
-        # TODO: execute estimate_wins only once
         # Be careful when getting max_bid as it is 0-index but suits are 1-index
         est_wins = self.estimate_wins()
         max_est = max(est_wins)
         max_bid = [math.ceil(est)-3 for est in est_wins]
         favourable_suit = [i+1 for i, est in enumerate(est_wins) if est == max_est]
         if len(favourable_suit) > 1:
-            favourable_suit = random.choice(favourable_suit)
+            favourable_suit = self.rng.choice(favourable_suit)
         else:
             favourable_suit = favourable_suit[0]
 
@@ -161,8 +198,8 @@ class VivianAI(RandomAI):
         :return: int - the card value
         """
         player_cards = self.player.get_deck_values()
-        card_suits = [cards.get_card_suit(crd) for crd in player_cards]
-        card_nums = [cards.get_card_number(crd) for crd in player_cards]
+        card_suits = [get_card_suit(crd) for crd in player_cards]
+        card_nums = [get_card_number(crd) for crd in player_cards]
         trump_suit = self.table_status["bid"] % 10
         trump_nums = [num for suit, num in zip(card_suits, card_nums) if suit == trump_suit]
 
@@ -181,7 +218,7 @@ class VivianAI(RandomAI):
         min_val = min(suit_values)
         weakest_suit = [i + 1 for i, val in enumerate(suit_values) if val == min_val]
         if len(weakest_suit) > 1:
-            weakest_suit = random.choice(weakest_suit)
+            weakest_suit = self.rng.choice(weakest_suit)
         else:
             weakest_suit = weakest_suit[0]
 
@@ -206,8 +243,8 @@ class VivianAI(RandomAI):
 
         n_cards = len(card_values)
         card_viability = [1] * n_cards
-        card_nums = [cards.get_card_number(play) for play in card_values]
-        card_suits = [cards.get_card_suit(play) for play in card_values]
+        card_nums = [get_card_number(play) for play in card_values]
+        card_suits = [get_card_suit(play) for play in card_values]
         high_cards = [max(card_set) + (i+1)*100 if card_set else 0 for i, card_set in enumerate(self.unplayed_cards)]
 
         suit_counts = [0] * 4
@@ -229,11 +266,11 @@ class VivianAI(RandomAI):
                 card_viability[i] += any([card_values[i] == card for card in high_cards]) * self.high_card_factor
         else:
             # Get the played cards
-            played_cards = [card.value if card else None for card in self.table_status["played cards"]]
-            played_nums = [cards.get_card_number(card) if card else 0 for card in played_cards]
-            played_suits = [cards.get_card_suit(card) if card else 0 for card in played_cards]
+            played_cards = self.table_status["played cards"]
+            played_nums = [get_card_number(card) if card else 0 for card in played_cards]
+            played_suits = [get_card_suit(card) if card else 0 for card in played_cards]
             leading_card = self.table_status["played cards"][self.table_status["leading player"]]
-            leading_suit = leading_card.suit()
+            leading_suit = get_card_suit(leading_card)
 
             # Find the highest number played,
             max_played_num = max([num for num, suit in zip(played_nums, played_suits) if suit == leading_suit])
@@ -268,25 +305,36 @@ class VivianAI(RandomAI):
 
         best_viability = max(card_viability)
         best_cards = [play for viability, play in zip(card_viability, card_values) if viability == best_viability]
-        return random.choice(best_cards)
+        return self.rng.choice(best_cards)
 
     def update_memory(self):
-        played_cards = [card.value for card in self.table_status["played cards"]]
-
-        for val in played_cards:
-            suit = cards.get_card_suit(val)
-            num = cards.get_card_number(val)
+        for val in self.table_status["played cards"]:
+            suit = get_card_suit(val)
+            num = get_card_number(val)
 
             self.unplayed_cards[suit-1].remove(num)
 
     def reset_memory(self):
         self.unplayed_cards = []
         [self.unplayed_cards.append([i+2 for i in range(13)]) for _ in range(4)]
+        self.estimate_cache.clear()
 
     def estimate_wins(self):
+        """
+        Estimate the number of wins for each trump call. The hand does not change during bidding,
+        so the estimates are cached by hand.
+        :return: list of 5 float
+        """
+        hand = self.player.get_hand_mask()
+        bids = self.estimate_cache.get(hand)
+        if bids is None:
+            bids = self.estimate_cache[hand] = self.calc_estimate_wins()
+        return list(bids)
+
+    def calc_estimate_wins(self):
         player_cards = self.player.get_deck_values()
-        card_suits = [cards.get_card_suit(crd) for crd in player_cards]
-        card_nums = [cards.get_card_number(crd) for crd in player_cards]
+        card_suits = [get_card_suit(crd) for crd in player_cards]
+        card_nums = [get_card_number(crd) for crd in player_cards]
 
         n_cards = []
         for i in range(4):
@@ -294,18 +342,23 @@ class VivianAI(RandomAI):
 
         bids = [0] * 5
         trump_points = [num-10 if num >= 10 else 0.001 for num in card_nums]
-        non_trump_points = [self.calc_win_points(num, n_cards[suit-1]) if num > 10 else 0.001
+        non_trump_points = [WIN_POINTS[num][n_cards[suit-1]] if num > 10 else 0.001
                             for (num, suit) in zip(card_nums, card_suits)]
 
+        # The points of each suit do not depend on the trump call
+        suit_trump_points = []
+        suit_non_trump_points = []
+        for suit in range(4):
+            valid_cards = [crd_suit == suit+1 for crd_suit in card_suits]
+            suit_trump_points.append(sum([pts for valid, pts in zip(valid_cards, trump_points) if valid]))
+            suit_non_trump_points.append(sum([pts for valid, pts in zip(valid_cards, non_trump_points) if valid]))
+
         for trump_call in range(5):
             for suit in range(4):
-                valid_cards = [crd_suit == suit+1 for crd_suit in card_suits]
                 if suit == trump_call:
-                    points = sum([pts for valid, pts in zip(valid_cards, trump_points) if valid])
-                    bids[trump_call] += points*n_cards[suit] * self.weigh1
+                    bids[trump_call] += suit_trump_points[suit]*n_cards[suit] * self.weigh1
                 else:
-                    points = sum([pts for valid, pts in zip(valid_cards, non_trump_points) if valid])
-                    bids[trump_call] += points*math.log(n_cards[suit]+1) * self.weigh2
+                    bids[trump_call] += suit_non_trump_points[suit]*math.log(n_cards[suit]+1) * self.weigh2
 
         return bids
 
@@ -317,20 +370,4 @@ class VivianAI(RandomAI):
         :param n_cards: int
         :return: float score
         """
-
-        num = max(0, card_num-10)
-
-        if not n_cards:
-            return 0
-
-        if num <= n_cards:
-            return math.exp(n_cards-1)-1
-
-        return 19.167/n_cards
-
-
-
-
-
-
-
+        return WIN_POINTS[card_num][n_cards]
@@ -0,0 +1,769 @@
+"""
+This file contains a double dummy solver, which finds the number of rounds a side can win
+when all the hands are known and every player plays perfectly.
+
+The hands are bitboards (see bitboard.py). The solver follows the rules of the game,
+including the trump broken rule: trump cannot be led until the trump is broken,
+unless the leading player has nothing but trump cards.
+
+The search is an alpha-beta search done as null window searches ("can the side win at least
+this many rounds?") around which a binary search finds the exact number. It uses:
+- Move ordering: cashing winners and leading towards the partner's winners, winning with the
+  lowest sure winner and playing low when the side is already winning
+- Equivalent cards: of the cards in a suit with no other card in between them, only one is searched
+- Equivalent low cards: once a card of a suit is searched, the other cards of the suit below the lowest
+  card which decided a round by its rank give the same result and are skipped
+- Quick tricks: the top cards the leading player can cash, and the rest of the suit once they have drawn
+  every other card of it, give a bound without searching
+- Trump bounds: a trump card which no higher trump card of the other side can beat wins its round
+- A transposition table of the bounds found at the start of each round. The key is a Zobrist hash of
+  the leader, the trump broken state and the suit lengths of each hand. Each entry only holds the owners
+  of the top cards of each suit down to the lowest card which decided a round by its rank, so an entry
+  also applies to the positions which only differ by the lower cards.
+
+The search runs at about 80,000 nodes a second in pure Python. On the deals of games between VivianAI players,
+half of the full deals take under 85,000 nodes, about a second, but some take millions, so each solve searches
+at most max_nodes nodes (300,000 by default, a few seconds), and raises SearchLimitReached with the bounds
+it found when it runs out. solve_table returns these bounds instead, so it always gives an answer, exact for
+almost nine in ten of these deals. Positions with few rounds left, such as the ones solved by the PIMC AI,
+take far fewer nodes.
+"""
+import random
+import bitboard
+import engine
+from game_consts import NUM_OF_PLAYERS
+
+SUIT_BITS = bitboard.SUIT_BITS
+SUIT_MASK = bitboard.SUIT_MASK
+SUIT_POPCOUNT = bitboard.SUIT_POPCOUNT
+SUIT_MASKS = bitboard.SUIT_MASKS
+BIT_SUITS = [i // SUIT_BITS + 1 for i in range(52)]
+BIT_NUMBERS = [i % SUIT_BITS + 2 for i in range(52)]
+# Mask of the bits above each bit within its suit
+BITS_ABOVE = [SUIT_MASKS[BIT_SUITS[i]] & ~((2 << i) - 1) for i in range(52)]
+TRUMP_STRENGTH = 20  # Added to the number of trump cards, so that they beat any other card
+
+# The owners of the cards of a suit, highest first, take 2 bits per card in the owner code of a position
+OWNER_BITS = 2
+CODE_SUIT_BITS = OWNER_BITS * SUIT_BITS
+
+# Zobrist keys, by player, suit and suit length. A separate RNG is used so that the game RNG is not affected.
+_zobrist_rng = random.Random(0x5eed)
+ZOBRIST_LENGTHS = [[[_zobrist_rng.getrandbits(64) for _ in range(SUIT_BITS + 1)] for _ in range(4)]
+                   for _ in range(NUM_OF_PLAYERS)]
+ZOBRIST_LEADER = [_zobrist_rng.getrandbits(64) for _ in range(NUM_OF_PLAYERS)]
+ZOBRIST_TRUMP_BROKEN = _zobrist_rng.getrandbits(64)
+
+# The most nodes searched by a solve by default, a few seconds of search
+DEFAULT_MAX_NODES = 300000
+
+
+class SearchLimitReached(Exception):
+    """
+    Raised when a solve runs out of nodes before finding the exact number of rounds
+    :param lower: int, the declarer side wins at least this many rounds
+    :param upper: int, and at most this many
+    """
+
+    def __init__(self, lower, upper):
+        super().__init__('The search limit was reached, the declarer side wins {0:d} to {1:d} rounds'.format(
+            lower, upper))
+        self.lower = lower
+        self.upper = upper
+
+
+class _NodeLimit(Exception):
+    pass
+
+
+def get_bits(mask):
+    """
+    :param mask: int
+    :return: list of int, the index of the bits set, lowest first
+    """
+    bits = []
+    while mask:
+        low_bit = mask & -mask
+        bits.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return bits
+
+
+def hands_union(hands):
+    return hands[0] | hands[1] | hands[2] | hands[3]
+
+
+class DoubleDummySolver:
+    """
+    The solver keeps its transposition table between solves, so solving several positions of
+    the same deal (e.g. every possible play) reuses the previous searches. The table is cleared
+    when the trump suit or the sides change, or when it grows beyond max_table_size entries.
+    Each solve searches at most max_nodes nodes, or any number of nodes if None.
+
+    Along with their result, the searches return the mask of the rank cards: in each suit, the owners
+    of the cards from the lowest rank card up decide the result. The owners of the lower cards do not
+    matter, as long as every hand has the same number of cards in the suit.
+    """
+
+    def __init__(self, max_table_size=1000000, max_nodes=DEFAULT_MAX_NODES):
+        self.max_table_size = max_table_size
+        self.max_nodes = max_nodes
+        self.transposition_table = {}
+        self.table_size = 0
+        self.nodes = 0
+        self.node_limit = float('inf')
+
+        self.hands = [0] * NUM_OF_PLAYERS
+        self.trump_suit = 5
+        self.trump_mask = 0
+        self.is_declarer = [False] * NUM_OF_PLAYERS
+        self.table_mask = 0
+        self.best_lead = -1
+        self._table_config = None
+        # Zobrist key and owner code of each suit, by the suit masks of the 4 hands
+        self._suit_info = {}
+
+    def solve(self, hands, trump_suit, leader, declarers, trump_broken=False, played_cards=None):
+        """
+        Find the number of rounds the declarer side wins from the given position with perfect play
+        :param hands: list of 4 int, the bitboard of each player's hand
+        :param trump_suit: int, 1-4, or 5 for No Trump
+        :param leader: int, the leading player of the current round
+        :param declarers: iterable of int, the players in the declarer side
+        :param trump_broken: bool
+        :param played_cards: list of 4 int, the cards already played in the current round, 0 if not played
+        :return: int, the number of rounds won by the declarer side, not counting the rounds already played
+        :raises SearchLimitReached: if more than max_nodes nodes are needed
+        """
+        self._set_position(hands, trump_suit, declarers)
+        if played_cards is None:
+            played_cards = [0] * NUM_OF_PLAYERS
+        n_played = sum(1 for card in played_cards if card)
+        remaining = bitboard.count(self.hands[leader]) + (n_played > 0)
+
+        lower = 0
+        upper = remaining
+        if self.max_nodes is not None:
+            self.node_limit = self.nodes + self.max_nodes
+        try:
+            while lower < upper:
+                target = (lower + upper + 1) // 2
+                if self._search_from(leader, played_cards, target, trump_broken):
+                    lower = target
+                else:
+                    upper = target - 1
+        except _NodeLimit:
+            # The hands are restored by the next solve
+            self.table_mask = 0
+            raise SearchLimitReached(lower, upper)
+        finally:
+            self.node_limit = float('inf')
+        return lower
+
+    def solve_table(self, hands, table_status, declarers):
+        """
+        Find the number of rounds the declarer side wins from the current position of a game.
+        Unlike solve, it gives the bounds found so far when the search limit is reached.
+        :param hands: list of 4 int, the bitboard of each player's hand
+        :param table_status: dict, see engine.new_table_status
+        :param declarers: iterable of int, the players in the declarer side
+        :return: (int, int), the least and most rounds won by the declarer side, not counting the rounds
+        already played. Both are the exact number if the search finished.
+        """
+        try:
+            n_rounds = self.solve(hands, table_status['trump suit'], table_status['leading player'], declarers,
+                                  table_status['trump broken'], table_status['played cards'])
+        except SearchLimitReached as limit:
+            return limit.lower, limit.upper
+        return n_rounds, n_rounds
+
+    def solve_plays(self, hands, trump_suit, leader, declarers, trump_broken=False, played_cards=None):
+        """
+        Find the number of rounds the declarer side wins after each valid play of the next player.
+        Each play is a solve of its own, with its own node limit.
+        :return: dict, card value to the number of rounds won by the declarer side
+        :raises SearchLimitReached: if a play needs more than max_nodes nodes
+        """
+        if played_cards is None:
+            played_cards = [0] * NUM_OF_PLAYERS
+        n_played = sum(1 for card in played_cards if card)
+        player = (leader + n_played) % NUM_OF_PLAYERS
+        hand = hands[player]
+
+        legal = engine.get_legal_plays(hand, played_cards[leader] // 100, trump_suit, trump_broken)
+
+        results = {}
+        for bit in get_bits(legal):
+            card = bitboard.bit_to_card(bit)
+            new_hands = list(hands)
+            new_hands[player] &= ~(1 << bit)
+            new_played = list(played_cards)
+            new_played[player] = card
+            new_trump_broken = trump_broken or BIT_SUITS[bit] == trump_suit
+            if n_played == NUM_OF_PLAYERS - 1:
+                winner = self._get_winner(new_played, leader, trump_suit)
+                won = winner in declarers
+                results[card] = won + self.solve(new_hands, trump_suit, winner, declarers, new_trump_broken)
+            else:
+                results[card] = self.solve(new_hands, trump_suit, leader, declarers, new_trump_broken,
+                                           new_played)
+        return results
+
+    def _get_winner(self, played_cards, leader, trump_suit):
+        lead_suit = played_cards[leader] // 100
+        strengths = [self._strength(card // 100, card % 100, lead_suit) for card in played_cards]
+        return strengths.index(max(strengths))
+
+    def _strength(self, suit, number, lead_suit):
+        if suit == self.trump_suit:
+            return TRUMP_STRENGTH + number
+        if suit == lead_suit:
+            return number
+        return 0
+
+    def _set_position(self, hands, trump_suit, declarers):
+        table_config = (trump_suit, tuple(sorted(set(declarers))))
+        if table_config != self._table_config or self.table_size > self.max_table_size:
+            self.transposition_table = {}
+            self.table_size = 0
+            self._table_config = table_config
+
+        self.hands = list(hands)
+        self.trump_suit = trump_suit
+        self.trump_mask = SUIT_MASKS[trump_suit]
+        self.is_declarer = [i in declarers for i in range(NUM_OF_PLAYERS)]
+        if len(self._suit_info) > self.max_table_size:
+            self._suit_info = {}
+
+    def _get_position(self, leader, trump_broken):
+        """
+        Get the Zobrist key of the position at the start of a round, and the owner code of its cards
+        :return: (int, int)
+        """
+        key = ZOBRIST_LEADER[leader]
+        if trump_broken:
+            key ^= ZOBRIST_TRUMP_BROKEN
+        code = 0
+        hand0, hand1, hand2, hand3 = self.hands
+        suit_info = self._suit_info
+        for suit in range(4):
+            shift = suit * SUIT_BITS
+            suit_hands = (suit, (hand0 >> shift) & SUIT_MASK, (hand1 >> shift) & SUIT_MASK,
+                          (hand2 >> shift) & SUIT_MASK, (hand3 >> shift) & SUIT_MASK)
+            info = suit_info.get(suit_hands)
+            if info is None:
+                suit_key = 0
+                for owner in range(NUM_OF_PLAYERS):
+                    suit_key ^= ZOBRIST_LENGTHS[owner][suit][SUIT_POPCOUNT[suit_hands[owner + 1]]]
+                suit_code = 0
+                position = 0
+                for bit in reversed(get_bits(suit_hands[1] | suit_hands[2] | suit_hands[3] | suit_hands[4])):
+                    owner = 0
+                    while not suit_hands[owner + 1] >> bit & 1:
+                        owner += 1
+                    suit_code |= owner << position
+                    position += OWNER_BITS
+                info = (suit_key, suit_code << (suit * CODE_SUIT_BITS))
+                suit_info[suit_hands] = info
+            key ^= info[0]
+            code |= info[1]
+        return key, code
+
+    def _lookup(self, key, code, target):
+        """
+        Find a transposition table entry which decides the null window search
+        :return: (bool, int), the result and the rank cards, or (None, int) with the best lead to try first
+        """
+        best_lead = -1
+        for entry in self.transposition_table.get(key, ()):
+            if code & entry[0] == entry[1]:
+                if entry[3] >= target:
+                    return True, self._get_rank_cards(entry[2])
+                if entry[4] < target:
+                    return False, self._get_rank_cards(entry[2])
+                best_lead = entry[5]
+        return None, best_lead
+
+    def _store(self, key, code, rank_cards, target, result, best_lead):
+        """
+        Store the result of a null window search in the transposition table
+        """
+        in_play = hands_union(self.hands)
+        mask = 0
+        counts = []
+        for suit in range(4):
+            suit_cards = rank_cards & SUIT_MASKS[suit + 1]
+            count = 0
+            if suit_cards:
+                # Every card in play from the lowest rank card up
+                higher_cards = in_play & ~((suit_cards & -suit_cards) - 1)
+                count = SUIT_POPCOUNT[(higher_cards >> (suit * SUIT_BITS)) & SUIT_MASK]
+                mask |= ((1 << (count * OWNER_BITS)) - 1) << (suit * CODE_SUIT_BITS)
+            counts.append(count)
+
+        entries = self.transposition_table.setdefault(key, [])
+        value = code & mask
+        for entry in entries:
+            if entry[0] == mask and entry[1] == value:
+                break
+        else:
+            entry = [mask, value, counts, 0, bitboard.count(in_play) // NUM_OF_PLAYERS, best_lead]
+            entries.append(entry)
+            self.table_size += 1
+        if result:
+            entry[3] = max(entry[3], target)
+        else:
+            entry[4] = min(entry[4], target - 1)
+        entry[5] = best_lead
+
+    def _get_rank_cards(self, counts):
+        """
+        Get the rank cards of the current position from the number of top cards of each suit
+        :param counts: list of int, the number of top cards by suit
+        :return: int
+        """
+        in_play = hands_union(self.hands)
+        rank_cards = 0
+        for suit in range(4):
+            count = counts[suit]
+            if count:
+                suit_cards = in_play & SUIT_MASKS[suit + 1]
+                for _ in range(count - 1):
+                    suit_cards ^= 1 << (suit_cards.bit_length() - 1)
+                rank_cards |= 1 << (suit_cards.bit_length() - 1)
+        return rank_cards
+
+    def _search_from(self, leader, played_cards, target, trump_broken):
+        """
+        Start the search in the middle of a round if any card is played
+        """
+        n_played = sum(1 for card in played_cards if card)
+        if n_played == 0:
+            return self._search_round(leader, target, trump_broken)[0]
+
+        self.table_mask = 0
+        lead_suit = played_cards[leader] // 100
+        win_player = leader
+        win_strength = -1
+        for i in range(n_played):
+            player = (leader + i) % NUM_OF_PLAYERS
+            card = played_cards[player]
+            self.table_mask |= bitboard.card_mask(card)
+            strength = self._strength(card // 100, card % 100, lead_suit)
+            if strength > win_strength:
+                win_player = player
+                win_strength = strength
+
+        result = self._search_play((leader + n_played) % NUM_OF_PLAYERS, n_played, lead_suit,
+                                   win_player, win_strength, target, trump_broken)[0]
+        self.table_mask = 0
+        return result
+
+    def _search_round(self, leader, target, trump_broken):
+        """
+        Null window search at the start of a round
+        :return: (bool, int), whether the declarer side can win at least target rounds, and the rank cards
+        """
+        if target <= 0:
+            return True, 0
+        hands = self.hands
+        remaining = bin(hands[leader]).count('1')
+        if target > remaining:
+            return False, 0
+        if remaining == 1:
+            return self._last_round(leader)
+
+        key, code = self._get_position(leader, trump_broken)
+        result, best_lead = self._lookup(key, code, target)
+        if result is not None:
+            return result, best_lead
+
+        quick_tricks, rank_cards = self._quick_tricks(leader, trump_broken)
+        entry_tricks, entry_rank_cards = self._entry_tricks(leader, trump_broken)
+        if entry_tricks > quick_tricks:
+            quick_tricks, rank_cards = entry_tricks, entry_rank_cards
+        if self.is_declarer[leader]:
+            if quick_tricks >= target:
+                return True, rank_cards
+        elif remaining - quick_tricks < target:
+            return False, rank_cards
+
+        if self.trump_mask:
+            result = self._trump_tricks_cutoff(target, remaining)
+            if result is not None:
+                return result
+
+        self.best_lead = best_lead
+        result, rank_cards = self._search_play(leader, 0, 0, leader, -1, target, trump_broken)
+        if result == self.is_declarer[leader]:
+            # The lead which gave the cutoff is tried first the next time
+            best_lead = self.best_lead
+        self._store(key, code, rank_cards, target, result, best_lead)
+        return result, rank_cards
+
+    def _trump_tricks_cutoff(self, target, remaining):
+        """
+        A trump card only loses its round to a higher trump card of the other side played in the same round,
+        and the cards of a player are played in different rounds. So the trump cards of a player which cannot
+        each be matched with a higher trump card of the other side win their rounds for the side, whatever is
+        played, which gives a bound on both sides
+        :return: (bool, int), the result and the rank cards if the bounds decide the search, else None
+        """
+        hands = self.hands
+        trump_mask = self.trump_mask
+        is_declarer = self.is_declarer
+        side_trumps = [0, 0]
+        for player in range(NUM_OF_PLAYERS):
+            side_trumps[is_declarer[player]] |= hands[player] & trump_mask
+        if not side_trumps[0] and not side_trumps[1]:
+            return None
+        # The rounds needed by each side to decide the search
+        needed = [remaining - target + 1, target]
+        for side in (True, False):
+            other_trumps = side_trumps[not side]
+            lowest_trump = 0
+            for player in range(NUM_OF_PLAYERS):
+                trumps = hands[player] & trump_mask
+                if not trumps or is_declarer[player] != side:
+                    continue
+                # The cards above the top trump card of the other side win, as long as it stays with the other side
+                top_cards = trumps & ~((1 << other_trumps.bit_length()) - 1)
+                if bin(top_cards).count('1') >= needed[side]:
+                    return side, 1 << (other_trumps.bit_length() - 1) if other_trumps else 0
+                # Match each trump card with the lowest higher trump card of the other side left
+                unmatched = 0
+                higher_trumps = other_trumps
+                cards = trumps
+                while cards:
+                    card = cards & -cards
+                    cards ^= card
+                    higher = higher_trumps & -(card << 1)
+                    if higher:
+                        higher_trumps ^= higher & -higher
+                    else:
+                        unmatched += 1
+                if unmatched >= needed[side]:
+                    lowest_trump = trumps & -trumps
+            if lowest_trump:
+                # The owners of the trump cards from the lowest trump card of the player up decide the matching
+                return side, lowest_trump
+        return None
+
+    def _last_round(self, leader):
+        """
+        Play out the last round, in which every player has a single card
+        :return: (bool, int), whether the declarer side wins the round, and the rank cards
+        """
+        self.nodes += 1
+        hands = self.hands
+        lead_suit = BIT_SUITS[hands[leader].bit_length() - 1]
+        trump_suit = self.trump_suit
+        win_player = leader
+        win_strength = -1
+        for player in range(NUM_OF_PLAYERS):
+            bit = hands[player].bit_length() - 1
+            suit = BIT_SUITS[bit]
+            if suit == trump_suit:
+                strength = TRUMP_STRENGTH + BIT_NUMBERS[bit]
+            elif suit == lead_suit:
+                strength = BIT_NUMBERS[bit]
+            else:
+                strength = 0
+            if strength > win_strength:
+                win_player = player
+                win_strength = strength
+        win_card = hands[win_player]
+        round_cards = hands_union(hands)
+        # The winning card only wins by its rank if another card of its suit is played
+        if round_cards & SUIT_MASKS[BIT_SUITS[win_card.bit_length() - 1]] == win_card:
+            win_card = 0
+        return self.is_declarer[win_player], win_card
+
+    def _quick_tricks(self, leader, trump_broken):
+        """
+        Count the rounds the leading player surely wins by leading the top cards of each suit,
+        as long as the opponents can neither beat them nor trump them
+        :return: (int, int), the number of rounds and the rank cards
+        """
+        hands = self.hands
+        hand = hands[leader]
+        in_play = hands[0] | hands[1] | hands[2] | hands[3]
+        trump_mask = self.trump_mask
+        opponents_with_trump = [hands[player] for player in range(NUM_OF_PLAYERS)
+                                if self.is_declarer[player] != self.is_declarer[leader] and hands[player] & trump_mask]
+        can_lead_trump = trump_broken or not hand & ~trump_mask
+
+        quick_tricks = 0
+        rank_cards = 0
+        for suit in range(1, 5):
+            suit_mask = SUIT_MASKS[suit]
+            if not hand & suit_mask or (suit == self.trump_suit and not can_lead_trump):
+                continue
+            suit_cards = in_play & suit_mask
+            top_cards = []
+            while suit_cards:
+                high_card = 1 << (suit_cards.bit_length() - 1)
+                if not high_card & hand:
+                    break
+                top_cards.append(high_card)
+                suit_cards ^= high_card
+            n_top_cards = len(top_cards)
+            if not n_top_cards:
+                continue
+            n_tricks = n_top_cards
+            # Once the top cards have drawn every other card of the suit, the rest of the hand wins too
+            if all(bitboard.suit_length(hands[other], suit) <= n_top_cards
+                   for other in range(NUM_OF_PLAYERS) if other != leader):
+                n_tricks = bitboard.suit_length(hand, suit)
+            if suit != self.trump_suit:
+                for opponent in opponents_with_trump:
+                    n_tricks = min(n_tricks, bitboard.suit_length(opponent, suit))
+            if n_tricks:
+                quick_tricks += n_tricks
+                rank_cards |= top_cards[min(n_tricks, n_top_cards) - 1]
+        return quick_tricks, rank_cards
+
+    def _entry_tricks(self, leader, trump_broken):
+        """
+        Count the rounds the leading player's side surely wins by leading a low card to the top card
+        of a partner, as long as the opponents cannot trump it, then leading the top cards of the partner
+        :return: (int, int), the number of rounds and the rank cards
+        """
+        hands = self.hands
+        hand = hands[leader]
+        in_play = hands[0] | hands[1] | hands[2] | hands[3]
+        trump_mask = self.trump_mask
+        side = self.is_declarer[leader]
+        opponents_with_trump = [hands[player] for player in range(NUM_OF_PLAYERS)
+                                if self.is_declarer[player] != side and hands[player] & trump_mask]
+        can_lead_trump = trump_broken or not hand & ~trump_mask
+
+        for partner in range(NUM_OF_PLAYERS):
+            if partner == leader or self.is_declarer[partner] != side:
+                continue
+            for suit in range(1, 5):
+                suit_mask = SUIT_MASKS[suit]
+                if not hand & suit_mask or (suit == self.trump_suit and not can_lead_trump):
+                    continue
+                top_card = 1 << ((in_play & suit_mask).bit_length() - 1)
+                if not hands[partner] & top_card:
+                    continue
+                if suit != self.trump_suit and any(not opponent & suit_mask for opponent in opponents_with_trump):
+                    continue
+                # The partner wins the round with the top card, then cashes the other top cards
+                return self._quick_tricks(partner, trump_broken)
+        return 0, 0
+
+    def _search_play(self, player, n_played, lead_suit, win_player, win_strength, target, trump_broken):
+        """
+        Null window search on the play of a player within a round
+        :return: (bool, int), whether the declarer side can win at least target rounds, and the rank cards
+        """
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise _NodeLimit()
+        hands = self.hands
+        hand = hands[player]
+        trump_suit = self.trump_suit
+
+        legal = engine.get_legal_plays(hand, lead_suit, trump_suit, trump_broken)
+
+        maximising = self.is_declarer[player]
+        next_player = (player + 1) % NUM_OF_PLAYERS
+
+        moves, sequences = self._order_moves(player, legal, n_played, lead_suit, win_player, win_strength)
+        if n_played == 0 and self.best_lead in moves:
+            moves.remove(self.best_lead)
+            moves.insert(0, self.best_lead)
+
+        all_rank_cards = 0
+        equivalent = 0
+        for bit in moves:
+            card_mask = 1 << bit
+            if card_mask & equivalent:
+                continue
+            suit = BIT_SUITS[bit]
+            number = BIT_NUMBERS[bit]
+            hands[player] = hand ^ card_mask
+
+            new_win_player = win_player
+            new_win_strength = win_strength
+            if n_played == 0:
+                new_lead_suit = suit
+                new_win_player = player
+                new_win_strength = number + TRUMP_STRENGTH * (suit == trump_suit)
+            else:
+                new_lead_suit = lead_suit
+                if suit == trump_suit:
+                    strength = TRUMP_STRENGTH + number
+                elif suit == lead_suit:
+                    strength = number
+                else:
+                    strength = 0
+                if strength > new_win_strength:
+                    new_win_player = player
+                    new_win_strength = strength
+            new_trump_broken = trump_broken or suit == trump_suit
+
+            if n_played == NUM_OF_PLAYERS - 1:
+                round_cards = self.table_mask | card_mask
+                self.table_mask = 0
+                result, rank_cards = self._search_round(new_win_player, target - self.is_declarer[new_win_player],
+                                                        new_trump_broken)
+                self.table_mask = round_cards ^ card_mask
+                # The winning card is a rank card if it wins by its rank over another card of its suit
+                if new_win_strength > TRUMP_STRENGTH:
+                    win_suit = trump_suit
+                    win_card = 1 << ((win_suit - 1) * SUIT_BITS + new_win_strength - TRUMP_STRENGTH - 2)
+                else:
+                    win_suit = lead_suit
+                    win_card = 1 << ((win_suit - 1) * SUIT_BITS + new_win_strength - 2)
+                if round_cards & SUIT_MASKS[win_suit] != win_card:
+                    rank_cards |= win_card
+            else:
+                self.table_mask |= card_mask
+                result, rank_cards = self._search_play(next_player, n_played + 1, new_lead_suit, new_win_player,
+                                                       new_win_strength, target, new_trump_broken)
+                self.table_mask ^= card_mask
+
+            hands[player] = hand
+
+            if result == maximising:
+                if n_played == 0:
+                    self.best_lead = bit
+                return result, rank_cards
+            all_rank_cards |= rank_cards
+            # The owners of the cards below the lowest rank card of the suit do not matter, so playing
+            # any other card of the suit below it gives the same result
+            suit_rank_cards = rank_cards & SUIT_MASKS[suit]
+            lowest_rank_card = suit_rank_cards & -suit_rank_cards
+            if not suit_rank_cards:
+                equivalent |= SUIT_MASKS[suit]
+            elif card_mask < lowest_rank_card:
+                equivalent |= (lowest_rank_card - 1) & SUIT_MASKS[suit]
+
+        # The cards skipped as equivalent to a searched card are only equivalent in the other positions
+        # if their sequence is either fully above or fully below the lowest rank card of the suit
+        for top_bit, bottom_bit in sequences:
+            suit_cards = all_rank_cards & SUIT_MASKS[BIT_SUITS[top_bit]]
+            if suit_cards and 1 << top_bit >= suit_cards & -suit_cards:
+                all_rank_cards |= 1 << bottom_bit
+        return not maximising, all_rank_cards
+
+    def _order_moves(self, player, legal, n_played, lead_suit, win_player, win_strength):
+        """
+        Pick one card from each group of equivalent cards and order them with the likely best first
+        :return: (list of int, list of (int, int)), the bits of the cards to search, and the highest and
+        lowest bits of each group of more than one card, highest first
+        """
+        hands = self.hands
+        in_play = hands[0] | hands[1] | hands[2] | hands[3] | self.table_mask
+        trump_suit = self.trump_suit
+        trump_mask = self.trump_mask
+        side = self.is_declarer[player]
+        hand = hands[player]
+
+        # Keep the highest card of each sequence of cards
+        moves = []
+        sequences = []
+        bottom_bit = -1
+        for bit in get_bits(legal):
+            if bottom_bit < 0:
+                bottom_bit = bit
+            above = in_play & BITS_ABOVE[bit]
+            if not above & -above & legal:
+                moves.append(bit)
+                if bottom_bit != bit:
+                    sequences.append((bit, bottom_bit))
+                bottom_bit = -1
+        sequences.reverse()
+        if len(moves) == 1:
+            return moves, sequences
+
+        scores = {}
+        if n_played == 0:
+            is_declarer = self.is_declarer
+            suit_scores = {}
+            for bit in moves:
+                suit = BIT_SUITS[bit]
+                suit_score = suit_scores.get(suit)
+                if suit_score is None:
+                    suit_mask = SUIT_MASKS[suit]
+                    opponent_ruffs = False
+                    partner_ruffs = False
+                    if suit != trump_suit:
+                        for other in range(NUM_OF_PLAYERS):
+                            if other != player and hands[other] & trump_mask and not hands[other] & suit_mask:
+                                if is_declarer[other] == side:
+                                    partner_ruffs = True
+                                else:
+                                    opponent_ruffs = True
+                    top_card = 1 << ((in_play & suit_mask).bit_length() - 1)
+                    if opponent_ruffs:
+                        suit_score = (0, 0)
+                    elif suit == trump_suit and not any(hands[other] & trump_mask for other in range(NUM_OF_PLAYERS)
+                                                        if is_declarer[other] != side):
+                        # The trump cards win whenever they are played, and can ruff until then
+                        suit_score = (0, 0)
+                    elif top_card & hand:
+                        suit_score = (20, top_card)
+                    else:
+                        top_owner = 0
+                        while not hands[top_owner] & top_card:
+                            top_owner += 1
+                        if is_declarer[top_owner] == side:
+                            # Lead low towards the partner's winner
+                            suit_score = (80, 0)
+                        elif suit == trump_suit:
+                            suit_score = (0, 0)
+                        elif partner_ruffs:
+                            suit_score = (60, 0)
+                        else:
+                            suit_score = (20, 0)
+                    suit_scores[suit] = suit_score
+                if suit_score[1] >> bit == 1:
+                    # Cash the winner
+                    scores[bit] = 100
+                else:
+                    scores[bit] = suit_score[0] - BIT_NUMBERS[bit]
+        else:
+            # The strongest card the opponents yet to play can put on the round
+            lead_mask = SUIT_MASKS[lead_suit]
+            best_opponent = 0
+            for i in range(1, NUM_OF_PLAYERS - n_played):
+                other = (player + i) % NUM_OF_PLAYERS
+                if self.is_declarer[other] == side:
+                    continue
+                other_hand = hands[other]
+                if other_hand & lead_mask:
+                    strength = BIT_NUMBERS[(other_hand & lead_mask).bit_length() - 1]
+                    strength += TRUMP_STRENGTH * (lead_suit == trump_suit)
+                elif other_hand & trump_mask:
+                    strength = TRUMP_STRENGTH + BIT_NUMBERS[(other_hand & trump_mask).bit_length() - 1]
+                else:
+                    strength = 0
+                best_opponent = max(best_opponent, strength)
+
+            side_winning = self.is_declarer[win_player] == side
+            if side_winning and win_strength > best_opponent:
+                # Play low, the round is won already
+                for bit in moves:
+                    scores[bit] = -BIT_NUMBERS[bit] - TRUMP_STRENGTH * (BIT_SUITS[bit] == trump_suit)
+            else:
+                for bit in moves:
+                    suit = BIT_SUITS[bit]
+                    if suit == trump_suit:
+                        strength = TRUMP_STRENGTH + BIT_NUMBERS[bit]
+                    elif suit == lead_suit:
+                        strength = BIT_NUMBERS[bit]
+                    else:
+                        strength = 0
+                    if strength > win_strength and strength > best_opponent:
+                        # Win the round with the lowest sure winner
+                        scores[bit] = 100 - strength
+                    elif strength > win_strength and not side_winning:
+                        scores[bit] = -strength
+                    else:
+                        scores[bit] = 50 - BIT_NUMBERS[bit] - TRUMP_STRENGTH * (suit == trump_suit)
+        moves.sort(key=scores.__getitem__, reverse=True)
+        return moves, sequences
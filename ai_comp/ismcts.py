@@ -0,0 +1,174 @@
+"""
+This file contains the Information Set Monte Carlo Tree Search (ISMCTS) AI.
+A single tree of plays is grown from the player's point of view. Each iteration samples a deal
+consistent with what the player knows (see pimc.SamplingAI), and walks the tree using only the plays
+that are valid in that deal, so the statistics are shared across all the sampled deals.
+The rest of the game is played out with the greedy policy of the PIMC AI.
+
+The search stops when the node count or the time budget is reached, and the most visited play is picked.
+"""
+import math
+import random
+import time
+import bitboard
+import engine
+from ai_comp import pimc
+from ai_comp.double_dummy import BIT_SUITS, get_bits
+from game_consts import NUM_OF_PLAYERS
+
+
+class Node:
+    """
+    A play in the tree
+    :param move: int, the bit of the card played, -1 for the root
+    :param player: int, the player making the play
+    """
+    __slots__ = ('move', 'player', 'children', 'tried', 'visits', 'reward', 'avail')
+
+    def __init__(self, move=-1, player=-1):
+        self.move = move
+        self.player = player
+        self.children = []
+        self.tried = 0  # Bitboard of the moves of the children
+        self.visits = 0
+        self.reward = 0.0  # Total reward for the side of the player
+        self.avail = 1  # Number of times the play was available when selecting
+
+
+class ISMCTSAI(pimc.SamplingAI):
+    """
+    Plays with Information Set Monte Carlo Tree Search.
+    :param time_budget: float, the seconds to spend on each play
+    :param max_nodes: int, the maximum number of nodes in the tree for each play
+    :param exploration: float, the exploration constant of the UCB formula
+    """
+
+    def __init__(self, table_status, player=None, time_budget=1.0, max_nodes=100000, exploration=0.7):
+        super().__init__(table_status, player=player)
+        self.time_budget = time_budget
+        self.max_nodes = max_nodes
+        self.exploration = exploration
+        self.last_iterations = 0
+
+    def make_a_play(self, sub_state):
+        """
+
+        :param sub_state:
+        :return: int - card value
+        """
+        self.record_first_leader()
+        valid_plays = self.get_valid_plays(sub_state == 0)
+        if len(valid_plays) == 1:
+            return valid_plays[0]
+
+        root = self.search(self.get_knowledge(valid_plays))
+        most_visits = max(child.visits for child in root.children)
+        best_cards = [bitboard.bit_to_card(child.move) for child in root.children if child.visits == most_visits]
+        return self.rng.choice(best_cards)
+
+    def search(self, knowledge):
+        """
+        Grow the tree from the current position until the budget is used up
+        :param knowledge: dict, see SamplingAI.get_knowledge
+        :return: Node, the root of the tree
+        """
+        deadline = time.perf_counter() + self.time_budget
+        rng = random.Random(self.rng.getrandbits(64))
+        unseen = get_bits(knowledge['unseen'])
+        trump_suit = knowledge['trump suit']
+        rounds_left = knowledge['rounds left']
+        exploration = self.exploration
+
+        start_played = knowledge['played cards']
+        start_n_played = sum(1 for card in start_played if card)
+        start_leader = knowledge['leading player']
+        start_lead_suit = start_played[start_leader] // 100
+        start_win_player = start_leader
+        start_win_strength = -1
+        for i in range(start_n_played):
+            player = (start_leader + i) % NUM_OF_PLAYERS
+            strength = pimc.get_strength(bitboard.card_to_bit(start_played[player]), start_lead_suit, trump_suit)
+            if strength > start_win_strength:
+                start_win_player = player
+                start_win_strength = strength
+
+        root = Node()
+        n_nodes = 1
+        self.last_iterations = 0
+        while n_nodes < self.max_nodes and (self.last_iterations == 0 or time.perf_counter() < deadline):
+            hands, declarers = pimc.sample_deal(rng, unseen, knowledge)
+            played_cards = list(start_played)
+            n_played = start_n_played
+            leader = start_leader
+            lead_suit = start_lead_suit
+            win_player = start_win_player
+            win_strength = start_win_strength
+            trump_broken = knowledge['trump broken']
+            cards_left = sum(bitboard.count(hand) for hand in hands)
+            declarer_wins = 0
+
+            # Selection and expansion, down to the first play not in the tree
+            node = root
+            path = [root]
+            while cards_left:
+                player = (leader + n_played) % NUM_OF_PLAYERS
+                legal = engine.get_legal_plays(hands[player], lead_suit, trump_suit, trump_broken)
+                untried = legal & ~node.tried
+                if untried:
+                    move = rng.choice(get_bits(untried))
+                    child = Node(move, player)
+                    node.children.append(child)
+                    node.tried |= 1 << move
+                    n_nodes += 1
+                else:
+                    best_score = -1
+                    child = None
+                    for other in node.children:
+                        if legal >> other.move & 1:
+                            other.avail += 1
+                            score = other.reward / other.visits + \
+                                exploration * math.sqrt(math.log(other.avail) / other.visits)
+                            if score > best_score:
+                                best_score = score
+                                child = other
+                    move = child.move
+
+                # Play the move in the sampled deal
+                hands[player] ^= 1 << move
+                played_cards[player] = bitboard.bit_to_card(move)
+                cards_left -= 1
+                if n_played == 0:
+                    lead_suit = BIT_SUITS[move]
+                strength = pimc.get_strength(move, lead_suit, trump_suit)
+                if strength > win_strength:
+                    win_player = player
+                    win_strength = strength
+                trump_broken = trump_broken or BIT_SUITS[move] == trump_suit
+                n_played += 1
+                if n_played == NUM_OF_PLAYERS:
+                    declarer_wins += win_player in declarers
+                    leader = win_player
+                    played_cards = [0] * NUM_OF_PLAYERS
+                    n_played = 0
+                    lead_suit = 0
+                    win_strength = -1
+
+                path.append(child)
+                node = child
+                if untried:
+                    break
+
+            # Simulation
+            if cards_left:
+                declarer_wins += pimc.play_out(hands, trump_suit, leader, played_cards, trump_broken, declarers)
+
+            # Backpropagation
+            declarer_reward = declarer_wins / rounds_left
+            for node in path:
+                node.visits += 1
+                if node.player in declarers:
+                    node.reward += declarer_reward
+                else:
+                    node.reward += 1 - declarer_reward
+            self.last_iterations += 1
+        return root
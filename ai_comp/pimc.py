@@ -0,0 +1,402 @@
+"""
+This file contains the Perfect Information Monte Carlo (PIMC) AI.
+To make a play, the AI samples deals of the unseen cards consistent with what it knows:
+its own hand, the cards played so far, the suits the other players are known to be void in
+and the partner card. Each valid play is scored on every sample, either exactly by the
+double dummy solver when few rounds are left, or by playing the rest of the game out with a
+simple greedy policy. The play with the best average number of rounds for its side is picked.
+
+The samples are spread over a pool of worker processes, and each decision takes at most
+about time_budget seconds.
+"""
+import os
+import random
+import time
+import weakref
+import multiprocessing
+import bitboard
+import engine
+from ai_comp import ai
+from ai_comp.double_dummy import DoubleDummySolver, SearchLimitReached, SUIT_MASKS, BIT_SUITS, BIT_NUMBERS, \
+    TRUMP_STRENGTH, get_bits
+from game_consts import NUM_OF_PLAYERS
+
+# Attempts at dealing a sample before the void constraints are dropped
+MAX_DEAL_ATTEMPTS = 20
+# The most nodes searched to solve a sample, the samples which need more are played out instead
+SOLVE_MAX_NODES = 50000
+
+
+def get_strength(bit, lead_suit, trump_suit):
+    suit = BIT_SUITS[bit]
+    if suit == trump_suit:
+        return TRUMP_STRENGTH + BIT_NUMBERS[bit]
+    if suit == lead_suit:
+        return BIT_NUMBERS[bit]
+    return 0
+
+
+def lowest_card(cards, trump_suit):
+    """
+    :param cards: int, bitboard of the cards to choose from
+    :param trump_suit: int
+    :return: int, the bit of the lowest card, trump cards only if there is nothing else
+    """
+    non_trump = cards & ~SUIT_MASKS[trump_suit]
+    if non_trump:
+        cards = non_trump
+    return min(get_bits(cards), key=BIT_NUMBERS.__getitem__)
+
+
+def greedy_play(hand, in_play, n_played, lead_suit, win_strength, side_winning, trump_suit, trump_broken):
+    """
+    The play of a simple policy used to play out the samples: cash the top cards when leading,
+    win with the lowest card possible when following, and play low otherwise
+    :param hand: int, bitboard of the hand
+    :param in_play: int, bitboard of all the cards not played yet, including those in the hand
+    :param n_played: int, number of cards played in the round
+    :param lead_suit: int, 0 when leading
+    :param win_strength: int, the strength of the card winning the round so far
+    :param side_winning: bool, whether the player's side is winning the round so far
+    :param trump_suit: int
+    :param trump_broken: bool
+    :return: int, the bit of the card played
+    """
+    legal = engine.get_legal_plays(hand, lead_suit, trump_suit, trump_broken)
+    if n_played == 0:
+        for suit in range(1, 5):
+            suit_cards = in_play & SUIT_MASKS[suit]
+            if suit_cards and legal & suit_cards:
+                top_card = 1 << (suit_cards.bit_length() - 1)
+                if legal & top_card:
+                    return top_card.bit_length() - 1
+        return lowest_card(legal, trump_suit)
+
+    if not side_winning:
+        winning_bits = [bit for bit in get_bits(legal) if get_strength(bit, lead_suit, trump_suit) > win_strength]
+        if winning_bits:
+            return min(winning_bits, key=lambda bit: get_strength(bit, lead_suit, trump_suit))
+    return lowest_card(legal, trump_suit)
+
+
+def play_out(hands, trump_suit, leader, played_cards, trump_broken, declarers):
+    """
+    Play the rest of the game with the greedy policy
+    :param hands: list of 4 int, bitboards of the hands, modified in place
+    :param trump_suit: int
+    :param leader: int, the leading player of the current round
+    :param played_cards: list of 4 int, the cards played in the current round, 0 if not played
+    :param trump_broken: bool
+    :param declarers: set of int
+    :return: int, the number of rounds won by the declarer side, including the current round
+    """
+    declarer_wins = 0
+    played_cards = list(played_cards)
+    while True:
+        n_played = sum(1 for card in played_cards if card)
+        lead_suit = played_cards[leader] // 100
+        in_play = hands[0] | hands[1] | hands[2] | hands[3]
+        win_player = leader
+        win_strength = -1
+        for i in range(n_played):
+            player = (leader + i) % NUM_OF_PLAYERS
+            strength = get_strength(bitboard.card_to_bit(played_cards[player]), lead_suit, trump_suit)
+            if strength > win_strength:
+                win_player = player
+                win_strength = strength
+
+        for i in range(n_played, NUM_OF_PLAYERS):
+            player = (leader + i) % NUM_OF_PLAYERS
+            side_winning = i > 0 and (win_player in declarers) == (player in declarers)
+            bit = greedy_play(hands[player], in_play, i, lead_suit, win_strength, side_winning,
+                              trump_suit, trump_broken)
+            hands[player] ^= 1 << bit
+            played_cards[player] = bitboard.bit_to_card(bit)
+            if i == 0:
+                lead_suit = BIT_SUITS[bit]
+            strength = get_strength(bit, lead_suit, trump_suit)
+            if strength > win_strength:
+                win_player = player
+                win_strength = strength
+            trump_broken = trump_broken or BIT_SUITS[bit] == trump_suit
+
+        declarer_wins += win_player in declarers
+        if not hands[win_player]:
+            return declarer_wins
+        leader = win_player
+        played_cards = [0] * NUM_OF_PLAYERS
+
+
+def deal_sample(rng, unseen, hands, hand_sizes, allowed):
+    """
+    Deal the unseen cards to the other players
+    :param rng: random.Random
+    :param unseen: list of int, the bits of the unseen cards
+    :param hands: list of 4 int, the known hands, 0 for the other players
+    :param hand_sizes: list of 4 int, the number of cards to deal to each player
+    :param allowed: list of 4 int, bitboard of the cards each player may hold
+    :return: list of 4 int, or None if the constraints could not be met
+    """
+    hands = list(hands)
+    space = list(hand_sizes)
+    # The cards with the fewest possible owners are dealt first
+    owners = [[player for player in range(NUM_OF_PLAYERS) if space[player] and allowed[player] >> bit & 1]
+              for bit in unseen]
+    order = sorted(range(len(unseen)), key=lambda i: (len(owners[i]), rng.random()))
+    for i in order:
+        candidates = [player for player in owners[i] if space[player]]
+        if not candidates:
+            return None
+        # Weighted by the space left, so that the deal is close to uniform
+        pick = rng.randrange(sum(space[player] for player in candidates))
+        for player in candidates:
+            pick -= space[player]
+            if pick < 0:
+                break
+        hands[player] |= 1 << unseen[i]
+        space[player] -= 1
+    return hands
+
+
+def sample_deal(rng, unseen, knowledge):
+    """
+    Deal the unseen cards consistently with the knowledge of the player
+    :param rng: random.Random
+    :param unseen: list of int, the bits of the unseen cards
+    :param knowledge: dict, see SamplingAI.get_knowledge
+    :return: (list of 4 int, set of int), the hands and the players in the declarer side
+    """
+    hands = None
+    for _ in range(MAX_DEAL_ATTEMPTS):
+        hands = deal_sample(rng, unseen, knowledge['hands'], knowledge['hand sizes'], knowledge['allowed'])
+        if hands:
+            break
+    if not hands:
+        # The inferred voids cannot be met, which can only happen with inconsistent knowledge
+        hands = deal_sample(rng, unseen, knowledge['hands'], knowledge['hand sizes'],
+                            [bitboard.FULL_HAND] * NUM_OF_PLAYERS)
+
+    declarers = {knowledge['declarer']}
+    if knowledge['partner'] is not None:
+        declarers.add(knowledge['partner'])
+    else:
+        partner_card = bitboard.card_mask(knowledge['partner card'])
+        declarers.update(i for i in range(NUM_OF_PLAYERS) if hands[i] & partner_card)
+    return hands, declarers
+
+
+def evaluate_samples(task):
+    """
+    Sample deals and score each valid play, in a worker
+    :param task: (int, float, int, dict), the seed, the time budget, the maximum number of samples and the
+    knowledge of the player (see SamplingAI.get_knowledge)
+    :return: (dict, int), the total rounds won by the player's side for each valid play, and the number of samples
+    """
+    seed, time_budget, max_samples, knowledge = task
+    deadline = time.perf_counter() + time_budget
+    rng = random.Random(seed)
+    solver = DoubleDummySolver(max_table_size=knowledge['max table size'], max_nodes=SOLVE_MAX_NODES)
+
+    player = knowledge['player']
+    trump_suit = knowledge['trump suit']
+    leader = knowledge['leading player']
+    played_cards = knowledge['played cards']
+    rounds_left = knowledge['rounds left']
+    unseen = get_bits(knowledge['unseen'])
+    totals = {card: 0 for card in knowledge['valid plays']}
+
+    n_samples = 0
+    while n_samples < max_samples and (n_samples == 0 or time.perf_counter() < deadline):
+        hands, declarers = sample_deal(rng, unseen, knowledge)
+        on_declarer_side = player in declarers
+
+        results = None
+        if rounds_left <= knowledge['solve rounds']:
+            try:
+                results = solver.solve_plays(hands, trump_suit, leader, declarers, knowledge['trump broken'],
+                                             played_cards)
+            except SearchLimitReached:
+                # Too long to solve, the sample is played out instead
+                results = None
+        if results is None:
+            results = {}
+            for card in knowledge['valid plays']:
+                new_hands = list(hands)
+                new_hands[player] &= ~bitboard.card_mask(card)
+                new_played = list(played_cards)
+                new_played[player] = card
+                results[card] = play_out(new_hands, trump_suit, leader, new_played,
+                                         knowledge['trump broken'] or card // 100 == trump_suit, declarers)
+
+        for card in totals:
+            totals[card] += results[card] if on_declarer_side else rounds_left - results[card]
+        n_samples += 1
+    return totals, n_samples
+
+
+class SamplingAI(ai.VivianAI):
+    """
+    Bids like VivianAI, and keeps track of what is known about the hidden cards
+    so that the deals consistent with it can be sampled.
+    """
+
+    def __init__(self, table_status, player=None):
+        super().__init__(table_status, player=player)
+        self.first_leader = None
+
+    def record_first_leader(self):
+        # The declarer is found from the leading player of the first round
+        if not self.table_status['round history']:
+            self.first_leader = self.table_status['leading player']
+
+    def get_declarer(self):
+        if self.table_status['trump suit'] == 5:
+            return self.first_leader
+        return (self.first_leader - 1) % NUM_OF_PLAYERS
+
+    def get_round_leaders(self):
+        """
+        Find the leading player of each round played
+        :return: list of int
+        """
+        leaders = []
+        leader = self.first_leader
+        for played_cards in self.table_status['round history']:
+            leaders.append(leader)
+            leader = engine.get_trick_winner(played_cards, leader, self.table_status['trump suit'])
+        return leaders
+
+    def get_knowledge(self, valid_plays):
+        """
+        Gather what the player knows about the hidden cards, as plain data that can be sent to worker processes
+        :param valid_plays: list of int
+        :return: dict
+        """
+        snapshot = self.get_snapshot()
+        trump_suit = snapshot.trump_suit
+        leader = snapshot.leading_player
+        played_cards = snapshot.played_cards
+        player = snapshot.get_current_player()
+        hand = snapshot.hand
+        rounds_left = snapshot.get_rounds_left()
+        declarer = self.get_declarer()
+
+        # Find the voids from the players not following suit
+        allowed = [bitboard.FULL_HAND] * NUM_OF_PLAYERS
+        rounds = list(zip(self.get_round_leaders(), snapshot.round_history))
+        if snapshot.get_n_played():
+            rounds.append((leader, played_cards))
+        for round_leader, round_cards in rounds:
+            lead_suit = round_cards[round_leader] // 100
+            for i in range(NUM_OF_PLAYERS):
+                if round_cards[i] and round_cards[i] // 100 != lead_suit:
+                    allowed[i] &= ~SUIT_MASKS[lead_suit]
+
+        hand_sizes = [rounds_left - bool(played_cards[i]) for i in range(NUM_OF_PLAYERS)]
+        hands = [0] * NUM_OF_PLAYERS
+        hands[player] = hand
+        hand_sizes[player] = 0
+        unseen = bitboard.FULL_HAND & ~hand & ~snapshot.played_mask
+
+        partner = None
+        partner_card = 0
+        if snapshot.partner_reveal:
+            partner = snapshot.partner
+        else:
+            partner_card = snapshot.partner
+            if hand & bitboard.card_mask(partner_card):
+                partner = player
+            else:
+                # The declarer called a card outside of the hand
+                allowed[declarer] &= ~bitboard.card_mask(partner_card)
+
+        return {'player': player, 'trump suit': trump_suit, 'leading player': leader,
+                'played cards': list(played_cards), 'trump broken': snapshot.trump_broken,
+                'rounds left': rounds_left, 'valid plays': valid_plays,
+                'hands': hands, 'hand sizes': hand_sizes, 'allowed': allowed, 'unseen': unseen,
+                'declarer': declarer, 'partner': partner, 'partner card': partner_card}
+
+    def update_memory(self):
+        self.record_first_leader()
+        super().update_memory()
+
+    def reset_memory(self):
+        super().reset_memory()
+        self.first_leader = None
+
+
+class PIMCAI(SamplingAI):
+    """
+    Plays with Perfect Information Monte Carlo sampling.
+    :param time_budget: float, the seconds to spend on each play
+    :param max_samples: int, the maximum number of samples per play
+    :param workers: int, the number of worker processes. Defaults to the number of CPUs,
+    0 or 1 samples in the current process
+    :param solve_rounds: int, the samples are solved exactly when this many rounds or fewer are left,
+    and played out with a greedy policy otherwise
+    """
+
+    def __init__(self, table_status, player=None, time_budget=1.0, max_samples=200, workers=None,
+                 solve_rounds=7, max_table_size=200000):
+        super().__init__(table_status, player=player)
+        self.time_budget = time_budget
+        self.max_samples = max_samples
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.solve_rounds = solve_rounds
+        self.max_table_size = max_table_size
+        self.pool = None
+        # Stops the pool when the AI is closed, garbage collected or the program exits, whichever comes first
+        self.pool_finalizer = None
+        self.last_samples = 0
+
+    def make_a_play(self, sub_state):
+        """
+
+        :param sub_state:
+        :return: int - card value
+        """
+        self.record_first_leader()
+        valid_plays = self.get_valid_plays(sub_state == 0)
+        if len(valid_plays) == 1:
+            return valid_plays[0]
+
+        knowledge = self.get_knowledge(valid_plays)
+        knowledge['solve rounds'] = self.solve_rounds
+        knowledge['max table size'] = self.max_table_size
+        workers = self.workers
+        # Worker processes cannot be started from a daemonic process, such as a simulation worker
+        if multiprocessing.current_process().daemon:
+            workers = 1
+        workers = max(1, min(workers, self.max_samples))
+        tasks = [(self.rng.getrandbits(64), self.time_budget,
+                  self.max_samples // workers + (i < self.max_samples % workers), knowledge)
+                 for i in range(workers)]
+
+        if workers == 1:
+            all_results = [evaluate_samples(tasks[0])]
+        else:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(workers)
+                self.pool_finalizer = weakref.finalize(self, self.pool.terminate)
+            all_results = self.pool.map(evaluate_samples, tasks)
+
+        totals = {card: 0 for card in valid_plays}
+        self.last_samples = 0
+        for results, n_samples in all_results:
+            for card, total in results.items():
+                totals[card] += total
+            self.last_samples += n_samples
+
+        best_total = max(totals.values())
+        best_cards = [card for card in valid_plays if totals[card] == best_total]
+        return self.rng.choice(best_cards)
+
+    def close(self):
+        """
+        Stop the worker processes. They are also stopped when the AI is garbage collected or the program exits,
+        and the AI can be used in a with statement to close it.
+        """
+        if self.pool_finalizer is not None:
+            self.pool_finalizer()
+            self.pool_finalizer = None
+        self.pool = None
@@ -0,0 +1,375 @@
+import os
+import sys
+import copy
+import json
+import time
+import random
+import platform
+import tracemalloc
+import engine
+import bitboard
+import seeding
+import game_record
+from ai_comp import ai
+from game_consts import NUM_OF_PLAYERS
+
+"""
+This script times the hot paths of the cards, the rules and the AI, and reports the time and the memory of each
+operation. The positions are taken from seeded all-bot games, so every run measures the same hands and plays.
+
+The results can be saved as a JSON baseline, and a later run compared against it: a benchmark slower than the
+baseline by more than the threshold is flagged, and the script exits with 1.
+The card benchmarks need pygame, and are skipped without it.
+"""
+
+BENCH_SEED = 2024
+BENCH_GAMES = 20
+DEFAULT_THRESHOLD = 0.1
+MIN_TIME = 0.2  # Seconds per timing
+REPEATS = 5
+
+
+class Position:
+    """
+    A copy of the table status and the hand of a player when the AI made a decision.
+    It stands in for the player of the AI.
+    """
+    def __init__(self, table_status, hand, unplayed_cards, sub_state):
+        self.table_status = copy.deepcopy(table_status)
+        self.hand = hand
+        self.unplayed_cards = copy.deepcopy(unplayed_cards)
+        self.sub_state = sub_state
+
+    def get_deck_values(self):
+        return bitboard.to_values(self.hand)
+
+    def get_hand_mask(self):
+        return self.hand
+
+
+class RecordingAI(ai.VivianAI):
+    """
+    The VivianAI, keeping the positions of its bids and plays
+    """
+    def __init__(self, table_status, positions):
+        super().__init__(table_status)
+        self.positions = positions
+
+    def make_a_bid(self):
+        self.positions['bid'].append(Position(self.table_status, self.player.get_hand_mask(),
+                                              self.unplayed_cards, None))
+        return super().make_a_bid()
+
+    def make_a_play(self, sub_state):
+        self.positions['play'].append(Position(self.table_status, self.player.get_hand_mask(),
+                                               self.unplayed_cards, sub_state))
+        return super().make_a_play(sub_state)
+
+
+def get_positions():
+    """
+    Play the seeded games of the benchmarks
+    :return: (dict, list of game_record.GameRecord), the bid and play positions, and the games
+    """
+    positions = {'bid': [], 'play': []}
+    records = []
+    game_engine = engine.GameEngine()
+    for i in range(NUM_OF_PLAYERS):
+        game_engine.add_ai(i, RecordingAI(game_engine.table_status, positions))
+    for game_num in range(BENCH_GAMES):
+        game_engine.play_game(seeding.get_game_seed(BENCH_SEED, game_num))
+        records.append(game_record.GameRecord.from_engine(game_engine))
+    return positions, records
+
+
+def make_bots(positions):
+    """
+    :param positions: list of Position
+    :return: list of ai.VivianAI, one in each position
+    """
+    bots = []
+    for position in positions:
+        bot = ai.VivianAI(position.table_status, player=position)
+        bot.unplayed_cards = position.unplayed_cards
+        bot.rng = random.Random(BENCH_SEED)
+        bots.append(bot)
+    return bots
+
+
+# The benchmarks, by name. Each one takes the positions and the games, and returns the function to time
+# and the number of operations it does.
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup_function):
+        BENCHMARKS[name] = setup_function
+        return setup_function
+    return register
+
+
+@benchmark('card_points')
+def setup_card_points(positions, records):
+    hands = [hand for record in records for hand in record.dealt_hands]
+
+    def run():
+        for hand in hands:
+            engine.get_card_points(hand)
+    return run, len(hands)
+
+
+@benchmark('valid_plays')
+def setup_valid_plays(positions, records):
+    checks = [(position.hand, card, position.sub_state == 0, position.table_status)
+              for position in positions['play'] for card in position.get_deck_values()]
+
+    def run():
+        for hand, card, leading, table_status in checks:
+            engine.check_for_valid_plays(hand, card, leading, table_status)
+    return run, len(checks)
+
+
+@benchmark('trick_winner')
+def setup_trick_winner(positions, records):
+    tricks = []
+    for record in records:
+        leader = record.replay(0).table_status['leading player']
+        game_engine = record.replay()
+        trump_suit = game_engine.table_status['trump suit']
+        for played_cards in game_engine.table_status['round history']:
+            tricks.append((played_cards, leader, trump_suit))
+            leader = engine.get_trick_winner(played_cards, leader, trump_suit)
+
+    def run():
+        for played_cards, leader, trump_suit in tricks:
+            engine.get_trick_winner(played_cards, leader, trump_suit)
+    return run, len(tricks)
+
+
+@benchmark('game_replay')
+def setup_game_replay(positions, records):
+    def run():
+        for record in records:
+            record.replay()
+    return run, len(records)
+
+
+@benchmark('vivian_bid')
+def setup_vivian_bid(positions, records):
+    bots = make_bots(positions['bid'])
+    for bot in bots:
+        bot.estimate_wins()
+
+    def run():
+        for bot in bots:
+            bot.make_a_bid()
+    return run, len(bots)
+
+
+@benchmark('vivian_play')
+def setup_vivian_play(positions, records):
+    plays = [(bot, position.sub_state) for bot, position in zip(make_bots(positions['play']), positions['play'])]
+
+    def run():
+        for bot, sub_state in plays:
+            bot.make_a_play(sub_state)
+    return run, len(plays)
+
+
+@benchmark('estimate_wins')
+def setup_estimate_wins(positions, records):
+    bots = make_bots(positions['bid'])
+
+    def run():
+        for bot in bots:
+            bot.calc_estimate_wins()
+    return run, len(bots)
+
+
+@benchmark('estimate_wins_cached')
+def setup_estimate_wins_cached(positions, records):
+    bots = make_bots(positions['bid'])
+    for bot in bots:
+        bot.estimate_wins()
+
+    def run():
+        for bot in bots:
+            bot.estimate_wins()
+    return run, len(bots)
+
+
+def setup_display():
+    """
+    :return: module, the cards module with a hidden display set up, None without pygame
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    try:
+        import pygame
+        import cards
+    except ImportError:
+        return None
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    return cards
+
+
+@benchmark('deck_add_card')
+def setup_deck_add_card(positions, records):
+    cards = setup_display()
+    if cards is None:
+        return None
+    playing_cards = {card.value: card for card in cards.prepare_playing_cards(50, 68)}
+    deck = cards.Deck(0, 0, 400, 70, 20)
+    hands = [[playing_cards[value] for value in bitboard.to_values(hand)]
+             for hand in records[0].dealt_hands]
+    for hand in hands:
+        random.Random(BENCH_SEED).shuffle(hand)
+
+    def run():
+        for hand in hands:
+            for card in hand:
+                deck.add_card(card)
+            deck.remove_all_cards()
+    return run, sum(len(hand) for hand in hands)
+
+
+@benchmark('player_card_points')
+def setup_player_card_points(positions, records):
+    cards = setup_display()
+    if cards is None:
+        return None
+    import players
+    playing_cards = {card.value: card for card in cards.prepare_playing_cards(50, 68)}
+    player_decks = []
+    for hand in records[0].dealt_hands:
+        player = players.Player(0, 0, 400, 70, 20)
+        player.add_cards(playing_cards[value] for value in bitboard.to_values(hand))
+        player_decks.append(player)
+
+    def run():
+        for player in player_decks:
+            player.get_card_points()
+    return run, len(player_decks)
+
+
+def time_function(function, n_ops, min_time=MIN_TIME, repeats=REPEATS):
+    """
+    :return: float, the best time of an operation in ns
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10:
+            break
+        loops *= 10
+    loops = max(1, int(loops * min_time / (elapsed * 10)))
+
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best / loops / n_ops * 1e9
+
+
+def measure_memory(function, n_ops):
+    """
+    Run the function once while tracing the memory allocations
+    :return: (float, float), the peak and the retained bytes per operation
+    """
+    tracemalloc.start()
+    function()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / n_ops, retained / n_ops
+
+
+def run_benchmarks(names=None, min_time=MIN_TIME):
+    """
+    :param names: list of str, the benchmarks to run, all of them if None
+    :param min_time: float, the seconds of each timing
+    :return: dict, the results by benchmark name
+    """
+    positions, records = get_positions()
+    results = {}
+    for name, setup_function in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        setup = setup_function(positions, records)
+        if setup is None:
+            print("{0:s}: skipped, pygame is not available".format(name))
+            continue
+        function, n_ops = setup
+        function()  # Warm up
+        peak, retained = measure_memory(function, n_ops)
+        results[name] = {'ns/op': time_function(function, n_ops, min_time=min_time), 'ops': n_ops,
+                         'peak B/op': peak, 'retained B/op': retained}
+    return results
+
+
+def print_results(results, baseline=None, threshold=DEFAULT_THRESHOLD):
+    """
+    :param results: dict, see run_benchmarks
+    :param baseline: dict, earlier results to compare against
+    :param threshold: float, the slowdown to flag, 0.1 for 10%
+    :return: list of str, the benchmarks slower than the baseline
+    """
+    slower = []
+    print("{0:22s} {1:>12s} {2:>12s} {3:>14s}".format("Benchmark", "ns/op", "peak B/op", "retained B/op"))
+    for name, result in results.items():
+        line = "{0:22s} {1:12.1f} {2:12.1f} {3:14.1f}".format(name, result['ns/op'], result['peak B/op'],
+                                                              result['retained B/op'])
+        if baseline and name in baseline:
+            change = result['ns/op'] / baseline[name]['ns/op'] - 1
+            line += "  {0:+.1%} vs baseline".format(change)
+            if change > threshold:
+                line += "  SLOWER"
+                slower.append(name)
+        print(line)
+    return slower
+
+
+def save_results(results, path):
+    data = {'python': platform.python_version(), 'machine': platform.machine(), 'benchmarks': results}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['benchmarks']
+
+
+if __name__ == '__main__':
+    NAMES = None
+    SAVE_PATH = None
+    COMPARE_PATH = None
+    THRESHOLD = DEFAULT_THRESHOLD
+    BENCH_TIME = MIN_TIME
+
+    if len(sys.argv) > 1:
+        prev_command = ""
+        for command in sys.argv[1:]:
+            if prev_command == "--bench" or prev_command == "-k":
+                NAMES = command.split(',')
+            if prev_command == "--save" or prev_command == "-o":
+                SAVE_PATH = command
+            if prev_command == "--compare" or prev_command == "-c":
+                COMPARE_PATH = command
+            if prev_command == "--threshold":
+                THRESHOLD = float(command)
+            if prev_command == "--time" or prev_command == "-t":
+                BENCH_TIME = float(command)
+            prev_command = command
+
+    all_results = run_benchmarks(NAMES, min_time=BENCH_TIME)
+    slow_benchmarks = print_results(all_results, load_results(COMPARE_PATH) if COMPARE_PATH else None, THRESHOLD)
+    if SAVE_PATH:
+        save_results(all_results, SAVE_PATH)
+    if slow_benchmarks:
+        print("Slower than the baseline by more than {0:.0%}: {1:s}".format(THRESHOLD, ', '.join(slow_benchmarks)))
+        sys.exit(1)
@@ -0,0 +1,130 @@
+"""
+This module contains the bitboard representation of a hand.
+A hand is a 52-bit int, made of one 13-bit mask per suit. The card with value suit*100 + number
+(see cards.py) is at bit (suit-1)*13 + (number-2), so Clubs take the lowest 13 bits and the Ace
+is the highest bit of each suit. Iterating the bits from the lowest gives the cards in ascending order.
+
+Suit follows, suit lengths and the highest/lowest cards in a suit are all found
+with a few integer operations, without going through the cards one by one.
+"""
+
+SUIT_BITS = 13
+SUIT_MASK = (1 << SUIT_BITS) - 1
+FULL_HAND = (1 << 52) - 1
+
+# Bit index to card value
+BIT_TO_CARD = [(i // SUIT_BITS + 1) * 100 + i % SUIT_BITS + 2 for i in range(52)]
+
+# Popcount of every possible suit mask, since int.bit_count is not available before Python 3.10
+SUIT_POPCOUNT = [bin(i).count('1') for i in range(1 << SUIT_BITS)]
+
+
+def card_to_bit(value):
+    return (value // 100 - 1) * SUIT_BITS + value % 100 - 2
+
+
+def bit_to_card(index):
+    return BIT_TO_CARD[index]
+
+
+def card_mask(value):
+    return 1 << ((value // 100 - 1) * SUIT_BITS + value % 100 - 2)
+
+
+def suit_mask(suit):
+    """
+    The mask covering a whole suit
+    :param suit: int 1-4, 5 (No Trump) gives an empty mask
+    :return: int
+    """
+    if 1 <= suit <= 4:
+        return SUIT_MASK << ((suit - 1) * SUIT_BITS)
+    return 0
+
+
+# Suit masks indexed by suit, 0 (no suit) and 5 (No Trump) have an empty mask
+SUIT_MASKS = [suit_mask(suit) for suit in range(6)]
+
+
+def from_values(values):
+    """
+    Convert card values to a hand
+    :param values: iterable of int
+    :return: int
+    """
+    hand = 0
+    for value in values:
+        hand |= 1 << ((value // 100 - 1) * SUIT_BITS + value % 100 - 2)
+    return hand
+
+
+def to_values(hand):
+    """
+    Convert a hand to card values
+    :param hand: int
+    :return: list of int, in ascending order
+    """
+    values = []
+    while hand:
+        low_bit = hand & -hand
+        values.append(BIT_TO_CARD[low_bit.bit_length() - 1])
+        hand ^= low_bit
+    return values
+
+
+def count(hand):
+    return sum(SUIT_POPCOUNT[(hand >> (i * SUIT_BITS)) & SUIT_MASK] for i in range(4))
+
+
+def contains(hand, value):
+    return bool(hand & card_mask(value))
+
+
+def get_suit(hand, suit):
+    """
+    Get the 13-bit mask of a suit in the hand, bit 0 being the 2 and bit 12 the Ace
+    :param hand: int
+    :param suit: int 1-4
+    :return: int
+    """
+    return (hand >> ((suit - 1) * SUIT_BITS)) & SUIT_MASK
+
+
+def has_suit(hand, suit):
+    return bool(hand & suit_mask(suit))
+
+
+def suit_length(hand, suit):
+    return SUIT_POPCOUNT[(hand >> ((suit - 1) * SUIT_BITS)) & SUIT_MASK]
+
+
+def suit_lengths(hand):
+    """
+    :param hand: int
+    :return: list of int, the number of cards in each suit, Clubs first
+    """
+    return [SUIT_POPCOUNT[(hand >> (i * SUIT_BITS)) & SUIT_MASK] for i in range(4)]
+
+
+def highest_in_suit(hand, suit):
+    """
+    :param hand: int
+    :param suit: int 1-4
+    :return: int, the value of the highest card of the suit in the hand, 0 if there is none
+    """
+    cards_in_suit = (hand >> ((suit - 1) * SUIT_BITS)) & SUIT_MASK
+    if not cards_in_suit:
+        return 0
+    return suit * 100 + cards_in_suit.bit_length() + 1
+
+
+def lowest_in_suit(hand, suit):
+    """
+    :param hand: int
+    :param suit: int 1-4
+    :return: int, the value of the lowest card of the suit in the hand, 0 if there is none
+    """
+    cards_in_suit = (hand >> ((suit - 1) * SUIT_BITS)) & SUIT_MASK
+    if not cards_in_suit:
+        return 0
+    return suit * 100 + (cards_in_suit & -cards_in_suit).bit_length() + 1
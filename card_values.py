@@ -0,0 +1,61 @@
+"""
+This module contains the encoding of the cards as values, and the conversions from and to strings.
+A card value is suit * 100 + number, with the suits 1-4 being Clubs, Diamonds, Hearts, Spades
+and the numbers 2-14, Ace being 14. The suit 5 is No Trump, for bids.
+It does not depend on pygame, so that the rules and the AI can be used without any display.
+"""
+
+# LUT for mapping int to cards symbols
+CARDS_SYMBOLS = {14: "A", 2: "2", 3: "3", 4: "4", 5: "5", 6: "6", 7: "7",
+                 8: "8", 9: "9", 10: "10", 11: "J", 12: "Q", 13: "K",
+                 100: "Clubs", 200: "Diamonds", 300: "Hearts", 400: "Spades", 500: "No Trump",
+                 }
+
+INPUT_SYMBOLS = {"c": 100, "d": 200, "h": 300, "s": 400, "n": 500, "a": 14,
+                 "2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7,
+                 "8": 8, "9": 9, "10": 10, "j": 11, "q": 12, "k": 13,
+                 }
+BID_SYMBOLS = {"c": 100, "d": 200, "h": 300, "s": 400, "n": 500}
+
+
+def card_check(value):
+    return 1 <= get_card_suit(value) <= 4 \
+           and 2 <= get_card_number(value) <= 14
+
+
+def get_card_suit(value):
+    return value // 100
+
+
+def get_card_number(value):
+    return value % 100
+
+
+def get_card_string(value):
+    suit = get_card_suit(value) * 100
+    num = get_card_number(value)
+    return CARDS_SYMBOLS[num] + ' ' + CARDS_SYMBOLS[suit]
+
+
+def get_suit_string(value):
+    return CARDS_SYMBOLS[value*100]
+
+
+def convert_input_string(string):
+    string = string.lower()
+    try:
+        if string[0:-1].isalnum() and string[-1].isalpha():
+            return INPUT_SYMBOLS[string[0:-1]] + INPUT_SYMBOLS[string[-1]]
+        return -1
+    except KeyError:
+        return -1
+
+
+def convert_bid_string(string):
+    string = string.lower()
+    try:
+        if len(string)>1 and string[0].isdecimal() and string[1].isalpha():
+            return int(string[0])*10 + BID_SYMBOLS[string[1]]//100
+        return -1
+    except KeyError:
+        return -1
@@ -2,27 +2,23 @@
 This module contains the Card class and the Deck class
 Card contains the information of a playing card
 Deck is used as a Card container
+The card values helpers are in card_values, and also available from here.
 """
 import pygame
 import view
+import bitboard
+from card_values import CARDS_SYMBOLS, INPUT_SYMBOLS, BID_SYMBOLS, card_check, get_card_suit, get_card_number, \
+    get_card_string, get_suit_string, convert_input_string, convert_bid_string
 import os
+import bisect
 import threading
 import random
 from enum import Enum
 
 CLEARCOLOUR = (0, 99, 0)
 
-# LUT for mapping int to cards symbols
-CARDS_SYMBOLS = {14: "A", 2: "2", 3: "3", 4: "4", 5: "5", 6: "6", 7: "7",
-                 8: "8", 9: "9", 10: "10", 11: "J", 12: "Q", 13: "K",
-                 100: "Clubs", 200: "Diamonds", 300: "Hearts", 400: "Spades", 500: "No Trump",
-                 }
-
-INPUT_SYMBOLS = {"c": 100, "d": 200, "h": 300, "s": 400, "n": 500, "a": 14,
-                 "2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7,
-                 "8": 8, "9": 9, "10": 10, "j": 11, "q": 12, "k": 13,
-                 }
-BID_SYMBOLS = {"c": 100, "d": 200, "h": 300, "s": 400, "n": 500}
+# The card rotations used by the decks, horizontal and vertical
+CARD_ANGLES = (0, 90)
 
 
 class DeckReveal(Enum):
@@ -37,10 +33,47 @@ class DeckSort(Enum):
     NOSORT = 3
 
 
+class CardAtlas:
+    """
+    The images of all the cards for one card size, scaled and rotated once.
+    Holds each card front at 0 and 90 degrees, and the card back at 0 and 90 degrees, flipped or not,
+    so that no transform is needed while playing.
+    """
+
+    def __init__(self, width, height, card_images, back_image):
+        """
+        :param int width: Card width
+        :param int height: Card height
+        :param dict card_images: card value to the unscaled image
+        :param back_image: the unscaled back image
+        """
+        self.width = width
+        self.height = height
+        self.fronts = {}
+        for value, image in card_images.items():
+            image = pygame.transform.scale(image, (width, height))
+            self.fronts[value] = {angle: pygame.transform.rotate(image, angle) for angle in CARD_ANGLES}
+
+        back_image = pygame.transform.scale(back_image, (width, height))
+        self.backs = {}
+        for angle in CARD_ANGLES:
+            rotated = pygame.transform.rotate(back_image, angle)
+            vertical = angle == 90
+            self.backs[angle, False] = rotated
+            # The back is flipped across the length of the deck
+            self.backs[angle, True] = pygame.transform.flip(rotated, vertical, not vertical)
+
+    def get_image(self, value, angle=0):
+        return self.fronts[value][angle]
+
+    def get_backimage(self, angle=0, flip=False):
+        return self.backs[angle, flip]
+
+
 class Card(pygame.sprite.Sprite):
 
     def __init__(self, x, y, width, height, value, hidden=False, image_data=None,
-                 backimage_data=None, parent=None, angle=0):
+                 backimage_data=None, parent=None, angle=0, atlas=None):
         super().__init__()
         self.x = x
         self.y = y
@@ -52,6 +85,8 @@ class Card(pygame.sprite.Sprite):
         self.value = value
         self.hidden = hidden
         self.parent = parent
+        # If given, the images are looked up instead of transformed
+        self.atlas = atlas
 
         self.original_image = None
         self.original_backimage = None
@@ -59,7 +94,10 @@ class Card(pygame.sprite.Sprite):
         self.backimage = None
         self.rect = None
 
-        self.add_image(image_data, backimage_data)
+        if atlas:
+            self.set_angle(angle)
+        else:
+            self.add_image(image_data, backimage_data)
         self._layer = 0
 
     def add_image(self, image, backimage=None):
@@ -76,16 +114,33 @@ class Card(pygame.sprite.Sprite):
             self.backimage = pygame.transform.rotate(self.original_backimage, self.angle)
 
     def set_angle(self, angle):
-        if self.original_image:
-            self.image = pygame.transform.rotate(self.original_image, angle)
+        if self.atlas:
+            self.image = self.atlas.get_image(self.value, angle)
+            self.backimage = self.atlas.get_backimage(angle)
+        else:
+            if self.original_image:
+                self.image = pygame.transform.rotate(self.original_image, angle)
 
-        if self.original_backimage:
-            self.backimage = pygame.transform.rotate(self.original_backimage, angle)
+            if self.original_backimage:
+                self.backimage = pygame.transform.rotate(self.original_backimage, angle)
 
         self.angle = angle
 
         self.rect = self.image.get_rect()
 
+    def get_backimage(self, flip=False):
+        """
+        Get the back image, flipped across the length of the deck if needed
+        :param flip: bool
+        :return: Surface
+        """
+        if not flip:
+            return self.backimage
+        if self.atlas:
+            return self.atlas.get_backimage(self.angle, True)
+        vertical = self.angle == 90
+        return pygame.transform.flip(self.backimage, vertical, not vertical)
+
     def get_pos(self):
         return self.x, self.y
 
@@ -129,6 +184,11 @@ class Deck():
         self.prev_selected = [-1, -1, -1]
 
         self.cards = []
+        # Hit-test index, rebuilt with the layout: the card intervals along the deck length,
+        # and the interval across it, which is the same for all the cards
+        self.hit_starts = []
+        self.hit_ends = []
+        self.hit_across = (0, 0)
         self.line_width = 5
         if self.is_horizontal():
             self.background = pygame.Surface((self.length, self.width))
@@ -148,18 +208,22 @@ class Deck():
             self.deck_surface = self.background.copy()
             self.rect = pygame.rect.Rect(x, y, width, length)
 
+        # Whether the deck surface changed since it was last drawn on the screen
+        self.dirty = True
         self._layer = 1
 
     def set_selectable(self, state):
         self.selectable = state
 
-    def add_card(self, card, position=0):
-        # TODO: Add a function to add additional cards, to optimise number of recalculations
+    def prepare_card(self, card):
         card.parent = self
         if self.vert_orientation:
             card.set_angle(90)
         else:
             card.set_angle(0)
+
+    def add_card(self, card, position=0):
+        self.prepare_card(card)
         number_of_cards = len(self.cards)
 
         if number_of_cards == 0:
@@ -193,6 +257,29 @@ class Deck():
 
         self.set_card_positions()
 
+    def add_cards(self, cards, position=0):
+        """
+        Add several cards at once, with a single layout pass and redraw.
+        :param cards: iterable of Card
+        :param position: Position to insert the cards at, only if the deck is not sorted
+        :return: None
+        """
+        cards = list(cards)
+        if not cards:
+            return
+        for card in cards:
+            self.prepare_card(card)
+
+        if self.sort_order == DeckSort.NOSORT:
+            # Same order as adding the cards one by one
+            cards.reverse()
+            self.cards[position:position] = cards
+        else:
+            self.cards.extend(cards)
+            self.cards.sort(key=lambda card: card.value, reverse=(self.sort_order == DeckSort.DESCENDING))
+
+        self.set_card_positions()
+
     def set_card_positions(self):
         """
         Calculate the card positions, given the spacing.
@@ -218,35 +305,103 @@ class Deck():
                 else:
                     card.set_pos(y, x)
 
+        self.build_hit_index()
         self.update_deck_display()
 
+    def build_hit_index(self):
+        """
+        Index the card rects for hit-testing. The cards are laid out in order along the deck,
+        so both the starts and the ends of the cards are sorted.
+        :return: None
+        """
+        if self.is_horizontal():
+            self.hit_starts = [card.rect.left for card in self.cards]
+            self.hit_ends = [card.rect.right for card in self.cards]
+            if self.cards:
+                self.hit_across = (self.cards[0].rect.top, self.cards[0].rect.bottom)
+        else:
+            self.hit_starts = [card.rect.top for card in self.cards]
+            self.hit_ends = [card.rect.bottom for card in self.cards]
+            if self.cards:
+                self.hit_across = (self.cards[0].rect.left, self.cards[0].rect.right)
+
+    def get_selected_pos(self, card):
+        """
+        The selected card is drawn out of the deck
+        :param card: Card
+        :return: The position of the card when selected, relative to the deck
+        """
+        return (card.x - card.x * 0.5 * (-1)**self.flip * self.vert_orientation,
+                card.y - card.y * 0.5 * (-1)**self.flip * (not self.vert_orientation))
+
+    def get_card_at(self, pos):
+        """
+        Find the card drawn on top at the position, in the same way as it is drawn, including the
+        selected card being drawn out of the deck. Does not change the selection, so it can be used for hovering.
+        :param pos: Absolute position
+        :return: int, the position of the card in the deck, -1 if there is none
+        """
+        relative_pos_x = pos[0] - self.x
+        relative_pos_y = pos[1] - self.y
+        along, across = relative_pos_x, relative_pos_y
+        if not self.is_horizontal():
+            along, across = across, along
+
+        hits = []
+        if self.hit_across[0] <= across < self.hit_across[1]:
+            # The cards from the first which ends after the position, to the last which starts before it
+            first = bisect.bisect_right(self.hit_ends, along)
+            last = bisect.bisect_right(self.hit_starts, along) - 1
+            hits = [i for i in range(first, last + 1) if i != self.selected_card]
+
+        if 0 <= self.selected_card < len(self.cards):
+            card = self.cards[self.selected_card]
+            selected_rect = card.rect.copy()
+            selected_rect.topleft = self.get_selected_pos(card)
+            if selected_rect.collidepoint(relative_pos_x, relative_pos_y):
+                hits.append(self.selected_card)
+
+        if not hits:
+            return -1
+        # The cards drawn last are on top
+        if self.draw_from_last:
+            return min(hits)
+        return max(hits)
+
     def update_deck_display(self):
         """
         Blits the cards onto the deck surface. Called when the deck is modified.
         :return: None
         """
+        self.dirty = True
         self.deck_surface.fill(CLEARCOLOUR)
         self.deck_surface.blit(self.background, (0, 0))
         if not self.is_empty():
-            cards_to_draw = self.cards
+            draw_order = range(len(self.cards))
             if self.draw_from_last:
-                cards_to_draw = reversed(cards_to_draw)
+                draw_order = reversed(draw_order)
 
-            for i, card in enumerate(cards_to_draw):
-                selected = (i == self.selected_card)
+            for i in draw_order:
+                card = self.cards[i]
                 image_to_draw = card.image
 
                 if self.deck_reveal == DeckReveal.HIDE_ALL:
-                    image_to_draw = card.backimage
+                    image_to_draw = card.get_backimage(self.flip)
 
-                    if self.flip:
-                        image_to_draw = pygame.transform.flip(image_to_draw, self.vert_orientation,
-                                                              not self.vert_orientation)
+                if i == self.selected_card:
+                    self.deck_surface.blit(image_to_draw, self.get_selected_pos(card))
+                else:
+                    self.deck_surface.blit(image_to_draw, card.get_pos())
 
-                self.deck_surface.blit(image_to_draw, (card.x - selected * card.x * 0.5 *
-                                                       (-1)**self.flip * self.vert_orientation,
-                                                       card.y - selected * card.y * 0.5 *
-                                                       (-1)**self.flip * (not self.vert_orientation)))
+    def get_dirty_rect(self):
+        """
+        Report the area to redraw on the screen, if the deck surface has changed since the last call
+        :return: pygame.Rect or None
+        """
+        if self.dirty:
+            self.dirty = False
+            return self.rect.copy()
+        return None
 
     def remove_card(self, pos=-1):
         """
@@ -264,6 +419,16 @@ class Deck():
             return card
         return None
 
+    def remove_all_cards(self):
+        """
+        Remove all the cards from the deck, with a single redraw.
+        :return: list of Card
+        """
+        cards = self.cards
+        self.cards = []
+        self.set_card_positions()
+        return cards
+
     def remove_selected_card(self):
         if self.selected_card >= 0:
             card = self.remove_card(self.selected_card)
@@ -285,6 +450,9 @@ class Deck():
             values.append(card.value)
         return values
 
+    def get_hand_mask(self):
+        return bitboard.from_values(self.get_deck_values())
+
     def check_card_in(self, value):
         card_values = self.get_deck_values()
         if value in card_values:
@@ -308,21 +476,7 @@ class Deck():
         :return: bool: whether the card selected is the same as before
         """
         if self.selectable:
-            double_select = False
-            relative_pos_x = pos[0] - self.x
-            relative_pos_y = pos[1] - self.y
-            mouse_pos = (relative_pos_x, relative_pos_y)
-            self.selected_card = -1
-            if not self.draw_from_last:
-                for i, card in enumerate(reversed(self.cards)):
-                    if card.rect.collidepoint(mouse_pos):
-                        self.selected_card = len(self.cards) - 1 - i
-                        break
-            else:
-                for i, card in enumerate(self.cards):
-                    if card.rect.collidepoint(mouse_pos):
-                        self.selected_card = i
-                        break
+            self.selected_card = self.get_card_at(pos)
 
             if self.prev_selected[-1] == self.selected_card:
                 if not double_clicking:
@@ -388,22 +542,28 @@ class SpriteSheet(object):
 DATA_FOLDER = "resource"
 
 
-def prepare_playing_cards(display_w, display_h):
+# The card atlases built, by card size
+CARD_ATLASES = {}
+
+
+def get_card_atlas(display_w, display_h):
     """
-    Create the 52 playing cards. Should be called only once.
+    Get the card images for a card size, loading and transforming them on the first call for the size.
     :param int display_w: Card width
     :param int display_h: Card Height
-    :return: The list of 52 Cards
-    :rtype: List of <Cards>
+    :return: CardAtlas
     """
+    if (display_w, display_h) in CARD_ATLASES:
+        return CARD_ATLASES[display_w, display_h]
+
     card_sprites = SpriteSheet(os.path.join(DATA_FOLDER, 'card_spritesheet.png'))
-    all_cards = []
     offset = 0
     spacing = 0
     width = 71
     height = 96
     suits_position = [2, 3, 1, 0]
     card_backimg = card_sprites.image_at((offset + (width+spacing)*9, 5*(height+spacing) + offset, width, height))
+    card_images = {}
     for i in range(4):
         y = suits_position[i] * (height+spacing) + offset
         for j in range(13):
@@ -411,54 +571,23 @@ def prepare_playing_cards(display_w, display_h):
                 x = offset + (width+spacing)*(j+1)
             else:
                 x = offset
-            card_img = card_sprites.image_at((x, y, width, height))
-            all_cards.append(Card(0, 0, display_w, display_h, (i+1)*100 + j+2,
-                                  image_data=card_img, backimage_data=card_backimg))
-
-    return all_cards
+            card_images[(i+1)*100 + j+2] = card_sprites.image_at((x, y, width, height))
 
+    atlas = CardAtlas(display_w, display_h, card_images, card_backimg)
+    CARD_ATLASES[display_w, display_h] = atlas
+    return atlas
 
-def card_check(value):
-    return 1 <= get_card_suit(value) <= 4 \
-           and 2 <= get_card_number(value) <= 14
 
-
-def get_card_suit(value):
-    return value // 100
-
-
-def get_card_number(value):
-    return value % 100
-
-
-def get_card_string(value):
-    suit = get_card_suit(value) * 100
-    num = get_card_number(value)
-    return CARDS_SYMBOLS[num] + ' ' + CARDS_SYMBOLS[suit]
-
-
-def get_suit_string(value):
-    return CARDS_SYMBOLS[value*100]
-
-
-def convert_input_string(string):
-    string = string.lower()
-    try:
-        if string[0:-1].isalnum() and string[-1].isalpha():
-            return INPUT_SYMBOLS[string[0:-1]] + INPUT_SYMBOLS[string[-1]]
-        return -1
-    except KeyError:
-        return -1
-
-
-def convert_bid_string(string):
-    string = string.lower()
-    try:
-        if len(string)>1 and string[0].isdecimal() and string[1].isalpha():
-            return int(string[0])*10 + BID_SYMBOLS[string[1]]//100
-        return -1
-    except KeyError:
-        return -1
+def prepare_playing_cards(display_w, display_h):
+    """
+    Create the 52 playing cards. Should be called only once.
+    :param int display_w: Card width
+    :param int display_h: Card Height
+    :return: The list of 52 Cards
+    :rtype: List of <Cards>
+    """
+    atlas = get_card_atlas(display_w, display_h)
+    return [Card(0, 0, display_w, display_h, (i+1)*100 + j+2, atlas=atlas) for i in range(4) for j in range(13)]
 
 
 class TestScreen(view.PygView):
@@ -0,0 +1,90 @@
+"""
+This module generates and evaluates deals in batches with NumPy, for statistics over large numbers of deals
+such as the washout (reshuffle) rate. It is not used by the game itself, and requires numpy.
+
+A batch of deals is an array of shape (N, 4, 13) holding the card values (suit*100 + number) of the
+13 cards of each player, in ascending order like the players' hands.
+"""
+import sys
+import time
+import platform
+import numpy as np
+import bitboard
+
+CARD_VALUES = np.array(bitboard.BIT_TO_CARD, dtype=np.int16)
+WEAK_HAND_POINTS = 4  # Hands below this are weak, see GameEngine.check_points
+
+
+def generate_deals(n_deals, rng=None):
+    """
+    Shuffle and deal n_deals decks at once
+    :param n_deals: int
+    :param rng: numpy Generator, or a seed for one
+    :return: numpy array (n_deals, 4, 13) of card values
+    """
+    rng = np.random.default_rng(rng)
+    decks = np.broadcast_to(np.arange(52, dtype=np.int8), (n_deals, 52))
+    card_indices = rng.permuted(decks, axis=1).reshape(n_deals, 4, 13)
+    card_indices.sort(axis=2)
+    return CARD_VALUES[card_indices]
+
+
+def evaluate_hands(deals):
+    """
+    Compute the points and the suit lengths of all the hands in the deals.
+    The points are the same as engine.get_card_points: 1 to 4 points for J, Q, K, A, plus
+    1 point for every 5 cards in a suit.
+    :param deals: numpy array (N, 4, 13) of card values
+    :return: dict of numpy arrays: 'points' (N, 4), 'card points' (N, 4), 'suit lengths' (N, 4, 4)
+    """
+    suits = deals // 100
+    card_points = np.maximum(deals % 100 - 10, 0).sum(axis=2)
+    suit_lengths = np.stack([(suits == suit).sum(axis=2) for suit in range(1, 5)], axis=2)
+    suit_points = (suit_lengths // 5).sum(axis=2)
+    return {'points': card_points + suit_points, 'card points': card_points, 'suit lengths': suit_lengths}
+
+
+def deal_statistics(n_deals, seed=None, chunk_size=100000):
+    """
+    Generate and evaluate n_deals deals in chunks to keep the memory use bounded
+    :param n_deals: int
+    :param seed: int
+    :param chunk_size: int, number of deals evaluated at once
+    :return: dict: 'deals', 'washout rate' (fraction of deals with a weak hand), 'weak hand rate',
+             'points histogram' and 'suit length histogram', both as numpy arrays of counts
+    """
+    rng = np.random.default_rng(seed)
+    washouts = 0
+    weak_hands = 0
+    points_histogram = np.zeros(41, dtype=np.int64)
+    suit_length_histogram = np.zeros(14, dtype=np.int64)
+
+    remaining = n_deals
+    while remaining > 0:
+        n_chunk = min(chunk_size, remaining)
+        results = evaluate_hands(generate_deals(n_chunk, rng))
+        weak = results['points'] < WEAK_HAND_POINTS
+        washouts += np.count_nonzero(weak.any(axis=1))
+        weak_hands += np.count_nonzero(weak)
+        points_histogram += np.bincount(results['points'].ravel(), minlength=41)
+        suit_length_histogram += np.bincount(results['suit lengths'].ravel(), minlength=14)
+        remaining -= n_chunk
+
+    return {'deals': n_deals, 'washout rate': washouts / n_deals, 'weak hand rate': weak_hands / (n_deals * 4),
+            'points histogram': points_histogram, 'suit length histogram': suit_length_histogram}
+
+
+if __name__ == '__main__':
+    N_DEALS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    start_time = time.perf_counter()
+    stats = deal_statistics(N_DEALS)
+    elapsed_time = time.perf_counter() - start_time
+    # The time depends on the machine, so it is reported with it
+    print("Deals: {0:d}, Time: {1:.2f}s on {2:s}, Python {3:s}, NumPy {4:s}".format(
+        stats['deals'], elapsed_time, platform.processor() or platform.machine(), platform.python_version(),
+        np.__version__))
+    print("Washout rate: {0:.2%}, Weak hand rate: {1:.2%}".format(stats['washout rate'], stats['weak hand rate']))
+    print("Points:", ' '.join("{0:d}:{1:.2%}".format(pts, count / (N_DEALS * 4))
+                              for pts, count in enumerate(stats['points histogram']) if count))
+    print("Suit lengths:", ' '.join("{0:d}:{1:.2%}".format(length, count / (N_DEALS * 16))
+                                    for length, count in enumerate(stats['suit length histogram']) if count))
@@ -0,0 +1,527 @@
+"""
+This module contains the rules of the game without any display component.
+The GameEngine holds the state of a game (hands, bids, plays and scores) as card values
+and bitboards (see bitboard.py), and provides the rule steps which the Table goes through when running the game.
+If every seat has an AI component, the GameEngine can also play a full game by itself,
+which allows games to be simulated without a display.
+
+Given the same RNG state, a game played by the GameEngine gives the same outcome as the
+same game played on the Table.
+"""
+import random
+import copy
+import card_values
+import bitboard
+import seeding
+import table_snapshot
+from game_consts import GameState, PlayerRole, STARTING_HAND, NUM_OF_PLAYERS
+
+# Same order as the cards produced by cards.prepare_playing_cards
+FULL_DECK = [(i+1)*100 + j+2 for i in range(4) for j in range(13)]
+
+# Points of the J, Q, K, A of a suit, indexed by the top 4 bits of the suit mask
+HONOUR_SHIFT = 9
+HONOUR_POINTS = [sum(j+1 for j in range(4) if i & (1 << j)) for i in range(16)]
+
+
+def new_table_status():
+    """
+    Create the table status which is made known to the players and AI by reference
+    :return: dict
+    """
+    return {'played cards': [0, 0, 0, 0], 'leading player': 0, 'trump suit': 1,
+            'trump broken': False, 'round history': [], 'bid': 0, 'partner': 0,
+            'partner reveal': False, 'defender': {'target': 0, 'wins': 0},
+            'attacker': {'target': 0, 'wins': 0}}
+
+
+def get_card_points(hand):
+    """
+    Calculate the points of a hand to check for weak hands
+    :param hand: int, bitboard of the hand
+    :return: int
+    """
+    card_points = sum(HONOUR_POINTS[bitboard.get_suit(hand, suit) >> HONOUR_SHIFT] for suit in range(1, 5))
+    suit_lengths = [length for length in bitboard.suit_lengths(hand) if length]
+    suit_points = sum(length // 5 for length in suit_lengths[:-1])
+    # The last suit counts up to the full hand size
+    card_position = sum(suit_lengths[:-1])
+    suit_points += (STARTING_HAND-card_position) // 5
+    return suit_points + card_points
+
+
+def get_legal_plays(hand, lead_suit, trump_suit, trump_broken):
+    """
+    Get the cards in a hand which can be played: the cards of the leading suit if there are any,
+    and the cards other than trump when leading before the trump is broken, if there are any
+    :param hand: int, bitboard of the hand
+    :param lead_suit: int, the suit of the leading card, 0 when leading
+    :param trump_suit: int
+    :param trump_broken: bool
+    :return: int, bitboard of the valid plays
+    """
+    if lead_suit:
+        return hand & bitboard.SUIT_MASKS[lead_suit] or hand
+    if trump_broken:
+        return hand
+    return hand & ~bitboard.SUIT_MASKS[trump_suit] or hand
+
+
+def get_valid_plays(hand, leading, table_status):
+    """
+    Get the cards in a hand which can be played
+    :param hand: int, bitboard of the hand
+    :param leading: bool
+    :param table_status: dict
+    :return: int, bitboard of the valid plays
+    """
+    lead_suit = 0
+    if not leading:
+        lead_suit = card_values.get_card_suit(table_status['played cards'][table_status["leading player"]])
+    return get_legal_plays(hand, lead_suit, table_status['trump suit'], table_status['trump broken'])
+
+
+def check_for_valid_plays(hand, card, leading, table_status):
+    """
+    Check if the card played is valid
+    :param hand: int, bitboard of the hand
+    :param card: int
+    :param leading: bool
+    :param table_status: dict
+    :return: bool
+    """
+    return bool(bitboard.card_mask(card) & get_valid_plays(hand, leading, table_status))
+
+
+def get_trick_winner(played_cards, leading_player, trump_suit):
+    """
+    Determine the winner of a round
+    :param played_cards: list of int, the card played by each player
+    :param leading_player: int
+    :param trump_suit: int
+    :return: int, the winning player
+    """
+    leading_suit = card_values.get_card_suit(played_cards[leading_player])
+    card_suits = [card_values.get_card_suit(card) for card in played_cards]
+    card_nums = [card_values.get_card_number(card) for card in played_cards]
+    follow_suits = [suit == leading_suit for suit in card_suits]
+    trumps = [suit == trump_suit for suit in card_suits]
+
+    # Determine which players to check for winner, and determine winner
+    if any(trumps):
+        valid_nums = [card_nums[i] * trumps[i] for i in range(NUM_OF_PLAYERS)]
+    else:
+        valid_nums = [card_nums[i] * follow_suits[i] for i in range(NUM_OF_PLAYERS)]
+
+    return valid_nums.index(max(valid_nums))
+
+
+class Seat:
+    """
+    A seat in a headless game. It stands in for players.Player by providing
+    the hand queries used by the AI components.
+    """
+    def __init__(self, engine, player_num):
+        self.engine = engine
+        self.player_num = player_num
+        self.AI = None
+
+    def add_ai(self, ai_comp):
+        if self.AI is not None and self.AI is not ai_comp:
+            self.AI.close()
+        self.AI = ai_comp
+        ai_comp.connect_to_player(self)
+
+    def get_deck_values(self):
+        return bitboard.to_values(self.engine.hands[self.player_num])
+
+    def get_hand_mask(self):
+        return self.engine.hands[self.player_num]
+
+
+class GameEngine:
+    """
+    The rules of the game as a FSM without any display. See table.Table for the FSM cycles.
+    The Table calls the steps below in the same order as play_game, only interleaving them
+    with the display updates and the player inputs.
+    """
+
+    def __init__(self):
+        self.table_status = new_table_status()
+        self.hands = [0] * NUM_OF_PLAYERS  # As bitboards
+        self.roles = [PlayerRole.UNKNOWN] * NUM_OF_PLAYERS
+        self.scores = [0] * NUM_OF_PLAYERS
+        self.seats = [Seat(self, i) for i in range(NUM_OF_PLAYERS)]
+
+        # All played cards go into the discard pile, which is shuffled for the next deal
+        self.discard_deck = FULL_DECK.copy()
+
+        # The random streams of the deal and the starting bidder, see set_game_seed
+        self.deal_rng = random
+        self.bid_rng = random
+        # Whether to sort the discard pile before shuffling, so that the deal does not depend on the previous game
+        self.sort_discards = False
+        # The reshuffle decision for every weak hand in play_game, None to ask the AI
+        self.reshuffle_weak_hands = None
+        # The hands and the starting bidder of the next deal instead of a shuffle, see set_fixed_deal
+        self.fixed_deal = None
+        self.fixed_first_bidder = None
+
+        self.game_state = GameState.DEALING
+        self.reshuffling_players = []
+        self.reshuffles = 0
+        self.current_round = 0
+        self.passes = 0
+        self.current_player = 0
+        self.first_player = False  # This is for bidding purposes
+        self.declarer = 0
+
+        # What happened in the game, for game_record.GameRecord
+        self.dealt_hands = [0] * NUM_OF_PLAYERS
+        self.first_bidder = 0
+        self.bid_history = []
+        self.partner_card = 0
+        self.play_history = []
+
+    def add_ai(self, player_num, ai_comp):
+        self.seats[player_num].add_ai(ai_comp)
+
+    def get_snapshot(self, player_num=None):
+        """
+        :param player_num: int, the player whose hand is in the snapshot, None for no hand
+        :return: table_snapshot.TableSnapshot, of the current table status
+        """
+        hand = self.hands[player_num] if player_num is not None else 0
+        return table_snapshot.TableSnapshot.from_table_status(self.table_status, player=player_num, hand=hand)
+
+    def set_game_seed(self, game_seed):
+        """
+        Give the next game its own random streams for the deal, the starting bidder and the AI of the seats,
+        instead of the random module
+        :param game_seed: int, 64 bits
+        :return: None
+        """
+        self.deal_rng = seeding.SeedStream(game_seed, seeding.DEAL)
+        self.bid_rng = seeding.SeedStream(game_seed, seeding.BIDDING)
+        self.sort_discards = True
+        for seat in self.seats:
+            if seat.AI:
+                seat.AI.rng = seeding.get_ai_stream(game_seed, seat.player_num)
+
+    def set_fixed_deal(self, hands, first_bidder=None):
+        """
+        Deal these hands in the next deal instead of shuffling, e.g. the deal of a legacy seed file.
+        A reshuffle of the fixed deal is shuffled as usual.
+        :param hands: list of int, the bitboard of the hand of each player
+        :param first_bidder: int, the starting bidder of the deal, picked randomly if None
+        :return: None
+        """
+        self.fixed_deal = (list(hands), first_bidder)
+
+    def shuffle_and_deal(self):
+        """
+        Shuffle and deal the discard deck to the players, which should have 52 cards.
+        :return: None
+        """
+        if self.fixed_deal is not None and self.discard_deck:
+            hands, self.fixed_first_bidder = self.fixed_deal
+            self.fixed_deal = None
+            dealt = 0
+            for i, hand in enumerate(hands):
+                self.hands[i] |= hand
+                dealt |= hand
+            self.discard_deck = [card for card in self.discard_deck if not dealt & bitboard.card_mask(card)]
+            return
+        self.fixed_first_bidder = None
+        if self.discard_deck:
+            if self.sort_discards:
+                self.discard_deck.sort()
+            for i in range(10):
+                self.deal_rng.shuffle(self.discard_deck)
+            for i in range(NUM_OF_PLAYERS):
+                for _ in range(STARTING_HAND):
+                    self.hands[i] |= bitboard.card_mask(self.discard_deck.pop())
+
+    def check_points(self):
+        """
+        Detect weak hands, and move on to the point check if there is any
+        :return: list of int, the players with weak hands
+        """
+        self.reshuffling_players = [i for i, hand in enumerate(self.hands) if get_card_points(hand) < 4]
+        if self.reshuffling_players:
+            self.current_player = self.reshuffling_players[0]
+            self.game_state = GameState.POINT_CHECK
+        else:
+            self.game_state = GameState.BIDDING
+        return self.reshuffling_players
+
+    def record_reshuffle(self, reshuffle):
+        """
+        Record the reshuffle decision of the current player and move on to the next player with a weak hand
+        :param reshuffle: bool, True to reshuffle
+        :return: bool, whether the point check is over
+        """
+        self.current_player = (self.current_player + 1) % NUM_OF_PLAYERS
+        while self.current_player not in self.reshuffling_players:
+            self.current_player = (self.current_player + 1) % NUM_OF_PLAYERS
+
+        if reshuffle is False and not self.current_player == self.reshuffling_players[-1]:
+            return False
+
+        if reshuffle:
+            self.reshuffles += 1
+            self.game_state = GameState.ENDING
+        else:
+            self.game_state = GameState.BIDDING
+        return True
+
+    def prepare_bidding(self, starting_player=None):
+        """
+        Set up the bidding of the dealt hands, which are the hands kept for the game history
+        :param starting_player: int, the starting bidder, picked randomly if None
+        :return: None
+        """
+        # Randomly pick a starting player, whom also is the current bid winner
+        if starting_player is None:
+            starting_player = self.fixed_first_bidder
+            self.fixed_first_bidder = None
+        if starting_player is None:
+            starting_player = self.bid_rng.randint(1, NUM_OF_PLAYERS) - 1
+        self.current_player = starting_player
+        self.dealt_hands = list(self.hands)
+        self.first_bidder = starting_player
+        self.bid_history = []
+        self.play_history = []
+        self.passes = 0
+        self.table_status["bid"] = 11  # Lowest Bid: 1 Club by default
+        self.first_player = True  # Starting bidder "privilege" to raise the starting bid
+
+    def get_bid_leader(self):
+        return (self.current_player - self.passes - 1 * (not self.first_player)) % NUM_OF_PLAYERS
+
+    def bidding_complete(self):
+        # Highest bid: 7 NoTrump. No further check required
+        return not (self.passes < NUM_OF_PLAYERS - 1 and self.table_status["bid"] < 75)
+
+    def process_bid(self, player_bid):
+        """
+        Process a valid bid from the current player and move on to the next player
+        :param player_bid: int, 0 or None to pass
+        :return: None
+        """
+        self.bid_history.append(player_bid or 0)
+        if not player_bid:
+            if not self.first_player:  # Starting bidder pass do not count at the start
+                self.passes += 1
+        else:
+            self.table_status["bid"] = player_bid
+            self.passes = 0
+
+        self.first_player = False
+
+        if self.table_status["bid"] < 75:
+            self.current_player += 1
+            self.current_player %= NUM_OF_PLAYERS
+
+    def set_partner(self, partner):
+        """
+        Set the partner card called by the bid winner and set up the table status before the play starts
+        :param partner: int, card value
+        :return: None
+        """
+        self.partner_card = partner
+        self.table_status["partner"] = partner
+        self.table_status['partner reveal'] = False
+        self.table_status["trump suit"] = self.table_status["bid"] % 10
+        self.table_status["trump broken"] = False
+        self.table_status['played cards'] = [0, 0, 0, 0]
+        if self.table_status['trump suit'] == 5:
+            self.table_status["leading player"] = self.current_player
+        else:
+            self.table_status["leading player"] = (self.current_player + 1) % NUM_OF_PLAYERS
+        self.table_status['defender']['target'] = self.table_status["bid"] // 10 + 6
+        self.table_status['attacker']['target'] = 14 - self.table_status['defender']['target']
+
+        # Set the roles of the players
+        self.declarer = self.current_player
+        self.roles[self.current_player] = PlayerRole.DECLARER
+        self.game_state = GameState.PLAYING
+
+    def is_leading(self):
+        return not any(self.table_status["played cards"])
+
+    def trick_complete(self):
+        return all(self.table_status["played cards"])
+
+    def start_trick(self):
+        self.current_player = self.table_status['leading player']
+
+    def play_card(self, card):
+        """
+        Play a card from the current player's hand, then move on to the next player
+        :param card: int, card value
+        :return: (bool, bool), whether the trump is broken and whether the partner is revealed by this card
+        """
+        self.hands[self.current_player] &= ~bitboard.card_mask(card)
+        self.table_status["played cards"][self.current_player] = card
+        self.play_history.append(card)
+
+        # Break trump if the trump suit is played
+        trump_broken = False
+        if not self.table_status['trump broken']:
+            self.table_status['trump broken'] = card_values.get_card_suit(card) == self.table_status['trump suit']
+            trump_broken = self.table_status['trump broken']
+
+        partner_revealed = False
+        if not self.table_status['partner reveal']:
+            if card == self.table_status['partner']:
+                self.table_status['partner reveal'] = True
+                self.reveal_all_roles(self.current_player)
+                partner_revealed = True
+
+        self.current_player += 1
+        self.current_player %= NUM_OF_PLAYERS
+        return trump_broken, partner_revealed
+
+    def get_trick_winner(self):
+        return get_trick_winner(self.table_status["played cards"], self.table_status['leading player'],
+                                self.table_status['trump suit'])
+
+    def complete_trick(self, winning_player):
+        """
+        Update the scoring, set the next leading player and update round history.
+        The played cards go into the discard pile.
+        :param winning_player: int
+        :return: None
+        """
+        self.scores[winning_player] += 1
+        self.discard_deck.extend(self.table_status["played cards"])
+
+        if self.roles[winning_player] == PlayerRole.DECLARER or \
+                self.roles[winning_player] == PlayerRole.PARTNER:
+            self.table_status['defender']['wins'] += 1
+        elif self.roles[winning_player] == PlayerRole.ATTACKER:
+            self.table_status['attacker']['wins'] += 1
+
+        self.table_status['leading player'] = winning_player
+        self.table_status['round history'].append(copy.copy(self.table_status["played cards"]))
+        self.table_status["played cards"] = [0]*NUM_OF_PLAYERS
+        self.current_round += 1
+        if self.current_round == 13:
+            self.game_state = GameState.ENDING
+
+    def reveal_all_roles(self, partner):
+        """
+        Update all roles once the partner card is shown
+        Also updates the partner to the player number
+        :param partner:
+        :return:
+        """
+        self.roles[partner] = PlayerRole.PARTNER
+        self.table_status["partner"] = partner
+        self.table_status['defender']['wins'] += self.scores[partner]
+        for i in range(NUM_OF_PLAYERS):
+            if self.roles[i] == PlayerRole.UNKNOWN:
+                self.roles[i] = PlayerRole.ATTACKER
+                self.table_status['attacker']['wins'] += self.scores[i]
+
+    def attacker_won(self):
+        return self.table_status['attacker']['wins'] >= self.table_status['attacker']['target']
+
+    def declarer_won(self):
+        return self.table_status['defender']['wins'] >= self.table_status['defender']['target']
+
+    def get_game_result(self):
+        """
+        Summarise a completed game
+        :return: dict
+        """
+        return {'bid': self.table_status['bid'], 'declarer': self.declarer,
+                'partner': self.table_status['partner'], 'contract made': self.declarer_won(),
+                'declarer wins': self.table_status['defender']['wins'],
+                'attacker wins': self.table_status['attacker']['wins'],
+                'reshuffles': self.reshuffles}
+
+    def reset_game(self):
+        """
+        Reset all variables for the next deal. The cards in the hands go back into the discard pile.
+        :return: None
+        """
+        for i, hand in enumerate(self.hands):
+            # Cards are taken from the top of the sorted hand
+            self.discard_deck.extend(reversed(bitboard.to_values(hand)))
+            self.hands[i] = 0
+        self.scores = [0] * NUM_OF_PLAYERS
+        self.roles = [PlayerRole.UNKNOWN] * NUM_OF_PLAYERS
+        self.table_status['defender']['wins'] = 0
+        self.table_status['attacker']['wins'] = 0
+        self.table_status["played cards"] = [0]*NUM_OF_PLAYERS
+        self.table_status['round history'] = []
+        self.current_round = 0
+        self.game_state = GameState.DEALING
+
+    def play_game(self, game_seed=None):
+        """
+        Play a full game with the AI components of the seats, going through the same FSM as table.Table.
+        A reshuffle restarts the deal within the same game.
+        :param game_seed: int, to play the game from its own random streams, see set_game_seed
+        :return: dict, the game result
+        """
+        if self.game_state == GameState.ENDING:
+            self.reset_ais()
+            self.reset_game()
+        if game_seed is not None:
+            self.set_game_seed(game_seed)
+        self.reshuffles = 0
+
+        while True:
+            if self.game_state == GameState.DEALING:
+                self.shuffle_and_deal()
+                if not self.check_points():
+                    self.prepare_bidding()
+
+            elif self.game_state == GameState.POINT_CHECK:
+                if self.reshuffle_weak_hands is None:
+                    reshuffle = self.seats[self.current_player].AI.request_reshuffle()
+                else:
+                    reshuffle = self.reshuffle_weak_hands
+                if self.record_reshuffle(reshuffle) and self.game_state == GameState.BIDDING:
+                    self.prepare_bidding()
+
+            elif self.game_state == GameState.BIDDING:
+                if not self.bidding_complete():
+                    self.process_bid(self.seats[self.current_player].AI.make_a_bid())
+                else:
+                    self.set_partner(self.seats[self.current_player].AI.call_partner())
+
+            elif self.game_state == GameState.PLAYING:
+                if self.trick_complete():
+                    winning_player = self.get_trick_winner()
+                    for seat in self.seats:
+                        seat.AI.update_memory()
+                    self.complete_trick(winning_player)
+                    if self.game_state == GameState.ENDING:
+                        return self.get_game_result()
+                else:
+                    leading = self.is_leading()
+                    if leading:
+                        self.start_trick()
+                    card = self.seats[self.current_player].AI.make_a_play(0 if leading else 1)
+                    self.play_card(card)
+            else:
+                self.reset_ais()
+                self.reset_game()
+
+    def close(self):
+        """
+        Close the AI of the seats
+        :return: None
+        """
+        for seat in self.seats:
+            if seat.AI:
+                seat.AI.close()
+
+    def reset_ais(self):
+        for seat in self.seats:
+            if seat.AI:
+                seat.AI.reset_memory()
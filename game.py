@@ -2,43 +2,117 @@ import view
 import pygame
 import table
 
+# How long to wait for an event when there is nothing to do, in ms
+IDLE_TIMEOUT = 500
+
 
 class GameScreen(view.PygView):
 
-    def __init__(self, *args, autoplay=False, view_all_cards=False, terminal=False, **kwargs):
+    def __init__(self, *args, autoplay=False, view_all_cards=False, terminal=False, delay_scale=1.0, record_path=None,
+                 game_seed=None, profile=False, trace_path=None, chrome_trace_path=None,
+                 soak_games=0, fixed_deal=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.table = table.Table(0, 0, self.width, self.height, (0, 32, 0),
-                                   autoplay=autoplay, view_all_cards=view_all_cards, terminal=terminal)
+                                   autoplay=autoplay, view_all_cards=view_all_cards, terminal=terminal,
+                                   delay_scale=delay_scale, record_path=record_path,
+                                   game_seed=game_seed, profile=profile, trace_path=trace_path,
+                                   chrome_trace_path=chrome_trace_path, soak_games=soak_games,
+                                   fixed_deal=fixed_deal)
+        if self.table.profiler is not None:
+            self.draw_table = self.table.profiler.wrap(self.draw_table, 'redraw')
         self.table.update_table.connect(self.draw_table)
+        # The whole screen is drawn once, then only the areas changed
+        self.full_redraw = True
+        # Whether the display was updated since the last frame
+        self.frame_drawn = False
         self.draw_table()
         self.running = False
 
-    def draw_table(self, **kwargs):
-        # TODO: optimise this by only redrawing the parts that changes
-        self.screen.blit(self.background, (0, 0))
-        self.screen.blit(self.table.background, self.table.get_pos())
-        for player in self.table.players:
-            self.screen.blit(player.deck_surface, player.get_pos())
-        for playerzone in self.table.players_playzone:
-            self.screen.blit(playerzone.deck_surface, playerzone.get_pos())
+    def get_layers(self):
+        """
+        All the surfaces on the screen with their area, from the bottom up
+        :return: list of (pygame.Surface, pygame.Rect)
+        """
+        layers = [(self.background, self.screen.get_rect()),
+                  (self.table.background, self.table.background.get_rect(topleft=self.table.get_pos()))]
+        for deck in self.table.players + self.table.players_playzone:
+            layers.append((deck.deck_surface, deck.rect))
         for i, announcer_line in enumerate(self.table.announcer_line):
-            self.screen.blit(announcer_line, (self.table.announcer_x,
-                                              self.table.announcer_y+self.table.announcer_height*i/3))
+            layers.append((announcer_line, self.table.get_announcer_rect(i)))
         for i, player_stats in enumerate(self.table.player_stats):
             for j, stats_line in enumerate(player_stats):
-                self.screen.blit(stats_line, (self.table.player_stats_x[i],
-                                              self.table.player_stats_y[i]+self.table.stats_height*j/3))
-
+                layers.append((stats_line, self.table.get_stats_rect(i, j)))
         for element in self.table.UI_elements:
             if element.visible:
-                self.screen.blit(element.background, element.get_pos())
+                layers.append((element.background, element.rect))
+        return layers
+
+    def draw_table(self, **kwargs):
+        """
+        Redraw the areas of the table which changed, and update only these areas of the display
+        :return: None
+        """
+        dirty_rects = self.table.get_dirty_rects()
+        if self.full_redraw:
+            self.full_redraw = False
+            for surface, rect in self.get_layers():
+                self.screen.blit(surface, rect)
+            pygame.display.flip()
+            self.frame_drawn = True
+            return
 
-        pygame.display.flip()
+        if not dirty_rects:
+            return
+        layers = self.get_layers()
+        for dirty_rect in dirty_rects:
+            # Everything under the area is redrawn, clipped to the area
+            self.screen.set_clip(dirty_rect)
+            for surface, rect in layers:
+                if rect.colliderect(dirty_rect):
+                    self.screen.blit(surface, rect)
+        self.screen.set_clip(None)
+        pygame.display.update(dirty_rects)
+        self.frame_drawn = True
+
+    def is_busy(self):
+        """
+        Whether the game can proceed without any event, i.e. it is not waiting for the player
+        Terminal inputs are blocking, so they do not wait for events.
+        :return: bool
+        """
+        return self.table.ongoing and (not self.table.require_player_input or self.table.terminal_play)
+
+    def get_events(self):
+        """
+        Get the pending events. If the game is idle or held, sleep until an event comes,
+        the hold is over or the timeout passes.
+        :return: list of events
+        """
+        wait_time = 0
+        if self.table.ongoing:
+            wait_time = self.table.scheduler.get_wait_time()
+        if self.is_busy() and not wait_time:
+            return pygame.event.get()
+
+        timeout = IDLE_TIMEOUT
+        if wait_time:
+            timeout = min(timeout, int(wait_time * 1000) + 1)
+        event = pygame.event.wait(timeout)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
 
     def run(self):
+        """
+        The main loop. It sleeps on the events when idle, and the frames drawn in response to the player
+        are paced to the fps. Bot turns run without pacing.
+        :return: None
+        """
         self.running = True
+        if self.table.soak:
+            self.table.ongoing = True
         while self.running:
-            all_events = pygame.event.get()
+            all_events = self.get_events()
             for event in all_events:
                 if event.type == pygame.QUIT:
                     self.running = False
@@ -51,5 +125,19 @@ class GameScreen(view.PygView):
                 self.table.process_UI(event)
             if self.table.ongoing:
                 self.table.continue_game(all_events)
+                # The soak mode starts the next game straight away
+                if self.table.soak and not self.table.ongoing:
+                    self.table.ongoing = True
+            # All the changes of the frame are drawn at once
+            self.table.flush_redraw()
+
+            # Bot turns are not slowed down by the pacing
+            if self.frame_drawn:
+                self.frame_drawn = False
+                if not self.is_busy():
+                    self.clock.tick(self.fps)
 
+        if self.table.profiler is not None:
+            self.table.profiler.flush()
+        self.table.close()
         pygame.quit()
@@ -1,5 +1,5 @@
 from enum import Enum
-import pygame
+
 
 class GameState(Enum):
     DEALING = 0
@@ -20,6 +20,3 @@ NUM_OF_PLAYERS = 4
 STARTING_HAND = 13
 HIGHEST_CARD = 414
 LOWEST_CARD = 102
-DOUBLE_CLICK_EVENT = pygame.USEREVENT + 1
-DOUBLE_CLICK_TIMING = 300
-CALL_EVENT = pygame.USEREVENT + 2
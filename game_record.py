@@ -0,0 +1,301 @@
+"""
+This module stores played games as compact binary records, and replays them without a display.
+A record holds the dealt hands, the bids, the partner call and the plays of a game, with each card
+as its bit index (see bitboard.py), so a game takes about 120 bytes.
+
+The records of a GameRecordFile are appended to a single file. A second file next to it holds
+the offset of every record, so any game can be read without going through the earlier ones.
+A replay goes through the same rule steps as the GameEngine, and can stop at any trick.
+
+Run this module with a record file to print its games:
+    python game_record.py games.sbgr [game number] [trick]
+"""
+import os
+import struct
+import sys
+import bitboard
+import card_values
+from engine import GameEngine, check_for_valid_plays
+from game_consts import GameState, NUM_OF_PLAYERS, STARTING_HAND
+
+FILE_HEADER = b'SBGR\x01'
+LENGTH_FORMAT = struct.Struct('<H')
+OFFSET_FORMAT = struct.Struct('<Q')
+INDEX_SUFFIX = '.idx'
+
+
+class GameRecord:
+    """
+    The history of a game
+    :param dealt_hands: list of int, the bitboard of each hand before the bidding
+    :param first_bidder: int
+    :param bids: list of int, the bid of each turn, 0 for a pass
+    :param partner: int, the partner card value
+    :param plays: list of int, the card values in the order they are played
+    """
+
+    def __init__(self, dealt_hands, first_bidder, bids, partner, plays):
+        self.dealt_hands = list(dealt_hands)
+        self.first_bidder = first_bidder
+        self.bids = list(bids)
+        self.partner = partner
+        self.plays = list(plays)
+
+    @classmethod
+    def from_engine(cls, engine):
+        """
+        Take the record of the game played in a GameEngine
+        :param engine: engine.GameEngine, after the bidding has started
+        :return: GameRecord
+        """
+        return cls(engine.dealt_hands, engine.first_bidder, engine.bid_history,
+                   engine.partner_card, engine.play_history)
+
+    def get_tricks(self):
+        """
+        :return: int, the number of complete tricks
+        """
+        return len(self.plays) // NUM_OF_PLAYERS
+
+    def to_bytes(self):
+        """
+        Pack the record, without the length prefix
+        :return: bytes
+        """
+        data = bytearray()
+        for hand in self.dealt_hands:
+            data.extend(bitboard.card_to_bit(card) for card in bitboard.to_values(hand))
+        data.append(self.first_bidder)
+        data.append(len(self.bids))
+        data.extend(self.bids)
+        data.append(bitboard.card_to_bit(self.partner))
+        data.append(len(self.plays))
+        data.extend(bitboard.card_to_bit(card) for card in self.plays)
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Unpack a record packed by to_bytes
+        :param data: bytes
+        :return: GameRecord
+        """
+        deal_size = NUM_OF_PLAYERS * STARTING_HAND
+        dealt_hands = [0] * NUM_OF_PLAYERS
+        for i in range(deal_size):
+            dealt_hands[i // STARTING_HAND] |= 1 << data[i]
+        pos = deal_size
+        first_bidder = data[pos]
+        n_bids = data[pos+1]
+        pos += 2
+        bids = list(data[pos:pos+n_bids])
+        pos += n_bids
+        partner = bitboard.bit_to_card(data[pos])
+        n_plays = data[pos+1]
+        pos += 2
+        plays = [bitboard.bit_to_card(bit) for bit in data[pos:pos+n_plays]]
+        if len(plays) != n_plays:
+            raise ValueError('Truncated game record')
+        return cls(dealt_hands, first_bidder, bids, partner, plays)
+
+    def replay(self, tricks=None):
+        """
+        Replay the game in a new GameEngine. Every play is checked against the rules.
+        :param tricks: int, the number of tricks to replay, all of them if None
+        :return: engine.GameEngine, at the start of the next trick, or at the end of the game
+        :raises ValueError: if the record is not a game which can be played
+        """
+        engine = GameEngine()
+        engine.hands = list(self.dealt_hands)
+        engine.discard_deck = []
+        engine.game_state = GameState.BIDDING
+        engine.prepare_bidding(self.first_bidder)
+        for bid in self.bids:
+            engine.process_bid(bid)
+        if not engine.bidding_complete():
+            raise ValueError('The bidding of the game record is incomplete')
+        engine.set_partner(self.partner)
+
+        n_plays = len(self.plays)
+        if tricks is not None:
+            n_plays = min(n_plays, tricks * NUM_OF_PLAYERS)
+        for card in self.plays[:n_plays]:
+            if engine.is_leading():
+                engine.start_trick()
+            hand = engine.hands[engine.current_player]
+            if not hand & bitboard.card_mask(card):
+                raise ValueError('Player {0:d} does not hold {1:s}'.format(engine.current_player,
+                                                                         card_values.get_card_string(card)))
+            if not check_for_valid_plays(hand, card, engine.is_leading(), engine.table_status):
+                raise ValueError('Player {0:d} cannot play {1:s}'.format(engine.current_player,
+                                                                       card_values.get_card_string(card)))
+            engine.play_card(card)
+            if engine.trick_complete():
+                engine.complete_trick(engine.get_trick_winner())
+        return engine
+
+
+class GameRecordFile:
+    """
+    An append-only file of game records, with its offset index
+    :param path: str, the record file, created if it does not exist
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        if not os.path.exists(path):
+            with open(path, 'wb') as record_file:
+                record_file.write(FILE_HEADER)
+            with open(self.index_path, 'wb'):
+                pass
+        else:
+            with open(path, 'rb') as record_file:
+                if record_file.read(len(FILE_HEADER)) != FILE_HEADER:
+                    raise ValueError('{0:s} is not a game record file'.format(path))
+            if not self.index_is_valid():
+                self.rebuild_index()
+
+    def __len__(self):
+        return os.path.getsize(self.index_path) // OFFSET_FORMAT.size
+
+    def __getitem__(self, game_num):
+        return self.read(game_num)
+
+    def __iter__(self):
+        """
+        Go through all the records in a single pass over the file
+        """
+        with open(self.path, 'rb') as record_file:
+            for offset, data in iter_records(record_file):
+                yield GameRecord.from_bytes(data)
+
+    def index_is_valid(self):
+        """
+        Check that the index ends at the last record, which is not the case if writing either file was cut short
+        :return: bool
+        """
+        if not os.path.exists(self.index_path):
+            return False
+        file_size = os.path.getsize(self.path)
+        index_size = os.path.getsize(self.index_path)
+        if index_size % OFFSET_FORMAT.size:
+            return False
+        if not index_size:
+            return file_size == len(FILE_HEADER)
+        with open(self.index_path, 'rb') as index_file:
+            index_file.seek(index_size - OFFSET_FORMAT.size)
+            offset, = OFFSET_FORMAT.unpack(index_file.read(OFFSET_FORMAT.size))
+        with open(self.path, 'rb') as record_file:
+            record_file.seek(offset)
+            length_data = record_file.read(LENGTH_FORMAT.size)
+        if len(length_data) < LENGTH_FORMAT.size:
+            return False
+        length, = LENGTH_FORMAT.unpack(length_data)
+        return offset + LENGTH_FORMAT.size + length == file_size
+
+    def rebuild_index(self):
+        """
+        Rewrite the index by going through the records. A partly written record at the end is dropped.
+        :return: None
+        """
+        offsets = []
+        end = len(FILE_HEADER)
+        with open(self.path, 'rb+') as record_file:
+            for offset, data in iter_records(record_file):
+                offsets.append(offset)
+                end = offset + LENGTH_FORMAT.size + len(data)
+            record_file.truncate(end)
+        with open(self.index_path, 'wb') as index_file:
+            index_file.write(b''.join(OFFSET_FORMAT.pack(offset) for offset in offsets))
+
+    def append(self, record):
+        """
+        Add a record at the end of the file
+        :param record: GameRecord
+        :return: int, the game number of the record
+        """
+        data = record.to_bytes()
+        with open(self.path, 'ab') as record_file:
+            offset = record_file.tell()
+            record_file.write(LENGTH_FORMAT.pack(len(data)) + data)
+        with open(self.index_path, 'ab') as index_file:
+            game_num = index_file.tell() // OFFSET_FORMAT.size
+            index_file.write(OFFSET_FORMAT.pack(offset))
+        return game_num
+
+    def read(self, game_num):
+        """
+        Read a record through the index
+        :param game_num: int, negative to count from the end
+        :return: GameRecord
+        """
+        n_games = len(self)
+        if game_num < 0:
+            game_num += n_games
+        if not 0 <= game_num < n_games:
+            raise IndexError('Game {0:d} is not in {1:s}'.format(game_num, self.path))
+        with open(self.index_path, 'rb') as index_file:
+            index_file.seek(game_num * OFFSET_FORMAT.size)
+            offset, = OFFSET_FORMAT.unpack(index_file.read(OFFSET_FORMAT.size))
+        with open(self.path, 'rb') as record_file:
+            record_file.seek(offset)
+            length, = LENGTH_FORMAT.unpack(record_file.read(LENGTH_FORMAT.size))
+            return GameRecord.from_bytes(record_file.read(length))
+
+
+def iter_records(record_file):
+    """
+    Go through the complete records of an open record file
+    :param record_file: file object, opened in binary mode
+    :return: generator of (int, bytes), the offset and the packed record
+    """
+    record_file.seek(len(FILE_HEADER))
+    while True:
+        offset = record_file.tell()
+        length_data = record_file.read(LENGTH_FORMAT.size)
+        if len(length_data) < LENGTH_FORMAT.size:
+            return
+        length, = LENGTH_FORMAT.unpack(length_data)
+        data = record_file.read(length)
+        if len(data) < length:
+            return
+        yield offset, data
+
+
+def print_game(record, tricks=None):
+    """
+    Print the replay of a game record
+    :param record: GameRecord
+    :param tricks: int, the number of tricks to print, all of them if None
+    :return: None
+    """
+    for i, hand in enumerate(record.dealt_hands):
+        print('Player {0:d}: {1:s}'.format(i, ' '.join(card_values.get_card_string(card)
+                                                        for card in bitboard.to_values(hand))))
+    bids = ', '.join(str(bid // 10) + ' ' + card_values.get_suit_string(bid % 10) if bid else 'pass'
+                    for bid in record.bids)
+    print('Bids from player {0:d}: {1:s}'.format(record.first_bidder, bids))
+    print('Partner card: {0:s}'.format(card_values.get_card_string(record.partner)))
+
+    engine = record.replay(tricks)
+    for i, played_cards in enumerate(engine.table_status['round history']):
+        print('Trick {0:d}: {1:s}'.format(i+1, ' '.join(card_values.get_card_string(card)
+                                                         for card in played_cards)))
+    if engine.game_state == GameState.ENDING:
+        print(engine.get_game_result())
+    else:
+        print('Player {0:d} to lead, declarer side wins: {1:d}, attacker side wins: {2:d}'.format(
+            engine.table_status['leading player'], engine.table_status['defender']['wins'],
+            engine.table_status['attacker']['wins']))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python game_record.py record_file [game number] [trick]')
+        sys.exit(1)
+    games = GameRecordFile(sys.argv[1])
+    if len(sys.argv) < 3:
+        print('{0:d} games in {1:s}'.format(len(games), sys.argv[1]))
+    else:
+        print_game(games.read(int(sys.argv[2])), int(sys.argv[3]) if len(sys.argv) > 3 else None)
@@ -2,6 +2,7 @@ import random
 import pickle
 import sys
 import game
+import seeding
 
 """
 This script is to run the game. It would process any input argument and pass into the game.
@@ -11,19 +12,46 @@ if __name__ == '__main__':
     AUTOPLAY = False
     VIEW_ALL_CARDS = False
     TERMINAL = False
+    DELAY_SCALE = 1.0
+    RECORD_PATH = None
+    GAME_SEED = None
+    FIXED_DEAL = None
+    PROFILE = False
+    TRACE_PATH = None
+    CHROME_TRACE_PATH = None
+    SOAK_GAMES = 0
 
     if len(sys.argv) > 1:
         prev_command = ""
         for command in sys.argv[1:]:
             if prev_command == "--seed" or prev_command == "-s":
+                if command.isdigit():
+                    GAME_SEED = int(command)
+                else:
+                    # A legacy seed file gives the deal it was saved for
+                    try:
+                        FIXED_DEAL = seeding.convert_rng_file(command)
+                    except (OSError, pickle.UnpicklingError, EOFError, TypeError, ValueError):
+                        print("RNG File not Found")
+            if prev_command == "--delay" or prev_command == "-d":
                 try:
-                    with open(command, 'rb') as f:
-                        # The protocol version used is detected automatically, so we do not
-                        # have to specify it.
-                        rng_state = pickle.load(f)
-                    random.setstate(rng_state)
-                except:
-                    print("RNG File not Found")
+                    DELAY_SCALE = max(0.0, float(command))
+                except ValueError:
+                    print("Invalid delay scale")
+            if prev_command == "--record" or prev_command == "-r":
+                RECORD_PATH = command
+            if prev_command == "--trace":
+                TRACE_PATH = command
+            if prev_command == "--chrome-trace":
+                CHROME_TRACE_PATH = command
+            if prev_command == "--soak":
+                try:
+                    SOAK_GAMES = max(1, int(command))
+                    AUTOPLAY = True
+                except ValueError:
+                    print("Invalid number of games between soak samples")
+            if command == "--profile" or command == "-p":
+                PROFILE = True
             if command == "--view-all" or command == "-va":
                 VIEW_ALL_CARDS = True
             if command == "--auto" or command == "-a":
@@ -41,6 +69,10 @@ if __name__ == '__main__':
     #random.setstate(rng_state)
 
     main_view = game.GameScreen(800, 600, clear_colour=(255, 0, 0),
-                           autoplay=AUTOPLAY, view_all_cards=VIEW_ALL_CARDS, terminal=TERMINAL)
+                           autoplay=AUTOPLAY, view_all_cards=VIEW_ALL_CARDS, terminal=TERMINAL,
+                           delay_scale=DELAY_SCALE, record_path=RECORD_PATH,
+                           game_seed=GAME_SEED, profile=PROFILE, trace_path=TRACE_PATH,
+                           chrome_trace_path=CHROME_TRACE_PATH, soak_games=SOAK_GAMES,
+                           fixed_deal=FIXED_DEAL)
 
     main_view.run()
\ No newline at end of file
@@ -1,7 +1,9 @@
 import cards
+import engine
 import pprint
 import pygame
-from game_consts import GameState, PlayerRole, STARTING_HAND, DOUBLE_CLICK_EVENT, DOUBLE_CLICK_TIMING, CALL_EVENT
+from game_consts import GameState
+from view import DOUBLE_CLICK_EVENT, DOUBLE_CLICK_TIMING, CALL_EVENT
 
 
 class Player(cards.Deck):
@@ -22,18 +24,19 @@ class Player(cards.Deck):
     if it is not a bot.
 
     """
-    def __init__(self, *args, ai_component=None, **kwargs):
+    def __init__(self, *args, ai_component=None, player_num=None, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.role = PlayerRole.UNKNOWN
         self.AI = ai_component
+        self.player_num = player_num
         self._table_status = None  # This is found in Table and updated through Table
-        self.score = 0
 
     def connect_to_table(self, table):
         self._table_status = table
 
     def add_ai(self, ai_comp):
+        if self.AI is not None and self.AI is not ai_comp:
+            self.AI.close()
         self.AI = ai_comp
         ai_comp.connect_to_player(self)
         self.selectable = False
@@ -146,36 +149,10 @@ class Player(cards.Deck):
         :param leading: bool
         :return:
         """
-        if not self.check_card_in(card):
-            return False
-        card_suit = cards.get_card_suit(card)
-        if leading:
-            if not self._table_status['trump broken'] and \
-                    card_suit == self._table_status['trump suit']:
-                if any([not cards.get_card_suit(crd) == self._table_status['trump suit'] for crd in self.get_deck_values()]):
-                    return False
-        else:
-            leading_card_suit = self._table_status['played cards'][self._table_status["leading player"]].suit()
-            if not card_suit == leading_card_suit and \
-                any([cards.get_card_suit(crd) == leading_card_suit for crd in
-                    self.get_deck_values()]):
-                return False
-
-        return True
+        return engine.check_for_valid_plays(self.get_hand_mask(), card, leading, self._table_status)
 
     def get_card_points(self):
-        suit_points = 0
-        card_points = []
-        current_suit = 1
-        card_position = 0
-        for (i, card) in enumerate(self.cards):
-            if card.suit() != current_suit:
-                suit_points += (i-card_position) // 5
-                card_position = i
-                current_suit = card.suit()
-            card_points.append(max(0, card.number() - 10))
-        suit_points += (STARTING_HAND-card_position) // 5
-        return suit_points + sum(card_points)
+        return engine.get_card_points(self.get_hand_mask())
 
     def request_reshuffle(self, game_events=None):
         # Players can choose NOT to reshuffle
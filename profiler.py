@@ -0,0 +1,183 @@
+"""
+This module contains the Profiler, an opt-in instrumentation of the game which records the wall time and the
+number of calls of the timed sections, such as the steps of each game state, the AI decisions and the redraws.
+A section timed inside another one, e.g. an AI decision during a game step, is also counted in the outer one.
+
+The Profiler keeps the totals of each section for the summary of a game, and every timed call as an event
+for the trace of the game, which is written as JSON lines:
+    {"name": "make_a_play", "cat": "ai", "game": 0, "start": 1.5, "dur": 0.0002}
+with the times in seconds since the Profiler was created. Marks, such as the state transitions, have no duration.
+
+The events can also be written in the Chrome trace event format, to be opened in chrome://tracing or Perfetto.
+The events are kept as tuples and written at the end of each game, so the trace can stay on for long sessions.
+The Chrome trace is a JSON array left open, as allowed by the format, so that each game can be appended to it.
+"""
+import os
+import json
+import time
+import functools
+import contextlib
+
+
+# The Chrome trace thread of each category, the others go to the main thread
+CHROME_THREADS = {'hold': (2, 'Holds')}
+CHROME_MAIN_THREAD = (1, 'Game')
+
+
+class Profiler:
+    """
+    :param trace_path: str, the file the events of each game are appended to as JSON lines
+    :param chrome_trace_path: str, the file the events of each game are appended to in the Chrome trace format
+    :param print_summary: bool, whether to print the summary of each game
+    """
+
+    def __init__(self, trace_path=None, chrome_trace_path=None, print_summary=True):
+        self.trace_path = trace_path
+        self.chrome_trace_path = chrome_trace_path
+        self.keep_events = bool(trace_path or chrome_trace_path)
+        self.print_summary = print_summary
+        self.start_time = time.perf_counter()
+        self.game_num = 0
+        self.totals = {}  # [calls, seconds] by (category, name)
+        self.events = []
+
+    def record(self, category, name, start, duration):
+        """
+        Add a timed call
+        :param category: str
+        :param name: str
+        :param start: float, time.perf_counter() at the start of the call
+        :param duration: float, seconds
+        :return: None
+        """
+        total = self.totals.get((category, name))
+        if total is None:
+            total = self.totals[category, name] = [0, 0.0]
+        total[0] += 1
+        total[1] += duration
+        if self.keep_events:
+            self.events.append((category, name, start - self.start_time, duration))
+
+    def mark(self, category, name):
+        """
+        Add an event without duration to the trace
+        :param category: str
+        :param name: str
+        :return: None
+        """
+        if self.keep_events:
+            self.events.append((category, name, time.perf_counter() - self.start_time, None))
+
+    @contextlib.contextmanager
+    def measure(self, category, name):
+        """
+        Time the calls in a with block
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(category, name, start, time.perf_counter() - start)
+
+    def wrap(self, function, category, name=None):
+        """
+        :param function: callable
+        :param category: str
+        :param name: str, the name of the function if None
+        :return: callable, the function timed on every call
+        """
+        name = name or function.__name__
+
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(category, name, start, time.perf_counter() - start)
+        return timed_function
+
+    def instrument(self, obj, method_names, category):
+        """
+        Time the methods of an object, by replacing them on the object only
+        :param obj: object
+        :param method_names: iterable of str
+        :param category: str
+        :return: None
+        """
+        for method_name in method_names:
+            setattr(obj, method_name, self.wrap(getattr(obj, method_name), category, method_name))
+
+    def get_summary(self):
+        """
+        :return: list of str, the lines of the summary of the calls since the last game ended
+        """
+        lines = ["Game {0:d} profile:".format(self.game_num),
+                 "  {0:10s} {1:24s} {2:>8s} {3:>10s} {4:>10s}".format("Category", "Name", "Calls", "Total ms",
+                                                                     "Mean ms")]
+        for (category, name), (calls, seconds) in sorted(self.totals.items(), key=lambda item: -item[1][1]):
+            lines.append("  {0:10s} {1:24s} {2:8d} {3:10.2f} {4:10.3f}".format(category, name, calls,
+                                                                              seconds * 1000, seconds * 1000 / calls))
+        return lines
+
+    def write_trace(self):
+        """
+        Append the events since the last game ended to the trace file
+        :return: None
+        """
+        if not self.trace_path or not self.events:
+            return
+        with open(self.trace_path, 'a') as trace_file:
+            for category, name, start, duration in self.events:
+                event = {'name': name, 'cat': category, 'game': self.game_num, 'start': round(start, 7)}
+                if duration is not None:
+                    event['dur'] = round(duration, 7)
+                trace_file.write(json.dumps(event) + '\n')
+
+    def write_chrome_trace(self):
+        """
+        Append the events since the last game ended to the Chrome trace file, which is started if empty
+        :return: None
+        """
+        if not self.chrome_trace_path or not self.events:
+            return
+        new_file = not os.path.exists(self.chrome_trace_path) or not os.path.getsize(self.chrome_trace_path)
+        lines = []
+        if new_file:
+            lines.append('[')
+            for tid, thread_name in [CHROME_MAIN_THREAD] + list(CHROME_THREADS.values()):
+                lines.append(json.dumps({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                                         'args': {'name': thread_name}}) + ',')
+        args = {'game': self.game_num}
+        for category, name, start, duration in self.events:
+            tid = CHROME_THREADS.get(category, CHROME_MAIN_THREAD)[0]
+            event = {'name': name, 'cat': category, 'pid': 1, 'tid': tid, 'ts': round(start * 1e6, 1), 'args': args}
+            if duration is None:
+                event['ph'] = 'i'
+                event['s'] = 't'
+            else:
+                event['ph'] = 'X'
+                event['dur'] = round(duration * 1e6, 1)
+            lines.append(json.dumps(event) + ',')
+        with open(self.chrome_trace_path, 'a') as trace_file:
+            trace_file.write('\n'.join(lines) + '\n')
+
+    def end_game(self):
+        """
+        Print the summary and write the trace of a game, then start over for the next game
+        :return: None
+        """
+        if self.print_summary:
+            print('\n'.join(self.get_summary()))
+        self.flush()
+        self.totals = {}
+        self.game_num += 1
+
+    def flush(self):
+        """
+        Write the events kept so far to the trace files, e.g. when the game is closed in the middle of a game
+        :return: None
+        """
+        self.write_trace()
+        self.write_chrome_trace()
+        self.events = []
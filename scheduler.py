@@ -0,0 +1,67 @@
+"""
+This module contains the Scheduler, which runs the steps of the game without blocking the event loop.
+A step is a generator. Whenever it yields, the step is paused until the holds requested so far are over,
+such as a message staying on screen or the pause between two turns, and resumed on a later frame.
+Meanwhile, the event loop keeps processing the events.
+"""
+import time
+
+
+class Scheduler:
+    """
+    :param time_scale: float, the factor applied to all the holds, 0 for no holds at all
+    """
+
+    def __init__(self, time_scale=1.0):
+        self.time_scale = time_scale
+        self.resume_time = 0
+        self.step = None
+        # The profiler.Profiler tracing the holds, if any
+        self.profiler = None
+
+    def hold(self, delay):
+        """
+        Pause the current step at its next yield, for delay seconds more
+        :param delay: float, seconds, before scaling
+        :return: None
+        """
+        if delay > 0 and self.time_scale > 0:
+            start = max(self.resume_time, time.perf_counter())
+            self.resume_time = start + delay * self.time_scale
+            if self.profiler is not None:
+                self.profiler.record('hold', 'hold', start, delay * self.time_scale)
+
+    def get_wait_time(self):
+        """
+        :return: float, seconds until the holds are over
+        """
+        return max(0, self.resume_time - time.perf_counter())
+
+    def is_holding(self):
+        return self.resume_time > time.perf_counter()
+
+    def is_running(self):
+        """
+        :return: bool, whether a step is paused, to be resumed
+        """
+        return self.step is not None
+
+    def run(self, step_function, *args):
+        """
+        Resume the paused step, or start a new one if there is none, unless there is a hold.
+        The step runs until it yields or finishes.
+        :param step_function: generator function, called with args to start a new step
+        :return: None
+        """
+        if self.is_holding():
+            return
+        if self.step is None:
+            self.step = step_function(*args)
+        try:
+            next(self.step)
+        except StopIteration:
+            self.step = None
+
+    def cancel(self):
+        self.step = None
+        self.resume_time = 0
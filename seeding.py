@@ -0,0 +1,154 @@
+"""
+This module seeds the games with 64-bit game seeds. Each game seed gives independent streams of random
+numbers for the deal, the starting bidder and the AI of each player, so a game only depends on its seed,
+and not on the games played before it or on how the AI uses its random numbers.
+
+The streams are counter-based: the n-th number of a stream is a hash of the stream key and n (SplitMix64).
+The game seeds of a batch are made the same way from the batch seed and the game number, so game k of a
+batch can be played on any worker.
+
+The legacy .rng seed files (pickled random.getstate(), see main.py) are not game seeds. They are converted
+to the deal and the starting bidder they gave, which the Table can play as a fixed deal.
+Run this module with .rng files to print their deals:
+    python seeding.py seeds/low_point_hand.rng
+"""
+import pickle
+import random
+import sys
+
+MASK_64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9e3779b97f4a7c15
+
+# The purposes of the streams of a game
+DEAL = 1
+BIDDING = 2
+AI_PLAYER = 16  # Plus the player number
+
+
+def mix64(value):
+    """
+    The SplitMix64 finaliser, which scrambles a 64-bit value
+    :param value: int
+    :return: int, 64 bits
+    """
+    value = (value ^ (value >> 30)) * 0xbf58476d1ce4e5b9 & MASK_64
+    value = (value ^ (value >> 27)) * 0x94d049bb133111eb & MASK_64
+    return value ^ (value >> 31)
+
+
+def get_game_seed(batch_seed, game_num):
+    """
+    :param batch_seed: int
+    :param game_num: int, the number of the game in the batch
+    :return: int, the 64-bit seed of the game
+    """
+    return mix64((batch_seed + (game_num + 1) * GOLDEN_GAMMA) & MASK_64)
+
+
+def get_stream_key(game_seed, purpose):
+    """
+    :param game_seed: int
+    :param purpose: int, one of the stream purposes above
+    :return: int, the 64-bit key of the stream
+    """
+    return mix64(mix64(game_seed & MASK_64) ^ (purpose * GOLDEN_GAMMA & MASK_64))
+
+
+class SeedStream(random.Random):
+    """
+    A counter-based random number generator, with the methods of random.Random
+    :param game_seed: int
+    :param purpose: int, one of the stream purposes above
+    """
+
+    def __init__(self, game_seed=0, purpose=0):
+        self.key = 0
+        self.counter = 0
+        super().__init__(get_stream_key(game_seed, purpose))
+
+    def seed(self, a=None, version=2):
+        """
+        Start the stream over with a new key
+        :param a: int, the stream key, random if None
+        :return: None
+        """
+        if a is None:
+            a = random.getrandbits(64)
+        self.key = a & MASK_64
+        self.counter = 0
+        self.gauss_next = None
+
+    def getstate(self):
+        return self.key, self.counter, self.gauss_next
+
+    def setstate(self, state):
+        self.key, self.counter, self.gauss_next = state
+
+    def next64(self):
+        """
+        :return: int, the next 64 bits of the stream
+        """
+        self.counter += 1
+        return mix64((self.key + self.counter * GOLDEN_GAMMA) & MASK_64)
+
+    def random(self):
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k):
+        if k < 0:
+            raise ValueError('number of bits must be non-negative')
+        bits = 0
+        for _ in range((k + 63) // 64):
+            bits = (bits << 64) | self.next64()
+        return bits >> (-k % 64)
+
+
+def get_ai_stream(game_seed, player_num):
+    """
+    :param game_seed: int
+    :param player_num: int
+    :return: SeedStream, the stream of the AI of the player
+    """
+    return SeedStream(game_seed, AI_PLAYER + player_num)
+
+
+def deal_from_rng_state(rng_state):
+    """
+    Find the deal and the starting bidder the game gave from a random.getstate(), before the game seeds:
+    the first deal is shuffled and the starting bidder picked from the random module in that state.
+    The starting bidder is only the one of the game if the first deal is not reshuffled.
+    :param rng_state: tuple
+    :return: (list of int, int), the bitboard of the hand of each player, and the starting bidder
+    """
+    import engine  # Not at the top, as the engine imports this module
+    rng = random.Random()
+    rng.setstate(rng_state)
+    game_engine = engine.GameEngine()
+    game_engine.deal_rng = rng
+    game_engine.bid_rng = rng
+    game_engine.shuffle_and_deal()
+    game_engine.prepare_bidding()
+    return game_engine.dealt_hands, game_engine.first_bidder
+
+
+def convert_rng_file(path):
+    """
+    :param path: str, a pickled random.getstate()
+    :return: (list of int, int), see deal_from_rng_state
+    """
+    with open(path, 'rb') as f:
+        return deal_from_rng_state(pickle.load(f))
+
+
+if __name__ == '__main__':
+    import bitboard
+    import card_values
+    if len(sys.argv) < 2:
+        print('Usage: python seeding.py rng_file [rng_file ...]')
+        sys.exit(1)
+    for rng_path in sys.argv[1:]:
+        deal_hands, deal_bidder = convert_rng_file(rng_path)
+        print('{0:s}: starting bidder {1:d}'.format(rng_path, deal_bidder))
+        for player_num, hand in enumerate(deal_hands):
+            print('  Player {0:d}: {1:s}'.format(player_num, ' '.join(card_values.get_card_string(card)
+                                                                       for card in bitboard.to_values(hand))))
@@ -0,0 +1,120 @@
+import sys
+import time
+import random
+import multiprocessing
+import engine
+import seeding
+import card_values
+from ai_comp import ai
+
+"""
+This script plays complete all-bot games without any display, spread over a pool of worker processes,
+and prints the aggregated results.
+Each game is played from its own seed, made from the given seed and the game number (see seeding.py),
+so the results do not depend on the number of workers, and any game can be played again on its own.
+"""
+
+BATCH_SIZE = 50
+
+
+def new_results():
+    return {'games': 0, 'deals': 0, 'reshuffles': 0, 'contracts': {}, 'made': 0, 'failed': 0,
+            'declarer tricks': 0, 'attacker tricks': 0}
+
+
+def merge_results(results, other):
+    for key in ('games', 'deals', 'reshuffles', 'made', 'failed', 'declarer tricks', 'attacker tricks'):
+        results[key] += other[key]
+    for bid, count in other['contracts'].items():
+        results['contracts'][bid] = results['contracts'].get(bid, 0) + count
+
+
+def play_batch(batch):
+    """
+    Play a batch of games in a worker
+    :param batch: (int, int, int), the seed, the number of the first game and the number of games
+    :return: dict, the results of the batch
+    """
+    seed, first_game, n_games = batch
+    game_engine = engine.GameEngine()
+    for i in range(4):
+        game_engine.add_ai(i, ai.VivianAI(game_engine.table_status))
+
+    results = new_results()
+    for game_num in range(first_game, first_game + n_games):
+        result = game_engine.play_game(seeding.get_game_seed(seed, game_num))
+        results['games'] += 1
+        results['deals'] += result['reshuffles'] + 1
+        results['reshuffles'] += result['reshuffles']
+        results['contracts'][result['bid']] = results['contracts'].get(result['bid'], 0) + 1
+        if result['contract made']:
+            results['made'] += 1
+        else:
+            results['failed'] += 1
+        results['declarer tricks'] += result['declarer wins']
+        results['attacker tricks'] += result['attacker wins']
+    return results
+
+
+def simulate(n_games, workers=None, seed=None):
+    """
+    Play n_games across a pool of workers
+    :param n_games: int
+    :param workers: int, number of processes. Defaults to the number of CPUs
+    :param seed: int, the seed of the game seeds. Random if not given
+    :return: dict, the aggregated results
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    batches = [(seed, first_game, min(BATCH_SIZE, n_games - first_game))
+               for first_game in range(0, n_games, BATCH_SIZE)]
+
+    results = new_results()
+    with multiprocessing.Pool(workers) as pool:
+        for batch_results in pool.imap_unordered(play_batch, batches):
+            merge_results(results, batch_results)
+    return results
+
+
+def print_results(results, elapsed_time):
+    games = results['games']
+    if not games:
+        print("No games played")
+        return
+    print("Games: {0:d}, Deals: {1:d}, Time: {2:.2f}s, {3:.1f} games/s".format(
+        games, results['deals'], elapsed_time, games / elapsed_time))
+    print("Reshuffle rate: {0:.2%}".format(results['reshuffles'] / results['deals']))
+    print("Contracts made: {0:d} ({1:.2%}), failed: {2:d}".format(results['made'], results['made'] / games,
+                                                                 results['failed']))
+    print("Average tricks - Declarer: {0:.2f}, Attacker: {1:.2f}".format(results['declarer tricks'] / games,
+                                                                         results['attacker tricks'] / games))
+    print("Contracts:")
+    for bid in sorted(results['contracts']):
+        count = results['contracts'][bid]
+        print("  {0:d} {1:s}: {2:d} ({3:.2%})".format(bid // 10, card_values.get_suit_string(bid % 10),
+                                                     count, count / games))
+
+
+if __name__ == '__main__':
+    N_GAMES = 1000
+    WORKERS = None
+    SEED = None
+
+    if len(sys.argv) > 1:
+        prev_command = ""
+        for command in sys.argv[1:]:
+            if prev_command == "--games" or prev_command == "-n":
+                N_GAMES = int(command)
+            if prev_command == "--workers" or prev_command == "-w":
+                WORKERS = int(command)
+            if prev_command == "--seed" or prev_command == "-s":
+                SEED = int(command)
+            prev_command = command
+
+    if N_GAMES < 1:
+        print("The number of games must be at least 1")
+        sys.exit(1)
+
+    start_time = time.perf_counter()
+    all_results = simulate(N_GAMES, workers=WORKERS, seed=SEED)
+    print_results(all_results, time.perf_counter() - start_time)
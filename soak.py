@@ -0,0 +1,149 @@
+"""
+This module contains the SoakMonitor, which tracks the drift of a long unattended autoplay session.
+Every few games, it samples the memory of the process (RSS, traced by tracemalloc, and the number of objects),
+the top allocators since the first sample, and the percentiles of the AI decision, the AI memory update and
+the frame times.
+A memory measure growing over every one of the last samples, by more than a small share, is flagged,
+as it hints at a leak. The percentiles of the times are flagged the same way, as they hint at a slowdown.
+
+The SoakMonitor is a profiler.Profiler, so it times the same sections of the game.
+tracemalloc slows the game down, so the soak mode is not meant to measure the speed of the game.
+"""
+import gc
+import os
+import tracemalloc
+import profiler
+
+# The number of consecutive samples a measure has to grow over to be flagged
+GROWTH_SAMPLES = 5
+# The least relative growth over these samples to be flagged, below which it is noise
+MIN_GROWTH = 0.01
+# The times are noisier than the memory, so they have to grow by more
+TIME_MIN_GROWTH = 0.05
+TOP_ALLOCATORS = 5
+PERCENTILES = (50, 90, 99)
+# The timed AI calls that are decisions, the AI also times its memory updates after every play
+AI_DECISIONS = ('make_a_bid', 'call_partner', 'make_a_play')
+AI_MEMORY_UPDATE = 'update_memory'
+
+
+def get_rss():
+    """
+    :return: int, the resident set size of the process in bytes, or its peak if the current one is unknown
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        import resource
+        # Peak, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_percentiles(values, percentiles=PERCENTILES):
+    """
+    :param values: list of float
+    :param percentiles: iterable of int
+    :return: list of float, by the nearest rank
+    """
+    if not values:
+        return [0.0 for _ in percentiles]
+    values = sorted(values)
+    return [values[min(len(values) - 1, max(0, (len(values) * p + 99) // 100 - 1))] for p in percentiles]
+
+
+def is_growing(values, n_samples=GROWTH_SAMPLES, min_growth=MIN_GROWTH):
+    """
+    :param values: list of float
+    :return: bool, whether the last n_samples values grew every time, and by more than min_growth overall
+    """
+    if len(values) < n_samples:
+        return False
+    last_values = values[-n_samples:]
+    return all(last_values[i] < last_values[i+1] for i in range(n_samples - 1)) and \
+        last_values[-1] > last_values[0] * (1 + min_growth)
+
+
+class SoakMonitor(profiler.Profiler):
+    """
+    :param sample_games: int, the number of games between the samples
+    """
+
+    def __init__(self, sample_games, trace_path=None, chrome_trace_path=None, print_summary=False):
+        super().__init__(trace_path, chrome_trace_path, print_summary=print_summary)
+        self.sample_games = max(1, sample_games)
+        self.games = 0
+        self.decision_times = []
+        self.memory_update_times = []
+        self.frame_times = []
+        # The measures of each sample, by name
+        self.history = {'rss': [], 'traced': [], 'objects': []}
+        # The percentiles of the times of each sample in seconds, by name and percentile
+        self.time_history = {}
+        self.first_snapshot = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def record(self, category, name, start, duration):
+        super().record(category, name, start, duration)
+        if category == 'ai':
+            if name in AI_DECISIONS:
+                self.decision_times.append(duration)
+            elif name == AI_MEMORY_UPDATE:
+                self.memory_update_times.append(duration)
+        elif category == 'redraw':
+            self.frame_times.append(duration)
+
+    def end_game(self):
+        super().end_game()
+        self.games += 1
+        if self.games % self.sample_games == 0:
+            print('\n'.join(self.take_sample()))
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')))
+
+    def take_sample(self):
+        """
+        Sample the memory and the times, and clear the times for the next sample
+        :return: list of str, the lines of the report of the sample
+        """
+        gc.collect()
+        measures = {'rss': get_rss(), 'traced': tracemalloc.get_traced_memory()[0], 'objects': len(gc.get_objects())}
+        for name, value in measures.items():
+            self.history[name].append(value)
+
+        lines = ["Soak sample after {0:d} games: RSS {1:.1f} MiB, traced {2:.1f} MiB, {3:d} objects".format(
+            self.games, measures['rss'] / 2**20, measures['traced'] / 2**20, measures['objects'])]
+        for name, times in (('AI decision', self.decision_times), ('AI memory update', self.memory_update_times),
+                            ('Frame', self.frame_times)):
+            percentiles = get_percentiles(times)
+            lines.append("  {0:s} times (ms): {1:s}, {2:d} calls".format(
+                name, ', '.join("p{0:d} {1:.3f}".format(p, value * 1000)
+                                for p, value in zip(PERCENTILES, percentiles)), len(times)))
+            for p, value in zip(PERCENTILES, percentiles):
+                self.time_history.setdefault("{0:s} p{1:d}".format(name, p), []).append(value)
+        self.decision_times = []
+        self.memory_update_times = []
+        self.frame_times = []
+
+        snapshot = self.take_snapshot()
+        if self.first_snapshot is None:
+            self.first_snapshot = snapshot
+        else:
+            lines.append("  Top allocators since the first sample:")
+            for stat in snapshot.compare_to(self.first_snapshot, 'lineno')[:TOP_ALLOCATORS]:
+                lines.append("    {0:s}".format(str(stat)))
+
+        for name, values in self.history.items():
+            if is_growing(values):
+                lines.append("  WARNING: {0:s} grew over the last {1:d} samples, from {2:d} to {3:d}".format(
+                    name, GROWTH_SAMPLES, values[-GROWTH_SAMPLES], values[-1]))
+        for name, values in self.time_history.items():
+            if is_growing(values, min_growth=TIME_MIN_GROWTH):
+                lines.append("  WARNING: {0:s} time grew over the last {1:d} samples, from {2:.3f} to {3:.3f} ms"
+                             .format(name, GROWTH_SAMPLES, values[-GROWTH_SAMPLES] * 1000, values[-1] * 1000))
+        return lines
@@ -1,16 +1,24 @@
 import pygame
 import UI
 import cards
+import bitboard
+import engine
+import game_record
 import players
-import random
-import copy
-import time
+import profiler
+import scheduler
+import seeding
+import soak
 from signalslot import Signal
 from ai_comp import ai
-from game_consts import GameState, PlayerRole, STARTING_HAND, NUM_OF_PLAYERS, CALL_EVENT
+from game_consts import GameState, PlayerRole, NUM_OF_PLAYERS
+from view import CALL_EVENT
 
 VIEW_TRANSPARENT = False  # Make the text box not transparent, DEBUG only
 
+# The AI calls timed by the profiler, the decisions and the memory update after every play
+PROFILED_AI_METHODS = soak.AI_DECISIONS + (soak.AI_MEMORY_UPDATE,)
+
 
 class Table:
     """
@@ -49,31 +57,35 @@ class Table:
 
     """
 
-    def __init__(self, x, y, width, height, clear_colour, autoplay=False, view_all_cards=False, terminal=False):
-        # TODO: Reduce the amount of update_table call
+    def __init__(self, x, y, width, height, clear_colour, autoplay=False, view_all_cards=False, terminal=False,
+                 delay_scale=1.0, record_path=None, game_seed=None, profile=False, trace_path=None,
+                 chrome_trace_path=None, soak_games=0, fixed_deal=None):
+        # The changes only request a redraw, and the screen is redrawn once per frame by flush_redraw
         self.update_table = Signal()
+        self.redraw_requested = False
         self.x = x
         self.y = y
         self.width = width
         self.height = height
 
+        # Runs the game steps, holding the display without blocking
+        self.scheduler = scheduler.Scheduler(delay_scale)
+        self.held_events = []
+
+        # The areas of the announcer and player stats changed since the screen was last drawn
+        self.dirty_rects = []
+
         self.table_font = pygame.font.SysFont("None", 25)
         self.player_font = pygame.font.SysFont("None", 25)
 
-        # For gameplay
-        self.game_state = GameState.DEALING
-        self.reshuffling_players = []
-        self.current_round = 0
-        self.passes = 0
-        self.current_player = 0
-        self.first_player = False  # This is for bidding purposes
+        # For gameplay, the rules and the game state are kept in the engine
+        self.engine = engine.GameEngine()
+        # The finished games are appended to the record file, if given
+        self.record_file = game_record.GameRecordFile(record_path) if record_path else None
         self.players = []
         self.players_playzone = []
         # Table status will be made known to the player by reference
-        self.table_status = {'played cards': [0, 0, 0, 0], 'leading player': 0, 'trump suit': 1,
-                             'trump broken': False, 'round history': [], 'bid': 0, 'partner': 0,
-                             'partner reveal': False, 'defender': {'target': 0, 'wins': 0},
-                             'attacker': {'target': 0, 'wins': 0}}
+        self.table_status = self.engine.table_status
 
         # Prepare the surfaces for displaying
         self.background = pygame.Surface((self.width, self.height))
@@ -84,8 +96,9 @@ class Table:
         # Prepare the card with dimensions
         w_deck = min(self.height, self.width) * 0.18
         l_deck = min(self.width, self.height) * 0.7
-        # This is not a deck as it will never be drawn
-        self.discard_deck = cards.prepare_playing_cards(int(w_deck*0.6), int(w_deck*0.6 *97/71))
+        # This is not a deck as it will never be drawn. The cards are looked up by value
+        self.playing_cards = {card.value: card for card in
+                              cards.prepare_playing_cards(int(w_deck*0.6), int(w_deck*0.6 * 97/71))}
         game_margins = 5
 
         # Players' deck positioning
@@ -151,13 +164,13 @@ class Table:
                 self.players.append(player_class(playerx[i], playery[i],
                                                    l_deck, w_deck,
                                                    spacing, vert_orientation=vert,
-                                                   deck_reveal=reveal_mode))
+                                                   deck_reveal=reveal_mode, player_num=i))
             else:
                 self.players.append(players.Player(playerx[i], playery[i],
                                                    l_deck, w_deck,
                                                    spacing, vert_orientation=vert,
                                                    deck_reveal=reveal_mode, flip=(i == 1 or i == 2),
-                                                   draw_from_last=(i == 2 or i == 3)))
+                                                   draw_from_last=(i == 2 or i == 3), player_num=i))
 
             self.players[i].connect_to_table(self.table_status)
             if i > 0:
@@ -167,8 +180,7 @@ class Table:
                                          w_deck, w_deck, 0))
             for j in range(3):
                 surf = pygame.Surface((stats_width, self.stats_height / 3), pygame.SRCALPHA)
-                rendered_text = self.player_font.render("Player {0:d}".format(i), True,
-                                                        (255, 0, 255)).convert_alpha()
+                rendered_text = UI.render_text(self.player_font, "Player {0:d}".format(i), (255, 0, 255))
                 self.center_text_on_surface(surf, rendered_text,
                                             (255, 255, 255, 255 * VIEW_TRANSPARENT))
                 self.player_stats[i].append(surf)
@@ -176,6 +188,20 @@ class Table:
         if autoplay:
             self.players[0].add_ai(ai.VivianAI(self.table_status))
 
+        # Opt-in timing of the game steps, the AI decisions and the redraws, see profiler.Profiler
+        # In the soak mode, the games are played one after the other, and sampled every soak_games games
+        self.soak = soak_games > 0
+        self.profiler = None
+        if self.soak:
+            self.profiler = soak.SoakMonitor(soak_games, trace_path, chrome_trace_path, print_summary=profile)
+        elif profile or trace_path or chrome_trace_path:
+            self.profiler = profiler.Profiler(trace_path, chrome_trace_path, print_summary=profile)
+        if self.profiler is not None:
+            self.scheduler.profiler = self.profiler
+            for player in self.players:
+                if player.AI:
+                    self.profiler.instrument(player.AI, PROFILED_AI_METHODS, 'ai')
+
         # Announcer positioning and surface creation
         announcer_margins = 5
         announcer_spacing = announcer_margins + w_deck
@@ -190,6 +216,16 @@ class Table:
 
         self.update_all_players(role=True, wins=True, clear_wins=True)
 
+        # The seed is a batch seed: game k is played from the game seed seeding.get_game_seed(game_seed, k),
+        # as in simulate.py
+        self.game_seed = game_seed
+        self.games_played = 0
+        if game_seed is not None:
+            self.set_game_seed(seeding.get_game_seed(game_seed, 0))
+        # The hands and the starting bidder of the first deal, e.g. from a legacy seed file
+        if fixed_deal is not None:
+            self.engine.set_fixed_deal(*fixed_deal)
+
         self.write_message("Press P to play!")
 
         self.ongoing = False
@@ -242,6 +278,28 @@ class Table:
     def get_pos(self):
         return self.x, self.y
 
+    def get_announcer_rect(self, line):
+        return self.announcer_line[line].get_rect(topleft=(self.announcer_x,
+                                                           self.announcer_y+self.announcer_height*line/3))
+
+    def get_stats_rect(self, player_num, line):
+        return self.player_stats[player_num][line].get_rect(topleft=(self.player_stats_x[player_num],
+                                                                     self.player_stats_y[player_num] +
+                                                                     self.stats_height*line/3))
+
+    def get_dirty_rects(self):
+        """
+        Collect the areas of the screen which changed since the last call
+        :return: list of pygame.Rect
+        """
+        dirty_rects = self.dirty_rects
+        self.dirty_rects = []
+        for component in self.players + self.players_playzone + self.UI_elements:
+            rect = component.get_dirty_rect()
+            if rect:
+                dirty_rects.append(rect)
+        return dirty_rects
+
     def process_UI(self, event):
         draw_update = False
         #if event.type == pygame.KEYUP:
@@ -254,122 +312,170 @@ class Table:
                 draw_update = True
 
         if draw_update:
+            self.request_redraw()
+
+    def request_redraw(self):
+        """
+        Mark the table to be redrawn at the end of the frame, so the changes made in a frame are drawn together
+        :return: None
+        """
+        self.redraw_requested = True
+
+    def flush_redraw(self):
+        """
+        Redraw the table now if any change requested it. Called once per frame, and before blocking
+        on a terminal input so that the table is up to date.
+        :return: None
+        """
+        if self.redraw_requested:
+            self.redraw_requested = False
             self.update_table.emit()
 
     def continue_game(self, game_events):
+        """
+        Run the next step of the game, called on every frame. Nothing happens until the current hold is over,
+        so that the event loop is never blocked.
+        :return: None
+        """
+        # Events are kept while a step is held or paused, as only a new step reads them
+        self.held_events.extend(game_events)
+        if self.scheduler.is_holding():
+            return
+        if not self.scheduler.is_running():
+            game_events, self.held_events = self.held_events, []
+        if self.profiler is None:
+            self.scheduler.run(self.game_step, game_events)
+            return
+
+        game_state = self.engine.game_state
+        with self.profiler.measure('state', game_state.name):
+            self.scheduler.run(self.game_step, game_events)
+        if self.engine.game_state != game_state:
+            self.profiler.mark('fsm', '{0:s} -> {1:s}'.format(game_state.name, self.engine.game_state.name))
+        if not self.ongoing:
+            self.profiler.end_game()
+
+    def game_step(self, game_events):
         """
         This is where the FSM is. State transition should occur here.
         What takes place in the state should be in a function.
+        The rules are carried out by the engine, the Table handles the display and the player inputs.
+        The step yields whenever the display should be held before continuing, see scheduler.Scheduler.
         :return: None
         """
-        # TODO: Adjust the timing of sleep
-        if self.game_state == GameState.DEALING:
+        if self.engine.game_state == GameState.DEALING:
             self.shuffle_and_deal()
             self.write_message("Shuffle Complete!")
-            self.reshuffling_players = []
-            for i, player in enumerate(self.players):
-                if player.get_card_points() < 4:
-                    self.write_message("Low points detected in Player {0:d}! ".format(i))
-                    self.reshuffling_players.append(i)
+            yield
+            reshuffling_players = self.engine.check_points()
+            for i in reshuffling_players:
+                self.write_message("Low points detected in Player {0:d}! ".format(i))
+                yield
 
-            if not self.reshuffling_players:
+            if not reshuffling_players:
                 self.write_message('No Reshuffle needed!')
-                self.game_state = GameState.BIDDING
+                yield
                 self.write_message("Start to Bid")
+                yield
                 self.prepare_bidding()
-            else:
-                self.current_player = self.reshuffling_players[0]
-                self.game_state = GameState.POINT_CHECK
 
-        elif self.game_state == GameState.POINT_CHECK:
+        elif self.engine.game_state == GameState.POINT_CHECK:
             reshuffle = self.check_reshuffle(game_events)
             if reshuffle is None:
                 return
-            if reshuffle is False and not self.current_player == self.reshuffling_players[-1]:
+            if not self.engine.record_reshuffle(reshuffle):
                 return
             else:
                 if reshuffle:
                     self.write_message('Reshuffle Initiated!', line=1)
-                    self.game_state = GameState.ENDING
                 else:
                     self.write_message('No Reshuffle needed!')
-                    self.game_state = GameState.BIDDING
+                    yield
                     self.write_message("Start to Bid")
+                    yield
                     self.prepare_bidding()
-        elif self.game_state == GameState.BIDDING:
-            bid_complete = self.start_bidding(game_events)
+        elif self.engine.game_state == GameState.BIDDING:
+            bid_complete = yield from self.start_bidding(game_events)
             if bid_complete:
-                self.game_state = GameState.PLAYING
                 self.update_all_players(role=True, wins=True)
                 self.update_team_scores()
 
-        elif self.game_state == GameState.PLAYING:
-            self.play_a_round(game_events)
-            if self.current_round == 13:
+        elif self.engine.game_state == GameState.PLAYING:
+            yield from self.play_a_round(game_events)
+            if self.engine.game_state == GameState.ENDING:
+                yield
                 self.declare_winner()
+                if self.record_file is not None:
+                    self.record_file.append(game_record.GameRecord.from_engine(self.engine))
+                self.games_played += 1
+                if self.game_seed is not None:
+                    self.set_game_seed(seeding.get_game_seed(self.game_seed, self.games_played))
                 self.ongoing = False
-                self.game_state = GameState.ENDING
         else:
             self.reset_game()
-            self.game_state = GameState.DEALING
+
+    def set_game_seed(self, game_seed):
+        """
+        Seed the random streams of the next game, see engine.GameEngine.set_game_seed
+        :param game_seed: int
+        :return: None
+        """
+        self.engine.set_game_seed(game_seed)
+        for i, player in enumerate(self.players):
+            if player.AI:
+                player.AI.rng = seeding.get_ai_stream(game_seed, i)
 
     def shuffle_and_deal(self):
         """
         Shuffle and deal the discard deck to the players, which should have 52 cards.
         :return: None
         """
-        if self.discard_deck:
-            for i in range(10):
-                random.shuffle(self.discard_deck)
-            for player in self.players:
-                for i in range(STARTING_HAND):
-                    player.add_card(self.discard_deck.pop())
-            self.update_table.emit()
+        self.engine.shuffle_and_deal()
+        for player, hand in zip(self.players, self.engine.hands):
+            player.add_cards(self.playing_cards[value] for value in bitboard.to_values(hand))
+        self.request_redraw()
 
     def check_reshuffle(self, game_events):
         """
         Detect any possible reshuffle request within the players
         :return: True if reshuffle requested, else False
         """
+        current_player = self.engine.current_player
         if not self.require_player_input:
-            if not self.players[self.current_player].AI:
+            if not self.players[current_player].AI:
                 self.require_player_input = True
                 self.write_message("Do you want a reshuffle?", line=1, update_now=False)
                 self.yes_button.visible = True
                 self.no_button.visible = True
-                self.update_table.emit()
+                self.request_redraw()
                 return
             else:
-                reshuffle = self.players[self.current_player].make_decision(self.game_state, 0)
+                reshuffle = self.players[current_player].make_decision(self.engine.game_state, 0)
         else:
-            reshuffle = self.players[self.current_player].make_decision(self.game_state, 0, game_events)
+            if self.terminal_play:
+                self.flush_redraw()
+            reshuffle = self.players[current_player].make_decision(self.engine.game_state, 0, game_events)
 
             if reshuffle is None:
                 return None
             self.require_player_input = False
             self.yes_button.visible = False
             self.no_button.visible = False
-            self.update_table.emit()
+            self.request_redraw()
 
-        self.current_player = (self.current_player + 1)%NUM_OF_PLAYERS
-        while self.current_player not in self.reshuffling_players:
-            self.current_player = (self.current_player + 1) % NUM_OF_PLAYERS
         return reshuffle
 
     def prepare_bidding(self):
         # Randomly pick a starting player, whom also is the current bid winner
-        self.current_player = random.randint(1, NUM_OF_PLAYERS) - 1
-        print("Starting Player: {0:d}".format(self.current_player))
-        self.passes = 0
-        self.table_status["bid"] = 11  # Lowest Bid: 1 Club by default
-        self.first_player = True  # Starting bidder "privilege" to raise the starting bid
+        self.engine.prepare_bidding()
+        current_player = self.engine.current_player
+        print("Starting Player: {0:d}".format(current_player))
         msg = "Current Bid: {0:d} {1:s}".format(self.table_status["bid"] // 10,
                                                 cards.get_suit_string(self.table_status["bid"] % 10))
         self.write_message(msg, line=1, delay_time=0)
-        self.display_current_player(self.current_player)
-        self.update_player_bid(self.current_player, 11, update_now=False)
-        msg = 'Bid Leader: Player {0:d}'.format((self.current_player - self.passes -
-                                                 1 * (not self.first_player)) % NUM_OF_PLAYERS)
+        self.display_current_player(current_player)
+        self.update_player_bid(current_player, 11, update_now=False)
+        msg = 'Bid Leader: Player {0:d}'.format(self.engine.get_bid_leader())
         self.write_message(msg, line=2, delay_time=0.5)
 
         if not self.terminal_play:
@@ -380,56 +486,54 @@ class Table:
     def start_bidding(self, game_events):
         """
         The bidding procedure. Flag up if player input required
+        This is a generator, which yields whenever the display should be held.
         :return: Whether bidding is completed
         """
-        # Highest bid: 7 NoTrump. No further check required
-        if self.passes < NUM_OF_PLAYERS - 1 and self.table_status["bid"] < 75:
+        current_player = self.engine.current_player
+        if not self.engine.bidding_complete():
             if not self.require_player_input:
-                if not self.players[self.current_player].AI:
+                if not self.players[current_player].AI:
                     self.require_player_input = True
                     if not self.terminal_play:
                         self.calling_panel.visible = True
-                        self.update_table.emit()
+                        self.request_redraw()
                     return False
                 else:
-                    player_bid = self.players[self.current_player].make_decision(self.game_state, 0)
+                    player_bid = self.players[current_player].make_decision(self.engine.game_state, 0)
             else:
-                player_bid, msg = self.players[self.current_player].make_decision(self.game_state, 0, game_events)
+                if self.terminal_play:
+                    self.flush_redraw()
+                player_bid, msg = self.players[current_player].make_decision(self.engine.game_state, 0,
+                                                                             game_events)
                 if msg:
                     self.write_message(msg, delay_time=1, update_now=True)
                 if player_bid < 0:
                     return False
+                yield
                 self.require_player_input = False
                 self.write_message("", delay_time=0, update_now=False)
                 if not self.terminal_play:
                     self.calling_panel.visible = False
-                    self.update_table.emit()
-            if not player_bid:
-                if not self.first_player:  # Starting bidder pass do not count at the start
-                    self.passes += 1
-            else:
-                self.table_status["bid"] = player_bid
-                self.passes = 0
+                    self.request_redraw()
+
+            first_player = self.engine.first_player
+            self.engine.process_bid(player_bid)
+            if player_bid:
                 msg = "Current Bid: {0:d} {1:s}".format(self.table_status["bid"] // 10,
                                                         cards.get_suit_string(self.table_status["bid"] % 10))
                 self.write_message(msg, line=1, update_now=False)
-                msg = 'Bid Leader: Player {0:d}'.format(self.current_player)
+                msg = 'Bid Leader: Player {0:d}'.format(current_player)
                 self.write_message(msg, line=2, update_now=True)
+                yield
 
-            if self.first_player:
-                self.first_player = False
-                if player_bid:
-                    self.update_player_bid(self.current_player, player_bid, update_now=False)
-            else:
-                self.update_player_bid(self.current_player, player_bid, update_now=False)
+            if not first_player or player_bid:
+                self.update_player_bid(current_player, player_bid, update_now=False)
 
-            if self.table_status["bid"] < 75:
-                self.current_player += 1
-                self.current_player %= NUM_OF_PLAYERS
-            self.display_current_player(self.current_player)
+            self.display_current_player(self.engine.current_player)
 
-            time.sleep(0.5)
-            if self.passes == NUM_OF_PLAYERS - 1 or self.table_status["bid"] == 75:
+            self.scheduler.hold(0.5)
+            yield
+            if self.engine.bidding_complete():
                 if not self.terminal_play:
                     self.calling_panel.cancel_button.visible = False
                     self.calling_panel.change_lists_elements(['2','3','4','5','6','7','8','9','10','J','Q','K','A'],
@@ -437,47 +541,38 @@ class Table:
             return False
         else:
             if not self.require_player_input:
-                self.write_message("Player {0:d} is the bid winner!".format(self.current_player), delay_time=1)
-                msg = "Player {0:d} is calling a partner...".format(self.current_player)
+                self.write_message("Player {0:d} is the bid winner!".format(current_player), delay_time=1)
+                yield
+                msg = "Player {0:d} is calling a partner...".format(current_player)
                 self.write_message(msg, delay_time=1)
-                self.display_current_player(self.current_player)
-                if not self.players[self.current_player].AI:
+                yield
+                self.display_current_player(current_player)
+                if not self.players[current_player].AI:
                     self.require_player_input = True
                     if not self.terminal_play:
                         self.calling_panel.visible = True
-                        self.update_table.emit()
+                        self.request_redraw()
                     return False
                 else:
                     # Ask for the partner card
-                    self.table_status["partner"] = self.players[self.current_player].make_decision(self.game_state, 1)
+                    partner = self.players[current_player].make_decision(self.engine.game_state, 1)
             else:
-                partner, msg = self.players[self.current_player].make_decision(self.game_state, 1, game_events)
+                if self.terminal_play:
+                    self.flush_redraw()
+                partner, msg = self.players[current_player].make_decision(self.engine.game_state, 1, game_events)
                 if msg:
                     self.write_message(msg, delay_time=0, update_now=True)
 
                 if not partner:
                     return False
 
-                self.table_status["partner"] = partner
                 self.require_player_input = False
                 if not self.terminal_play:
                     self.calling_panel.visible = False
-                    self.update_table.emit()
-
-            # Setup the table status before the play starts
-            self.table_status['partner reveal'] = False
-            self.table_status["trump suit"] = self.table_status["bid"] % 10
-            self.table_status["trump broken"] = False
-            self.table_status['played cards'] = [0, 0, 0, 0]
-            if self.table_status['trump suit'] == 5:
-                self.table_status["leading player"] = self.current_player
-            else:
-                self.table_status["leading player"] = (self.current_player + 1) % NUM_OF_PLAYERS
-            self.table_status['defender']['target'] = self.table_status["bid"] // 10 + 6
-            self.table_status['attacker']['target'] = 14 - self.table_status['defender']['target']
+                    self.request_redraw()
 
-            # Set the roles of the players
-            self.players[self.current_player].role = PlayerRole.DECLARER
+            # Setup the table status and the player roles before the play starts
+            self.engine.set_partner(partner)
 
             self.write_message('Bidding Complete', delay_time=0)
             msg = 'Trump: {1:s}, Partner: {0:s}'.format(cards.get_card_string(self.table_status["partner"]),
@@ -492,121 +587,82 @@ class Table:
         The function will exit after every player decision or if a user input is needed.
         If a user input is required, the function will continuously exit without proceeding to the next player
         until a valid input is received.
+        This is a generator, which yields whenever the display should be held.
 
         :return: None
         """
-        if not any(self.table_status["played cards"]):
-            # Leading player starts with the leading card, which determines the leading suit
+        if not self.engine.trick_complete():
+            leading = self.engine.is_leading()
+            sub_state = 0 if leading else 1
             if not self.require_player_input:
-                if self.table_status['trump broken']:
-                    self.write_message("Trump has been broken!", delay_time=0)
-                else:
-                    self.write_message("Trump is not broken", delay_time=0)
-                self.current_player = self.table_status['leading player']
-                self.display_current_player(self.current_player)
-                if not self.players[self.current_player].AI:
+                if leading:
+                    # Leading player starts with the leading card, which determines the leading suit
+                    if self.table_status['trump broken']:
+                        self.write_message("Trump has been broken!", delay_time=0)
+                    else:
+                        self.write_message("Trump is not broken", delay_time=0)
+                    self.engine.start_trick()
+                self.display_current_player(self.engine.current_player)
+                if not self.players[self.engine.current_player].AI:
                     self.require_player_input = True
                     return
                 else:
-                    card = self.players[self.current_player].make_decision(self.game_state, 0)
+                    card = self.players[self.engine.current_player].make_decision(self.engine.game_state, sub_state)
             else:
-                card, msg = self.players[self.current_player].make_decision(self.game_state, 0, game_events)
+                # Subsequent player make their plays, following suit if possible
+                if self.terminal_play:
+                    self.flush_redraw()
+                card, msg = self.players[self.engine.current_player].make_decision(self.engine.game_state,
+                                                                                   sub_state, game_events)
                 if msg:
-                    self.write_message(msg, delay_time=0, update_now=True)
+                    self.write_message(msg, delay_time=0, update_now=leading)
                 if not type(card) is cards.Card:
                     if card:
-                        self.update_table.emit()
+                        self.request_redraw()
                     return
                 self.require_player_input = False
 
-            self.table_status["played cards"][self.current_player] = card
-            self.players_playzone[self.current_player].add_card(card)
-        elif not all(self.table_status["played cards"]):
-            # Subsequent player make their plays, following suit if possible
-            if not self.require_player_input:
-                self.display_current_player(self.current_player)
-                if not self.players[self.current_player].AI:
-                    self.require_player_input = True
-                    return
-                else:
-                    card = self.players[self.current_player].make_decision(self.game_state, 1)
-            else:
-                card, msg = self.players[self.current_player].make_decision(self.game_state, 1, game_events)
-                if msg:
-                    self.write_message(msg, delay_time=0, update_now=False)
-                if not type(card) is cards.Card:
-                    if card:
-                        self.update_table.emit()
-                    return
-                self.require_player_input = False
-
-            self.players_playzone[self.current_player].add_card(card)
-            self.table_status["played cards"][self.current_player] = card
+            current_player = self.engine.current_player
+            self.players_playzone[current_player].add_card(card)
+            trump_broken, partner_revealed = self.engine.play_card(card.value)
         else:
             # Once all player played, find out who wins
-            leading_card = self.table_status["played cards"][self.table_status['leading player']]
-            card_suits = [card.suit() for card in self.table_status["played cards"]]
-            card_nums = [card.number() for card in self.table_status["played cards"]]
-            follow_suits = [suit == leading_card.suit() for suit in card_suits]
-            trumps = [suit == self.table_status['trump suit'] for suit in card_suits]
-
-            # Determine which players to check for winner, and determine winner
-            if any(trumps):
-                valid_nums = [card_nums[i] * trumps[i] for i in range(NUM_OF_PLAYERS)]
-            else:
-                valid_nums = [card_nums[i] * follow_suits[i] for i in range(NUM_OF_PLAYERS)]
-
-            winning_player = valid_nums.index(max(valid_nums))
+            winning_player = self.engine.get_trick_winner()
             self.write_message("Player {0:d} wins!\n".format(winning_player), delay_time=1)
-            self.players[winning_player].score += 1
-            self.update_player_wins(winning_player)
+            yield
 
             # Clean up the cards, update score, set the next leading player, update round history
             for deck in self.players_playzone:
-                self.discard_deck.append(deck.remove_card())
+                deck.remove_card()
 
             for player in self.players:
                 if player.AI:
                     player.AI.update_memory()
 
-            if self.players[winning_player].role == PlayerRole.DECLARER or\
-               self.players[winning_player].role == PlayerRole.PARTNER:
-                self.table_status['defender']['wins'] += 1
-            elif self.players[winning_player].role == PlayerRole.ATTACKER:
-                self.table_status['attacker']['wins'] += 1
-
-            self.table_status['leading player'] = winning_player
-            self.table_status['round history'].append(copy.copy(self.table_status["played cards"]))
+            self.engine.complete_trick(winning_player)
+            self.update_player_wins(winning_player)
             self.update_team_scores()
-            self.table_status["played cards"] = [0]*NUM_OF_PLAYERS
-            self.current_round += 1
-            self.update_table.emit()
+            self.request_redraw()
 
             return
 
-        # Break trump if the trump suit is played
-        if not self.table_status['trump broken']:
-            self.table_status['trump broken'] = card.suit() == self.table_status['trump suit']
-            if self.table_status['trump broken']:
-                self.write_message("Trump broken!", delay_time=1)
+        if trump_broken:
+            self.write_message("Trump broken!", delay_time=1)
+            yield
 
-        if not self.table_status['partner reveal']:
-            if card.value == self.table_status['partner']:
-                self.table_status['partner reveal'] = True
-                self.write_message("Partner Revealed!", delay_time=1)
-                self.reveal_all_roles(self.current_player)
-                self.update_all_players(role=True, wins=False)
+        if partner_revealed:
+            self.write_message("Partner Revealed!", delay_time=1)
+            yield
+            self.update_all_players(role=True, wins=False)
 
-        self.current_player += 1
-        self.current_player %= NUM_OF_PLAYERS
-        self.update_table.emit()
-        time.sleep(0.5)
+        self.request_redraw()
+        self.scheduler.hold(0.5)
 
     def write_message(self, text, delay_time=0.5, line=0, update_now=True):
         """
         Write a message into the center board surface (announcer)
         :param text: String to be displayed on the center board
-        :param delay_time: How much delay to put once the string is display
+        :param delay_time: How long to hold the game once the string is displayed, without blocking
         :param line: Which line of the announcer to write to
         :param update_now:
         :return: None
@@ -614,12 +670,13 @@ class Table:
         if 0 <= line < len(self.announcer_line):
             print(text)
             text = text.strip('\n')
-            rendered_text = self.table_font.render(text, True, (255, 255, 255)).convert_alpha()
+            rendered_text = UI.render_text(self.table_font, text, (255, 255, 255))
             self.center_text_on_surface(self.announcer_line[line], rendered_text,
                                         (255, 255, 255, 255*VIEW_TRANSPARENT))
+            self.dirty_rects.append(self.get_announcer_rect(line))
             if update_now:
-                self.update_table.emit()
-                time.sleep(delay_time)
+                self.request_redraw()
+                self.scheduler.hold(delay_time)
 
     def update_players_role(self, player_num, update_now=True):
         """
@@ -631,18 +688,19 @@ class Table:
         self.player_stats[player_num][1].fill((255, 255, 255, 255*VIEW_TRANSPARENT))
         role_text = ''
         colour = (0, 239, 224)
-        if self.players[player_num].role == PlayerRole.DECLARER:
+        if self.engine.roles[player_num] == PlayerRole.DECLARER:
             role_text = 'Declarer'
-        elif self.players[player_num].role == PlayerRole.ATTACKER:
+        elif self.engine.roles[player_num] == PlayerRole.ATTACKER:
             role_text = 'Attacker'
             colour = (225, 0, 0)
-        elif self.players[player_num].role == PlayerRole.PARTNER:
+        elif self.engine.roles[player_num] == PlayerRole.PARTNER:
             role_text = 'Partner'
-        rendered_text = self.player_font.render(role_text, True, colour).convert_alpha()
+        rendered_text = UI.render_text(self.player_font, role_text, colour)
         self.center_text_on_surface(self.player_stats[player_num][1], rendered_text,
                                     (255, 255, 255, 255 * VIEW_TRANSPARENT))
+        self.dirty_rects.append(self.get_stats_rect(player_num, 1))
         if update_now:
-            self.update_table.emit()
+            self.request_redraw()
 
     def update_player_wins(self, player_num, update_now=True, clear=False):
         """
@@ -653,17 +711,18 @@ class Table:
         :return:
         """
         self.player_stats[player_num][2].fill((255, 255, 255, 255*VIEW_TRANSPARENT))
+        self.dirty_rects.append(self.get_stats_rect(player_num, 2))
         if not clear:
-            if self.players[player_num].score > 1:
-                rendered_text = self.player_font.render("Wins: {0:d}".format(self.players[player_num].score), True,
-                                                        (255, 255, 255)).convert_alpha()
+            if self.engine.scores[player_num] > 1:
+                rendered_text = UI.render_text(self.player_font, "Wins: {0:d}".format(self.engine.scores[player_num]),
+                                               (255, 255, 255))
             else:
-                rendered_text = self.player_font.render("Win: {0:d}".format(self.players[player_num].score), True,
-                                                        (255, 255, 255)).convert_alpha()
+                rendered_text = UI.render_text(self.player_font, "Win: {0:d}".format(self.engine.scores[player_num]),
+                                               (255, 255, 255))
             self.center_text_on_surface(self.player_stats[player_num][2], rendered_text,
                                         (255, 255, 255, 255 * VIEW_TRANSPARENT))
         if update_now:
-            self.update_table.emit()
+            self.request_redraw()
 
     def update_player_bid(self, player_num, bid, update_now=True):
         """
@@ -674,17 +733,16 @@ class Table:
         :return:
         """
         self.player_stats[player_num][2].fill((255, 255, 255, 255 * VIEW_TRANSPARENT))
+        self.dirty_rects.append(self.get_stats_rect(player_num, 2))
         if not bid:
-            rendered_text = self.player_font.render("Pass".format(self.players[player_num].score), True,
-                                                    (255, 255, 255)).convert_alpha()
+            rendered_text = UI.render_text(self.player_font, "Pass", (255, 255, 255))
         else:
             bid_text = str(bid//10) + ' ' + cards.get_suit_string(bid % 10)
-            rendered_text = self.player_font.render(bid_text.format(self.players[player_num].score), True,
-                                                    (255, 255, 255)).convert_alpha()
+            rendered_text = UI.render_text(self.player_font, bid_text, (255, 255, 255))
         self.center_text_on_surface(self.player_stats[player_num][2], rendered_text,
                                     (255, 255, 255, 255 * VIEW_TRANSPARENT))
         if update_now:
-            self.update_table.emit()
+            self.request_redraw()
 
     def update_all_players(self, role=False, wins=True, clear_wins=False):
         for i in range(NUM_OF_PLAYERS):
@@ -692,22 +750,22 @@ class Table:
                 self.update_player_wins(i, update_now=False, clear=clear_wins)
             if role:
                 self.update_players_role(i, update_now=False)
-        self.update_table.emit()
+        self.request_redraw()
 
     def display_current_player(self, current=-1):
         if current >= 0:
             print("Player {0:d}\n".format(current))
         for i in range(NUM_OF_PLAYERS):
-            rendered_text = self.player_font.render("Player {0:d}".format(i), True,
-                                                    (255, 0, 255)).convert_alpha()
+            rendered_text = UI.render_text(self.player_font, "Player {0:d}".format(i), (255, 0, 255))
             if i == current:
                 self.center_text_on_surface(self.player_stats[i][0], rendered_text,
                                             (0, 64, 0, 255))
             else:
                 self.center_text_on_surface(self.player_stats[i][0], rendered_text,
                                             (255, 255, 255, 255 * VIEW_TRANSPARENT))
+            self.dirty_rects.append(self.get_stats_rect(i, 0))
 
-        self.update_table.emit()
+        self.request_redraw()
 
     def update_team_scores(self):
         if self.table_status['partner reveal']:
@@ -722,26 +780,10 @@ class Table:
                                                                        self.table_status['attacker']['target'])
             self.write_message(msg, line=2)
 
-
-    def reveal_all_roles(self, partner):
-        """
-        Update all roles once the partner card is shown
-        Also updates the partner to the player number
-        :param partner:
-        :return:
-        """
-        self.players[partner].role = PlayerRole.PARTNER
-        self.table_status["partner"] = partner
-        self.table_status['defender']['wins'] += self.players[partner].score
-        for i in range(NUM_OF_PLAYERS):
-            if self.players[i].role == PlayerRole.UNKNOWN:
-                self.players[i].role = PlayerRole.ATTACKER
-                self.table_status['attacker']['wins'] += self.players[i].score
-
     def declare_winner(self):
-        if self.table_status['attacker']['wins'] >= self.table_status['attacker']['target']:
+        if self.engine.attacker_won():
             self.write_message("Attacker wins! Press P to play again!")
-        if self.table_status['defender']['wins'] >= self.table_status['defender']['target']:
+        if self.engine.declarer_won():
             self.write_message("Declarer wins! Press P to play again!")
 
     def reset_game(self):
@@ -750,22 +792,24 @@ class Table:
         :return:
         """
         for player in self.players:
-            while not player.is_empty():
-                self.discard_deck.append(player.remove_card())
-            player.score = 0
-            player.role = PlayerRole.UNKNOWN
+            player.remove_all_cards()
             if player.AI:
                 player.AI.reset_memory()
+        self.engine.reset_game()
 
         for i in range(NUM_OF_PLAYERS):
             self.update_players_role(i)
             self.update_player_wins(i, clear=True)
-        self.table_status['defender']['wins'] = 0
-        self.table_status['attacker']['wins'] = 0
-        self.table_status["played cards"] = [0]*NUM_OF_PLAYERS
-        self.table_status['round history'] = []
-        self.current_round = 0
         self.write_message("", line=1, update_now=False)
         self.write_message("", line=2)
         self.display_current_player()
-        self.update_table.emit()
+        self.request_redraw()
+
+    def close(self):
+        """
+        Close the AI of the players, e.g. to stop their worker processes when the game exits
+        :return: None
+        """
+        for player in self.players:
+            if player.AI:
+                player.AI.close()
@@ -0,0 +1,117 @@
+"""
+This module contains the TableSnapshot, a read-only copy of the table status for the AI and the search code.
+The table status dict is shared by reference and changes during the game, so an AI reading it at two points
+of a decision may not see the same state. A snapshot is taken once, holds the cards as card values and
+bitboards (see bitboard.py), and is read through attributes instead of string keys.
+
+A snapshot cannot be changed. replace() makes a new snapshot with some fields changed, sharing the others,
+which are tuples, so copies are cheap.
+"""
+import bitboard
+from game_consts import NUM_OF_PLAYERS, STARTING_HAND
+
+
+class TableSnapshot:
+    """
+    The table status at a point of the game, with the hand of the player it is taken for.
+    The other fields are those of the table status, see engine.new_table_status.
+    :param played_cards: tuple of int, the card played by each player in the current round, 0 if none
+    :param round_history: tuple of tuple of int, the played cards of each complete round
+    :param partner: int, the partner card value until the partner is revealed, then the partner player
+    :param played_mask: int, bitboard of all the cards played, found from the cards if None
+    :param player: int, the player the snapshot is taken for, None for none
+    :param hand: int, bitboard of the hand of the player
+    """
+    __slots__ = ('played_cards', 'leading_player', 'trump_suit', 'trump_broken', 'round_history', 'bid',
+                 'partner', 'partner_reveal', 'defender_target', 'defender_wins', 'attacker_target',
+                 'attacker_wins', 'played_mask', 'player', 'hand')
+
+    def __init__(self, played_cards, leading_player, trump_suit, trump_broken, round_history, bid, partner,
+                 partner_reveal, defender_target, defender_wins, attacker_target, attacker_wins,
+                 played_mask=None, player=None, hand=0):
+        if played_mask is None:
+            played_mask = bitboard.from_values([card for played in round_history + (played_cards,)
+                                                for card in played if card])
+        set_field = object.__setattr__
+        set_field(self, 'played_cards', played_cards)
+        set_field(self, 'leading_player', leading_player)
+        set_field(self, 'trump_suit', trump_suit)
+        set_field(self, 'trump_broken', trump_broken)
+        set_field(self, 'round_history', round_history)
+        set_field(self, 'bid', bid)
+        set_field(self, 'partner', partner)
+        set_field(self, 'partner_reveal', partner_reveal)
+        set_field(self, 'defender_target', defender_target)
+        set_field(self, 'defender_wins', defender_wins)
+        set_field(self, 'attacker_target', attacker_target)
+        set_field(self, 'attacker_wins', attacker_wins)
+        set_field(self, 'played_mask', played_mask)
+        set_field(self, 'player', player)
+        set_field(self, 'hand', hand)
+
+    @classmethod
+    def from_table_status(cls, table_status, player=None, hand=0):
+        """
+        Take a snapshot of the table status
+        :param table_status: dict, see engine.new_table_status
+        :param player: int
+        :param hand: int, bitboard
+        :return: TableSnapshot
+        """
+        return cls(tuple(table_status['played cards']), table_status['leading player'], table_status['trump suit'],
+                   table_status['trump broken'], tuple(tuple(played) for played in table_status['round history']),
+                   table_status['bid'], table_status['partner'], table_status['partner reveal'],
+                   table_status['defender']['target'], table_status['defender']['wins'],
+                   table_status['attacker']['target'], table_status['attacker']['wins'],
+                   player=player, hand=hand)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('A TableSnapshot cannot be changed, use replace()')
+
+    def __delattr__(self, name):
+        raise AttributeError('A TableSnapshot cannot be changed, use replace()')
+
+    def __eq__(self, other):
+        if not isinstance(other, TableSnapshot):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        return 'TableSnapshot({0:s})'.format(', '.join('{0:s}={1!r}'.format(name, getattr(self, name))
+                                                       for name in self.__slots__))
+
+    def replace(self, **changes):
+        """
+        Copy the snapshot with some fields changed. The fields not changed are shared with this snapshot.
+        The played mask is found again from the cards if they are changed without it.
+        :return: TableSnapshot
+        """
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        for name in changes:
+            if name not in fields:
+                raise TypeError('TableSnapshot has no field {0:s}'.format(name))
+        fields.update(changes)
+        if ('played_cards' in changes or 'round_history' in changes) and 'played_mask' not in changes:
+            fields['played_mask'] = None
+        return TableSnapshot(**fields)
+
+    def get_n_played(self):
+        """
+        :return: int, the number of cards played in the current round
+        """
+        return sum(1 for card in self.played_cards if card)
+
+    def get_current_player(self):
+        """
+        :return: int, the player to play next in the current round
+        """
+        return (self.leading_player + self.get_n_played()) % NUM_OF_PLAYERS
+
+    def get_rounds_left(self):
+        """
+        :return: int, the rounds not complete, including the current one
+        """
+        return STARTING_HAND - len(self.round_history)
@@ -0,0 +1,300 @@
+import os
+import sys
+import math
+import time
+import random
+import itertools
+import collections
+import multiprocessing
+import engine
+import seeding
+from ai_comp import ai, pimc, ismcts
+from game_consts import PlayerRole, NUM_OF_PLAYERS
+
+"""
+This script runs a round-robin tournament between the AI, without any display.
+Each match between two AI is played over duplicate deals: every deal is played once for each way of
+seating the two AI two seats each, so both AI hold every hand the same number of times, and the card luck
+cancels out. The deals are played across a pool of worker processes.
+
+Whether a weak hand is reshuffled is up to the AI, and differs between them, so a deal could be played with
+different cards in each seating. In the tournament, every weak hand is reshuffled instead, and the seatings
+whose cards still differ from the first seating of their deal are counted and reported.
+
+The score of a deal is the average number of tricks taken by the side of the first AI, minus the one of the
+second AI. The deal is won by the AI with the better score, and drawn if the scores are equal.
+A match stops early once a sequential probability ratio test (SPRT) is conclusive. The SPRT tests whether
+the first AI wins a deal that is not drawn with the probability SPRT_WIN_RATE (H1) or 1-SPRT_WIN_RATE (H0),
+with the error rates SPRT_ALPHA and SPRT_BETA. The drawn deals do not count in the SPRT.
+"""
+
+BOTS = {'random': ai.RandomAI, 'vivian': ai.VivianAI, 'pimc': pimc.PIMCAI, 'ismcts': ismcts.ISMCTSAI}
+
+# The seats of the first AI in each seating, the second AI takes the others
+SEATINGS = list(itertools.combinations(range(NUM_OF_PLAYERS), NUM_OF_PLAYERS // 2))
+
+# The SPRT tests whether the first AI wins a deal with the probability of SPRT_WIN_RATE or of 1-SPRT_WIN_RATE
+SPRT_WIN_RATE = 0.55
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+
+
+def make_bot(name, table_status, time_budget):
+    """
+    :param name: str, a key of BOTS
+    :param table_status: dict
+    :param time_budget: float, the seconds per play of the sampling AI
+    :return: ai.BaseAI
+    """
+    if issubclass(BOTS[name], pimc.SamplingAI):
+        return BOTS[name](table_status, time_budget=time_budget)
+    return BOTS[name](table_status)
+
+
+def get_side_tricks(game_engine, player_num):
+    """
+    :param game_engine: engine.GameEngine, after the game
+    :param player_num: int
+    :return: int, the number of tricks taken by the side of the player
+    """
+    if game_engine.roles[player_num] in (PlayerRole.DECLARER, PlayerRole.PARTNER):
+        return game_engine.table_status['defender']['wins']
+    return game_engine.table_status['attacker']['wins']
+
+
+def play_deal(task):
+    """
+    Play a deal in every seating, in a worker
+    :param task: (str, str, int, float), the names of the two AI, the game seed and the time budget
+    :return: dict, the results of the deal
+    """
+    bots, game_seed, time_budget = task[:2], task[2], task[3]
+    tricks = [0, 0]
+    declared = [0, 0]
+    made = [0, 0]
+    first_deal = None
+    diverged = 0
+    for seating in SEATINGS:
+        game_engine = engine.GameEngine()
+        # The same cards in every seating, whatever the AI would decide on weak hands
+        game_engine.reshuffle_weak_hands = True
+        bot_of_seats = [0 if i in seating else 1 for i in range(NUM_OF_PLAYERS)]
+        for i, bot in enumerate(bot_of_seats):
+            game_engine.add_ai(i, make_bot(bots[bot], game_engine.table_status, time_budget))
+        result = game_engine.play_game(game_seed)
+        game_engine.close()
+        deal = (tuple(game_engine.dealt_hands), game_engine.first_bidder)
+        if first_deal is None:
+            first_deal = deal
+        elif deal != first_deal:
+            diverged += 1
+
+        for i, bot in enumerate(bot_of_seats):
+            tricks[bot] += get_side_tricks(game_engine, i)
+        declarer_bot = bot_of_seats[result['declarer']]
+        declared[declarer_bot] += 1
+        made[declarer_bot] += result['contract made']
+
+    seats_per_bot = len(SEATINGS) * NUM_OF_PLAYERS // 2
+    return {'score': (tricks[0] - tricks[1]) / seats_per_bot, 'declared': declared, 'made': made,
+            'diverged': diverged}
+
+
+def sprt_bounds(alpha=SPRT_ALPHA, beta=SPRT_BETA):
+    """
+    :return: (float, float), the log-likelihood ratios to conclude for the second and for the first AI
+    """
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def get_sprt_llr(wins, losses, win_rate=SPRT_WIN_RATE):
+    """
+    The log-likelihood ratio of the first AI winning a deal with win_rate (H1) against 1-win_rate (H0).
+    Drawn deals do not count.
+    :param wins: int, the deals won by the first AI
+    :param losses: int, the deals won by the second AI
+    :return: float
+    """
+    return (wins - losses) * math.log(win_rate / (1 - win_rate))
+
+
+def new_match(bots, win_rate=SPRT_WIN_RATE, alpha=SPRT_ALPHA, beta=SPRT_BETA):
+    """
+    :param bots: (str, str)
+    :param win_rate: float, the win rate of the first AI under H1 of the SPRT, 1-win_rate under H0
+    :param alpha: float, the error rate of concluding for the first AI when H0 holds
+    :param beta: float, the error rate of concluding for the second AI when H1 holds
+    :return: dict
+    """
+    return {'bots': bots, 'deals': 0, 'wins': 0, 'losses': 0, 'draws': 0, 'score sum': 0.0,
+            'score square sum': 0.0, 'declared': [0, 0], 'made': [0, 0], 'diverged': 0,
+            'sprt': (win_rate, alpha, beta), 'llr': 0.0, 'verdict': None}
+
+
+def add_deal(match, deal):
+    """
+    Add the results of a deal to a match and update the SPRT
+    :param match: dict, see new_match
+    :param deal: dict, see play_deal
+    :return: None
+    """
+    match['deals'] += 1
+    score = deal['score']
+    match['score sum'] += score
+    match['score square sum'] += score * score
+    if score > 0:
+        match['wins'] += 1
+    elif score < 0:
+        match['losses'] += 1
+    else:
+        match['draws'] += 1
+    for i in range(2):
+        match['declared'][i] += deal['declared'][i]
+        match['made'][i] += deal['made'][i]
+    match['diverged'] += deal['diverged']
+
+    win_rate, alpha, beta = match['sprt']
+    match['llr'] = get_sprt_llr(match['wins'], match['losses'], win_rate)
+    lower, upper = sprt_bounds(alpha, beta)
+    if match['llr'] >= upper:
+        match['verdict'] = match['bots'][0]
+    elif match['llr'] <= lower:
+        match['verdict'] = match['bots'][1]
+
+
+def get_confidence_interval(n, total, square_total, z=1.96):
+    """
+    :param n: int, the number of samples
+    :param total: float, the sum of the samples
+    :param square_total: float, the sum of the squared samples
+    :param z: float, 1.96 for 95%
+    :return: (float, float), the mean and the half width of the interval
+    """
+    if n < 2:
+        return total / max(n, 1), float('inf')
+    mean = total / n
+    variance = max(0.0, (square_total - n * mean * mean) / (n - 1))
+    return mean, z * math.sqrt(variance / n)
+
+
+def play_match(pool, workers, bots, max_deals, seed, time_budget, sprt=(SPRT_WIN_RATE, SPRT_ALPHA, SPRT_BETA)):
+    """
+    Play the deals of a match until the SPRT is conclusive or max_deals is reached
+    :param pool: multiprocessing.Pool
+    :param workers: int, the number of processes of the pool
+    :param bots: (str, str)
+    :param max_deals: int
+    :param seed: int, the seed of the deals, the same deals are played in every match
+    :param time_budget: float
+    :param sprt: (float, float, float), the win rate, alpha and beta of the SPRT, see new_match
+    :return: dict, see new_match
+    """
+    match = new_match(bots, *sprt)
+    # Only a few deals are queued ahead, so that little is played past the end of the match
+    pending = collections.deque()
+    next_deal = 0
+    while pending or next_deal < max_deals:
+        while next_deal < max_deals and len(pending) < 2 * workers:
+            task = (bots[0], bots[1], seeding.get_game_seed(seed, next_deal), time_budget)
+            pending.append(pool.apply_async(play_deal, (task,)))
+            next_deal += 1
+        # The deals are added in order, so the match stops at the same deal for any number of workers
+        add_deal(match, pending.popleft().get())
+        if match['verdict']:
+            break
+    return match
+
+
+def print_match(match):
+    bots = match['bots']
+    mean, half_width = get_confidence_interval(match['deals'], match['score sum'], match['score square sum'])
+    print("{0:s} vs {1:s}: {2:d} deals, {3:s}".format(
+        bots[0], bots[1], match['deals'],
+        "SPRT favours " + match['verdict'] if match['verdict'] else "SPRT inconclusive"))
+    win_rate, alpha, beta = match['sprt']
+    lower, upper = sprt_bounds(alpha, beta)
+    print("  SPRT of {0:s} winning a deal that is not drawn with p = {1:.3f} (H1) vs p = {2:.3f} (H0), "
+          "alpha {3:.3f}, beta {4:.3f}".format(bots[0], win_rate, 1 - win_rate, alpha, beta))
+    print("  Deals won: {0:d} - {1:d}, drawn: {2:d} (not counted), LLR: {3:.2f} in ({4:.2f}, {5:.2f})".format(
+        match['wins'], match['losses'], match['draws'], match['llr'], lower, upper))
+    if match['diverged']:
+        print("  WARNING: {0:d} seatings were dealt other cards than the first seating of their deal".format(
+            match['diverged']))
+    print("  Trick differential per seat: {0:+.3f} +/- {1:.3f} (95%)".format(mean, half_width))
+    for i in range(2):
+        declared = match['declared'][i]
+        if declared:
+            # The outcomes are 0 or 1, so the sum of squares is the sum
+            rate, rate_half_width = get_confidence_interval(declared, match['made'][i], match['made'][i])
+            print("  {0:s} contracts made: {1:d}/{2:d} ({3:.1%} +/- {4:.1%})".format(
+                bots[i], match['made'][i], declared, rate, rate_half_width))
+        else:
+            print("  {0:s} contracts made: 0/0".format(bots[i]))
+
+
+def run_tournament(bot_names, max_deals=200, workers=None, seed=None, time_budget=0.1,
+                   sprt=(SPRT_WIN_RATE, SPRT_ALPHA, SPRT_BETA)):
+    """
+    Play a match between every pair of AI
+    :param bot_names: list of str, keys of BOTS
+    :param max_deals: int, the most deals of a match
+    :param workers: int, number of processes. Defaults to the number of CPUs
+    :param seed: int, the seed of the deals. Random if not given
+    :param time_budget: float, the seconds per play of the sampling AI
+    :param sprt: (float, float, float), the win rate, alpha and beta of the SPRT, see new_match
+    :return: list of dict, the matches
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    workers = workers or os.cpu_count()
+    matches = []
+    with multiprocessing.Pool(workers) as pool:
+        for bots in itertools.combinations(bot_names, 2):
+            matches.append(play_match(pool, workers, bots, max_deals, seed, time_budget, sprt))
+            print_match(matches[-1])
+    return matches
+
+
+if __name__ == '__main__':
+    BOT_NAMES = ['random', 'vivian']
+    MAX_DEALS = 200
+    WORKERS = None
+    SEED = None
+    TIME_BUDGET = 0.1
+    WIN_RATE = SPRT_WIN_RATE
+    ALPHA = SPRT_ALPHA
+    BETA = SPRT_BETA
+
+    if len(sys.argv) > 1:
+        prev_command = ""
+        for command in sys.argv[1:]:
+            if prev_command == "--bots" or prev_command == "-b":
+                BOT_NAMES = command.split(',')
+            if prev_command == "--deals" or prev_command == "-n":
+                MAX_DEALS = int(command)
+            if prev_command == "--workers" or prev_command == "-w":
+                WORKERS = int(command)
+            if prev_command == "--seed" or prev_command == "-s":
+                SEED = int(command)
+            if prev_command == "--time" or prev_command == "-t":
+                TIME_BUDGET = float(command)
+            if prev_command == "--sprt-rate":
+                WIN_RATE = float(command)
+            if prev_command == "--alpha":
+                ALPHA = float(command)
+            if prev_command == "--beta":
+                BETA = float(command)
+            prev_command = command
+
+    for name in BOT_NAMES:
+        if name not in BOTS:
+            print("Unknown AI: {0:s}, the AI are {1:s}".format(name, ', '.join(BOTS)))
+            sys.exit(1)
+    if not 0.5 < WIN_RATE < 1 or not 0 < ALPHA < 1 or not 0 < BETA < 1:
+        print("The SPRT win rate must be between 0.5 and 1, and alpha and beta between 0 and 1")
+        sys.exit(1)
+
+    start_time = time.perf_counter()
+    run_tournament(BOT_NAMES, max_deals=MAX_DEALS, workers=WORKERS, seed=SEED, time_budget=TIME_BUDGET,
+                   sprt=(WIN_RATE, ALPHA, BETA))
+    print("Time: {0:.2f}s".format(time.perf_counter() - start_time))
@@ -1,5 +1,10 @@
 import pygame
 
+# The events of the view, kept out of game_consts so that the game logic does not need pygame
+DOUBLE_CLICK_EVENT = pygame.USEREVENT + 1
+DOUBLE_CLICK_TIMING = 300
+CALL_EVENT = pygame.USEREVENT + 2
+
 
 class PygView(object):
 